@@ -0,0 +1,104 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional
+from uuid import uuid4
+
+from loguru import logger
+
+
+CallHandler = Callable[[str, str, Any], Awaitable[None]]
+
+
+class CallServerAtCapacityError(Exception):
+    """Raised when a call is offered to a server that already hosts max_concurrent_calls sessions."""
+
+    def __init__(self, max_concurrent_calls: int):
+        self.max_concurrent_calls = max_concurrent_calls
+        super().__init__(f"Call server is at capacity ({max_concurrent_calls} concurrent calls)")
+
+
+class CallSession:
+    """Bookkeeping for one call hosted by the CallServer."""
+
+    def __init__(self, session_id: str, phone_number: str):
+        self.session_id = session_id
+        self.phone_number = phone_number
+        self.task: Optional[asyncio.Task] = None
+
+    def is_running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+
+class CallServer:
+    """
+    Hosts many concurrent calls on a single asyncio loop.
+
+    Every call runs ``call_handler(session_id, phone_number, transport)`` in its own task. The handler is
+    expected to build its own pipeline, FlowManager and ConversationContext, so nothing is shared between
+    sessions except process-wide clients. Admission is bounded by ``max_concurrent_calls``: calls offered
+    above that limit are rejected with CallServerAtCapacityError instead of being queued, so a saturated
+    process never adds latency to calls it has already accepted.
+    """
+
+    def __init__(self, call_handler: CallHandler, max_concurrent_calls: int = 10):
+        if max_concurrent_calls < 1:
+            raise ValueError("max_concurrent_calls must be at least 1")
+        self._call_handler = call_handler
+        self._max_concurrent_calls = max_concurrent_calls
+        self._sessions: Dict[str, CallSession] = {}
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._closed = False
+
+    @property
+    def max_concurrent_calls(self) -> int:
+        return self._max_concurrent_calls
+
+    def get_active_calls(self) -> int:
+        return len(self._sessions)
+
+    def has_capacity(self) -> bool:
+        return not self._closed and len(self._sessions) < self._max_concurrent_calls
+
+    def start_call(self, phone_number: str, transport: Any) -> CallSession:
+        """Admit a call and start it in the background. Raises CallServerAtCapacityError when full."""
+        if self._closed:
+            raise RuntimeError("Call server is shut down")
+        if len(self._sessions) >= self._max_concurrent_calls:
+            raise CallServerAtCapacityError(self._max_concurrent_calls)
+
+        session = CallSession(str(uuid4()), phone_number)
+        self._sessions[session.session_id] = session
+        self._idle.clear()
+        session.task = asyncio.create_task(self._run_session(session, transport), name=f"call-{session.session_id}")
+        logger.info(f"Call {session.session_id} from {phone_number} admitted ({len(self._sessions)}/{self._max_concurrent_calls})")
+        return session
+
+    async def _run_session(self, session: CallSession, transport: Any):
+        try:
+            await self._call_handler(session.session_id, session.phone_number, transport)
+        except asyncio.CancelledError:
+            logger.warning(f"Call {session.session_id} was cancelled")
+            raise
+        except Exception as e:
+            logger.exception(f"Call {session.session_id} failed: {e}")
+        finally:
+            self._sessions.pop(session.session_id, None)
+            if not self._sessions:
+                self._idle.set()
+            logger.info(f"Call {session.session_id} released ({len(self._sessions)}/{self._max_concurrent_calls})")
+
+    async def wait_idle(self):
+        """Wait until no calls are running."""
+        await self._idle.wait()
+
+    async def shutdown(self, timeout: Optional[float] = None):
+        """Stop admitting calls and wait for running ones; cancel whatever is left after ``timeout``."""
+        self._closed = True
+        tasks = [session.task for session in self._sessions.values() if session.task is not None]
+        if not tasks:
+            return
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
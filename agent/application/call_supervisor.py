@@ -0,0 +1,331 @@
+import asyncio
+import multiprocessing
+import os
+import queue
+import time
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+from uuid import uuid4
+
+from loguru import logger
+
+from application.call_server import CallHandler, CallServer, CallServerAtCapacityError
+
+
+TransportFactory = Callable[..., Any]
+WorkerHook = Callable[[], Awaitable[Any]]
+WorkerMetrics = Callable[[], dict]
+
+# Commands sent from the supervisor to a worker
+START_CALL = "start_call"
+STOP = "stop"
+
+# Events sent from a worker to the supervisor
+CALL_STARTED = "call_started"
+CALL_REJECTED = "call_rejected"
+CALL_ENDED = "call_ended"
+LOAD = "load"
+
+
+class WorkerLoad:
+    """Supervisor-side view of one worker process."""
+
+    def __init__(self, worker_id: int, max_concurrent_calls: int):
+        self.worker_id = worker_id
+        self.max_concurrent_calls = max_concurrent_calls
+        self.pid: Optional[int] = None
+        # Calls assigned by the supervisor that the worker has not acknowledged yet
+        self.pending_calls = 0
+        self.active_calls = 0
+        self.total_calls = 0
+        self.rejected_calls = 0
+        # Calls lost when the worker process died, and how often it was restarted
+        self.failed_calls = 0
+        self.restarts = 0
+        # Whatever the worker_metrics hook returned in the last load report
+        self.metrics: dict = {}
+        self.last_report_at: Optional[float] = None
+
+    def get_load(self) -> int:
+        return self.active_calls + self.pending_calls
+
+    def has_capacity(self) -> bool:
+        return self.get_load() < self.max_concurrent_calls
+
+    def to_dict(self) -> dict:
+        return {
+            "worker_id": self.worker_id,
+            "pid": self.pid,
+            "active_calls": self.active_calls,
+            "pending_calls": self.pending_calls,
+            "max_concurrent_calls": self.max_concurrent_calls,
+            "total_calls": self.total_calls,
+            "rejected_calls": self.rejected_calls,
+            "failed_calls": self.failed_calls,
+            "restarts": self.restarts,
+            "last_report_at": self.last_report_at,
+            "metrics": self.metrics,
+        }
+
+
+def _worker_main(
+    worker_id: int,
+    call_handler: CallHandler,
+    transport_factory: TransportFactory,
+    max_concurrent_calls: int,
+    report_interval: float,
+    commands: multiprocessing.Queue,
+    events: multiprocessing.Queue,
+    worker_startup: Optional[WorkerHook] = None,
+    worker_shutdown: Optional[WorkerHook] = None,
+    worker_metrics: Optional[WorkerMetrics] = None,
+):
+    asyncio.run(_run_worker(
+        worker_id,
+        call_handler,
+        transport_factory,
+        max_concurrent_calls,
+        report_interval,
+        commands,
+        events,
+        worker_startup,
+        worker_shutdown,
+        worker_metrics,
+    ))
+
+
+async def _run_worker(
+    worker_id: int,
+    call_handler: CallHandler,
+    transport_factory: TransportFactory,
+    max_concurrent_calls: int,
+    report_interval: float,
+    commands: multiprocessing.Queue,
+    events: multiprocessing.Queue,
+    worker_startup: Optional[WorkerHook] = None,
+    worker_shutdown: Optional[WorkerHook] = None,
+    worker_metrics: Optional[WorkerMetrics] = None,
+):
+    loop = asyncio.get_running_loop()
+
+    async def tracked_call_handler(session_id: str, phone_number: str, transport: Any):
+        try:
+            await call_handler(session_id, phone_number, transport)
+        finally:
+            events.put((CALL_ENDED, worker_id, session_id))
+
+    call_server = CallServer(tracked_call_handler, max_concurrent_calls=max_concurrent_calls)
+
+    async def report_load():
+        while True:
+            metrics = worker_metrics() if worker_metrics is not None else {}
+            events.put((LOAD, worker_id, os.getpid(), call_server.get_active_calls(), metrics))
+            await asyncio.sleep(report_interval)
+
+    reporter = asyncio.create_task(report_load())
+    try:
+        # Calls assigned meanwhile wait in the command queue and stay pending on the supervisor
+        if worker_startup is not None:
+            await worker_startup()
+        logger.info(f"Call worker {worker_id} started with pid {os.getpid()}")
+        while True:
+            # multiprocessing queues are blocking, keep them off the event loop
+            command = await loop.run_in_executor(None, commands.get)
+            if command[0] == STOP:
+                break
+            if command[0] == START_CALL:
+                _, call_id, phone_number, transport_kwargs = command
+                try:
+                    transport = transport_factory(**transport_kwargs)
+                    call_server.start_call(phone_number, transport)
+                    events.put((CALL_STARTED, worker_id, call_id))
+                except CallServerAtCapacityError:
+                    events.put((CALL_REJECTED, worker_id, call_id))
+                except Exception as e:
+                    logger.exception(f"Call worker {worker_id} failed to start call {call_id}: {e}")
+                    events.put((CALL_REJECTED, worker_id, call_id))
+    finally:
+        reporter.cancel()
+        await call_server.shutdown(timeout=30)
+        if worker_shutdown is not None:
+            await worker_shutdown()
+        logger.info(f"Call worker {worker_id} stopped")
+
+
+class CallSupervisor:
+    """
+    Shards calls across worker processes, each hosting a CallServer on its own event loop.
+
+    Pipeline frame processing is CPU bound Python code, so a single process is capped by the GIL at
+    roughly one core. The supervisor starts ``num_workers`` processes and hands every new call to the
+    least loaded worker that still has capacity. A worker that dies is restarted, and the calls it had are
+    counted as failed. ``worker_startup`` is awaited in every worker before it
+    takes calls and ``worker_shutdown`` after its calls have ended, for process-wide clients and caches;
+    ``worker_metrics`` is sent along with every load report and shows up in ``get_worker_loads``.
+    ``call_handler``, ``transport_factory`` and the hooks are sent to the workers, so they must be module
+    level functions.
+    """
+
+    def __init__(
+        self,
+        call_handler: CallHandler,
+        transport_factory: TransportFactory,
+        num_workers: Optional[int] = None,
+        max_concurrent_calls_per_worker: int = 10,
+        report_interval: float = 5.0,
+        start_method: str = "spawn",
+        worker_startup: Optional[WorkerHook] = None,
+        worker_shutdown: Optional[WorkerHook] = None,
+        worker_metrics: Optional[WorkerMetrics] = None,
+    ):
+        self._call_handler = call_handler
+        self._transport_factory = transport_factory
+        self._worker_startup = worker_startup
+        self._worker_shutdown = worker_shutdown
+        self._worker_metrics = worker_metrics
+        self._num_workers = num_workers or os.cpu_count() or 1
+        self._max_concurrent_calls_per_worker = max_concurrent_calls_per_worker
+        self._report_interval = report_interval
+        # spawn gives every worker a clean interpreter instead of a copy of the supervisor's loop and threads
+        self._mp_context = multiprocessing.get_context(start_method)
+        self._events = self._mp_context.Queue()
+        self._commands: List[multiprocessing.Queue] = []
+        self._processes: List[multiprocessing.Process] = []
+        self._loads: List[WorkerLoad] = []
+        self._events_task: Optional[asyncio.Task] = None
+        # Set once shutdown begins, so workers that exit are not restarted
+        self._closing = False
+        self._stopping = False
+
+    def _start_worker(self, worker_id: int) -> Tuple[multiprocessing.Queue, multiprocessing.Process]:
+        commands = self._mp_context.Queue()
+        process = self._mp_context.Process(
+            target=_worker_main,
+            args=(
+                worker_id,
+                self._call_handler,
+                self._transport_factory,
+                self._max_concurrent_calls_per_worker,
+                self._report_interval,
+                commands,
+                self._events,
+                self._worker_startup,
+                self._worker_shutdown,
+                self._worker_metrics,
+            ),
+            name=f"call-worker-{worker_id}",
+            daemon=True,
+        )
+        process.start()
+        return commands, process
+
+    def start(self):
+        for worker_id in range(self._num_workers):
+            commands, process = self._start_worker(worker_id)
+            load = WorkerLoad(worker_id, self._max_concurrent_calls_per_worker)
+            load.pid = process.pid
+            self._commands.append(commands)
+            self._processes.append(process)
+            self._loads.append(load)
+        self._events_task = asyncio.create_task(self._consume_events())
+        logger.info(f"Call supervisor started {self._num_workers} workers")
+
+    def assign_call(self, phone_number: str, **transport_kwargs) -> str:
+        """
+        Send a call to the least loaded worker. ``transport_kwargs`` are passed to the transport factory
+        inside the worker. Returns the call id, raises CallServerAtCapacityError when every worker is full.
+        """
+        candidates = [
+            load for load in self._loads
+            if load.has_capacity() and self._processes[load.worker_id].is_alive()
+        ]
+        if not candidates:
+            raise CallServerAtCapacityError(self._max_concurrent_calls_per_worker * self._num_workers)
+        worker = min(candidates, key=lambda load: load.get_load())
+        call_id = str(uuid4())
+        worker.pending_calls += 1
+        self._commands[worker.worker_id].put((START_CALL, call_id, phone_number, transport_kwargs))
+        logger.info(f"Call {call_id} from {phone_number} assigned to worker {worker.worker_id}")
+        return call_id
+
+    def get_worker_loads(self) -> List[dict]:
+        return [load.to_dict() for load in self._loads]
+
+    def get_active_calls(self) -> int:
+        return sum(load.get_load() for load in self._loads)
+
+    async def wait_idle(self, poll_interval: float = 0.5):
+        while True:
+            self._check_workers()
+            if self.get_active_calls() == 0:
+                return
+            await asyncio.sleep(poll_interval)
+
+    def _check_workers(self):
+        """Restart workers that died. Their calls can not be recovered, they are counted as failed."""
+        if self._closing:
+            return
+        for load in self._loads:
+            process = self._processes[load.worker_id]
+            if process.is_alive():
+                continue
+            lost_calls = load.get_load()
+            logger.error(
+                f"Call worker {load.worker_id} (pid {process.pid}) exited with code {process.exitcode}, "
+                f"{lost_calls} calls failed; restarting it"
+            )
+            load.failed_calls += lost_calls
+            load.pending_calls = 0
+            load.active_calls = 0
+            # Nobody reads the old queue any more, so its unsent commands must not hold up interpreter exit
+            self._commands[load.worker_id].cancel_join_thread()
+            self._commands[load.worker_id].close()
+            commands, process = self._start_worker(load.worker_id)
+            self._commands[load.worker_id] = commands
+            self._processes[load.worker_id] = process
+            load.pid = process.pid
+            load.restarts += 1
+
+    async def _consume_events(self):
+        loop = asyncio.get_running_loop()
+        while not self._stopping:
+            try:
+                event = await loop.run_in_executor(None, self._events.get, True, 1.0)
+            except queue.Empty:
+                self._check_workers()
+                continue
+            self._apply_event(event)
+
+    def _apply_event(self, event: tuple):
+        kind, worker_id = event[0], event[1]
+        load = self._loads[worker_id]
+        if kind == LOAD:
+            _, _, pid, active_calls, metrics = event
+            if pid != load.pid:
+                # Sent by a worker process that has since been replaced
+                return
+            load.active_calls = active_calls
+            load.metrics = metrics
+            load.last_report_at = time.time()
+        elif kind == CALL_STARTED:
+            load.pending_calls = max(0, load.pending_calls - 1)
+            load.active_calls += 1
+            load.total_calls += 1
+        elif kind == CALL_REJECTED:
+            load.pending_calls = max(0, load.pending_calls - 1)
+            load.rejected_calls += 1
+            logger.warning(f"Worker {worker_id} rejected call {event[2]}")
+        elif kind == CALL_ENDED:
+            load.active_calls = max(0, load.active_calls - 1)
+
+    async def shutdown(self, timeout: float = 30.0):
+        self._closing = True
+        for commands in self._commands:
+            commands.put((STOP,))
+        loop = asyncio.get_running_loop()
+        for process in self._processes:
+            await loop.run_in_executor(None, process.join, timeout)
+            if process.is_alive():
+                process.terminate()
+        self._stopping = True
+        if self._events_task is not None:
+            await self._events_task
@@ -0,0 +1,92 @@
+import asyncio
+from typing import Awaitable, Callable, Optional, Union
+
+from loguru import logger
+
+from crm_api_client.crm_manager_client.api.clients import clients_controller_find_client_by_phone, clients_controller_get_current_accommodation
+from crm_api_client.crm_manager_client.client import AuthenticatedClient, Client
+from crm_api_client.crm_manager_client.models.client_accommodation_dto import ClientAccommodationDto
+from crm_api_client.crm_manager_client.models.client_dto import ClientDto
+from domain.models.conversation_context import ConversationContext
+from infrastructure.crm.deadlines import DeadlineExceeded
+
+
+AccommodationListener = Callable[[Optional[ClientAccommodationDto]], Awaitable[None]]
+
+
+class CallerLookup:
+    """
+    Resolves the caller at call start: phone number -> client -> current accommodation.
+
+    ``start`` fires the phone lookup right away so it overlaps with pipeline setup. As soon as the client
+    is known the accommodation request is started in the background, which lets the greeting begin after a
+    single CRM hop. Code that needs the accommodation awaits ``wait_for_accommodation``.
+    """
+
+    def __init__(self, client: Union[AuthenticatedClient, Client], context: ConversationContext):
+        self._client = client
+        self._context = context
+        self._client_task: Optional[asyncio.Task] = None
+        self._accommodation_task: Optional[asyncio.Task] = None
+        self._listeners: list[AccommodationListener] = []
+
+    def start(self):
+        if self._client_task is None:
+            self._client_task = asyncio.create_task(self._resolve_client())
+
+    def is_accommodation_loaded(self) -> bool:
+        return self._accommodation_task is not None and self._accommodation_task.done()
+
+    def on_accommodation(self, listener: AccommodationListener):
+        """Call ``listener`` once the accommodation request finishes, with None when there is none."""
+        if self.is_accommodation_loaded():
+            asyncio.create_task(listener(self._context.get_client_accommodation()))
+            return
+        self._listeners.append(listener)
+
+    async def _resolve_client(self) -> Optional[ClientDto]:
+        try:
+            client = await clients_controller_find_client_by_phone.asyncio(
+                client=self._client,
+                phone_number=self._context.get_phone_number()
+            )
+        except DeadlineExceeded as e:
+            # Better to greet an unknown caller than to keep them in silence
+            logger.warning(f"Phone lookup timed out, treating the caller as unknown: {e}")
+            return None
+        if client is not None:
+            self._context.set_client(client)
+            self._accommodation_task = asyncio.create_task(self._resolve_accommodation(client))
+        return client
+
+    async def _resolve_accommodation(self, client: ClientDto) -> Optional[ClientAccommodationDto]:
+        try:
+            accommodation = await clients_controller_get_current_accommodation.asyncio(
+                client=self._client,
+                id=client.id
+            )
+        except Exception as e:
+            logger.error(f"Error fetching current accommodation for client {client.id}: {e}")
+            accommodation = None
+        self._context.set_client_accommodation(accommodation)
+        for listener in self._listeners:
+            try:
+                await listener(accommodation)
+            except Exception as e:
+                logger.error(f"Accommodation listener failed: {e}")
+        return accommodation
+
+    async def wait_for_client(self) -> Optional[ClientDto]:
+        self.start()
+        return await self._client_task
+
+    async def wait_for_accommodation(self) -> Optional[ClientAccommodationDto]:
+        await self.wait_for_client()
+        if self._accommodation_task is None:
+            return self._context.get_client_accommodation()
+        return await self._accommodation_task
+
+    def cancel(self):
+        for task in (self._client_task, self._accommodation_task):
+            if task is not None and not task.done():
+                task.cancel()
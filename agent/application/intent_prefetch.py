@@ -0,0 +1,96 @@
+import asyncio
+from typing import Any, Dict, Optional, Tuple, Union
+
+from loguru import logger
+
+from crm_api_client.crm_manager_client.api.rentals import rentals_controller_get_rental_emergency_details, rentals_controller_get_rental_settlement_details
+from crm_api_client.crm_manager_client.client import AuthenticatedClient, Client
+from crm_api_client.crm_manager_client.models.client_accommodation_dto import ClientAccommodationDto
+from crm_api_client.crm_manager_client.models.rental_emergency_details_dto import RentalEmergencyDetailsDto
+from crm_api_client.crm_manager_client.models.rental_settlement_details_dto import RentalSettlementDetailsDto
+from domain.models.conversation_context import ConversationContext
+
+
+_ENDPOINTS = {
+    "settlement": rentals_controller_get_rental_settlement_details,
+    "emergency": rentals_controller_get_rental_emergency_details,
+}
+
+
+def _retrieve_exception(task: asyncio.Task):
+    # A failed prefetch nobody asked for must not be reported as "exception was never retrieved"
+    if not task.cancelled():
+        task.exception()
+
+
+class IntentPrefetch:
+    """
+    Fetches the rental details a known caller's likely intent needs while they are still being greeted.
+
+    Registered as an accommodation listener of CallerLookup. Settlement details are requested when
+    ``check_is_allowed_to_settle`` passes and emergency details when ``is_currently_staying`` passes, since only
+    then can the flow get to the tool that needs them. The tool handlers ask this class instead of the CRM:
+    a finished prefetch is returned from memory and one still in flight is awaited. A failed prefetch is
+    dropped and the details are fetched again.
+    """
+
+    def __init__(self, client: Union[AuthenticatedClient, Client], context: ConversationContext):
+        self._client = client
+        self._context = context
+        self._tasks: Dict[Tuple[str, str], asyncio.Task] = {}
+        self.started = 0
+        self.hits = 0
+        self.waits = 0
+        self.misses = 0
+
+    async def on_accommodation(self, accommodation: Optional[ClientAccommodationDto]):
+        if accommodation is None or not accommodation.rental_id:
+            return
+        if self._context.check_is_allowed_to_settle()["success"]:
+            self._start("settlement", accommodation.rental_id)
+        if self._context.is_currently_staying()["success"]:
+            self._start("emergency", accommodation.rental_id)
+
+    def _start(self, kind: str, rental_id: str) -> asyncio.Task:
+        task = self._tasks.get((kind, rental_id))
+        if task is None:
+            task = asyncio.create_task(_ENDPOINTS[kind].asyncio(client=self._client, id=rental_id))
+            task.add_done_callback(_retrieve_exception)
+            self._tasks[(kind, rental_id)] = task
+            self.started += 1
+            logger.debug(f"Prefetching {kind} details of rental {rental_id}")
+        return task
+
+    async def _get(self, kind: str, rental_id: str) -> Any:
+        task = self._tasks.get((kind, rental_id))
+        if task is not None:
+            was_done = task.done()
+            try:
+                # Shielded so an interrupted tool call leaves the prefetch to the next one
+                result = await asyncio.shield(task)
+            except Exception as e:
+                logger.warning(f"Prefetched {kind} details of rental {rental_id} failed, fetching them again: {e}")
+                self._tasks.pop((kind, rental_id), None)
+            else:
+                # A failed prefetch is only counted as the miss below
+                if was_done:
+                    self.hits += 1
+                else:
+                    self.waits += 1
+                return result
+        self.misses += 1
+        return await _ENDPOINTS[kind].asyncio(client=self._client, id=rental_id)
+
+    async def get_settlement_details(self, rental_id: str) -> Optional[RentalSettlementDetailsDto]:
+        return await self._get("settlement", rental_id)
+
+    async def get_emergency_details(self, rental_id: str) -> Optional[RentalEmergencyDetailsDto]:
+        return await self._get("emergency", rental_id)
+
+    def get_metrics(self) -> dict:
+        return {"started": self.started, "hits": self.hits, "waits": self.waits, "misses": self.misses}
+
+    def cancel(self):
+        for task in self._tasks.values():
+            if not task.done():
+                task.cancel()
@@ -0,0 +1,124 @@
+from string import Template
+from typing import Any, Iterable, List, Optional, Sequence, Set
+
+from pipecat_flows import NodeConfig
+
+
+def _get_placeholders(template: Template, strict: bool = True) -> Set[str]:
+    """Placeholder names used by ``template``; if ``strict``, raises ValueError on a ``$`` that is not a valid placeholder"""
+    names = set()
+    for match in template.pattern.finditer(template.template):
+        name = match.group("named") or match.group("braced")
+        if name:
+            names.add(name)
+        elif strict and match.group("invalid") is not None:
+            raise ValueError(f"Invalid placeholder at position {match.start('invalid')} of {template.template[:40]!r}...")
+    return names
+
+
+class NodeTemplate:
+    """
+    A flow node compiled once per process and rendered per call.
+
+    The role messages, instructions and functions are built once and only copied on render. ``placeholders``
+    declares the per-call values; those used by a ``shared`` text are substituted into it, the rest are listed
+    in the trailing ``<call_data>`` message. Each dynamic message is rendered with a single ``string.Template``
+    substitution.
+
+    Templates are checked when they are created, i.e. when bot.py is imported: a placeholder that is not declared,
+    a declared one that is written into the static instructions or a malformed ``$`` raises ValueError.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        role_messages: List[dict],
+        instructions: str,
+        placeholders: Sequence[str] = (),
+        shared: Sequence[str] = (),
+        functions: Sequence[Any] = (),
+        pre_actions: Optional[List[dict]] = None,
+        post_actions: Optional[List[dict]] = None,
+    ):
+        self.name = name
+        self._placeholders = tuple(placeholders)
+        self._role_messages = role_messages
+        self._instructions = {"role": "system", "content": instructions}
+        self._shared = [Template(text) for text in shared]
+        self._functions = list(functions)
+        self._pre_actions = pre_actions
+        self._post_actions = post_actions
+
+        declared = set(self._placeholders)
+        invalid = [placeholder for placeholder in self._placeholders if not placeholder.isidentifier()]
+        if invalid or len(declared) != len(self._placeholders):
+            raise ValueError(f"Node template {name}: invalid or repeated placeholders {self._placeholders}")
+        used = set()
+        for template in self._shared:
+            try:
+                used |= _get_placeholders(template)
+            except ValueError as e:
+                raise ValueError(f"Node template {name}: {e}") from None
+        if used - declared:
+            raise ValueError(f"Node template {name}: undeclared placeholders {sorted(used - declared)}")
+        static = _get_placeholders(Template(instructions), strict=False) & declared
+        if static:
+            raise ValueError(f"Node template {name}: placeholders {sorted(static)} in the static instructions")
+        call_data = [placeholder for placeholder in self._placeholders if placeholder not in used]
+        self._call_data = None
+        if call_data:
+            lines = "\n".join(f"{placeholder}: ${placeholder}" for placeholder in call_data)
+            self._call_data = Template(f"<call_data>\n{lines}\n</call_data>")
+        # Renders with dummy values so a broken template fails here rather than mid-call
+        self.render(**{placeholder: placeholder for placeholder in self._placeholders})
+
+    @property
+    def placeholders(self) -> tuple:
+        return self._placeholders
+
+    def render(self, **values: Any) -> NodeConfig:
+        if values.keys() != set(self._placeholders):
+            missing = sorted(set(self._placeholders) - values.keys())
+            unknown = sorted(values.keys() - set(self._placeholders))
+            raise ValueError(f"Node template {self.name}: missing values {missing}, unknown values {unknown}")
+        task_messages = [dict(self._instructions)]
+        task_messages.extend({"role": "system", "content": template.substitute(values)} for template in self._shared)
+        if self._call_data is not None:
+            task_messages.append({"role": "system", "content": self._call_data.substitute(values)})
+        node_config = {
+            "role_messages": [dict(message) for message in self._role_messages],
+            "task_messages": task_messages,
+            "functions": list(self._functions),
+        }
+        if self._pre_actions is not None:
+            node_config["pre_actions"] = [dict(action) for action in self._pre_actions]
+        if self._post_actions is not None:
+            node_config["post_actions"] = [dict(action) for action in self._post_actions]
+        return node_config
+
+
+class PromptLayout:
+    """
+    Builds flow node templates whose prompt starts with the parts every call shares, so providers can serve it
+    from their prefix cache.
+
+    Prompts are cached by prefix: the tools, then the messages in order. Every node gets the same role messages,
+    its functions in a fixed order and static instructions that refer to the client, the accommodation, etc.
+    by name. Text shared by calls but not static (the rentals table) follows, and everything that differs between
+    calls goes into a single ``<call_data>`` message at the very end.
+    """
+
+    def __init__(self, role_messages: Iterable[str]):
+        self._role_messages = [{"role": "system", "content": content} for content in role_messages]
+
+    def create_template(
+        self,
+        name: str,
+        instructions: str,
+        placeholders: Sequence[str] = (),
+        shared: Sequence[str] = (),
+        functions: Sequence[Any] = (),
+        pre_actions: Optional[List[dict]] = None,
+        post_actions: Optional[List[dict]] = None,
+    ) -> NodeTemplate:
+        return NodeTemplate(name, self._role_messages, instructions, placeholders, shared, functions, pre_actions, post_actions)
@@ -0,0 +1,109 @@
+import json
+import os
+from typing import Dict, Optional
+
+from loguru import logger
+
+
+try:
+    import tiktoken
+
+    _encoding = tiktoken.get_encoding("o200k_base")
+except Exception:
+    # tiktoken is optional; without it the counts are estimates
+    _encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """Count the tokens of ``text``. Without tiktoken installed this is an estimate of four characters per token."""
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+def count_node_tokens(node_config: dict) -> int:
+    """Tokens of the role and task messages a flow node adds to the prompt"""
+    messages = list(node_config.get("role_messages", [])) + list(node_config.get("task_messages", []))
+    return sum(count_tokens(message.get("content") or "") for message in messages)
+
+
+def _function_text(function) -> str:
+    # FlowsFunctionSchema carries the handler and transition too; only the FunctionSchema part reaches the LLM
+    if hasattr(function, "to_function_schema"):
+        function = function.to_function_schema()
+    schema = function.to_default_dict() if hasattr(function, "to_default_dict") else function
+    return json.dumps(schema, sort_keys=True, default=str)
+
+
+def node_prompt_text(node_config: dict) -> str:
+    """
+    Everything a flow node sends to the LLM, in the order providers cache prompts by prefix: the function
+    schemas, then the role and task messages
+    """
+    parts = [_function_text(function) for function in node_config.get("functions", [])]
+    messages = list(node_config.get("role_messages", [])) + list(node_config.get("task_messages", []))
+    parts.extend(message.get("content") or "" for message in messages)
+    return "\n".join(parts)
+
+
+class PromptSizeReport:
+    """
+    Prompt size of every flow node that was set, per node name: last, largest and average token count.
+
+    Shared by every call in the process. ``record`` warns once a node's prompt has grown by ``warn_ratio``
+    over the size first seen, e.g. when the rentals catalogue gets bigger.
+
+    Each node's prompt is also compared with the one the previous call got: the tokens of the common prefix are
+    what the provider can serve from its prompt cache. ``min_prefix_tokens`` dropping towards zero means
+    per-call data leaked into the start of the prompt.
+    """
+
+    def __init__(self, warn_ratio: float = 1.5):
+        self._warn_ratio = warn_ratio
+        self._nodes: Dict[str, dict] = {}
+
+    def record(self, node: str, node_config: dict) -> int:
+        tokens = count_node_tokens(node_config)
+        text = node_prompt_text(node_config)
+        stats = self._nodes.get(node)
+        if stats is None:
+            stats = self._nodes[node] = {
+                "first": tokens, "last": tokens, "max": tokens, "total": 0, "count": 0, "warned": False,
+                "text": text, "prefix": None, "min_prefix": None,
+            }
+        else:
+            prefix = count_tokens(os.path.commonprefix([stats["text"], text]))
+            stats["text"] = text
+            stats["prefix"] = prefix
+            stats["min_prefix"] = prefix if stats["min_prefix"] is None else min(stats["min_prefix"], prefix)
+        stats["last"] = tokens
+        stats["max"] = max(stats["max"], tokens)
+        stats["total"] += tokens
+        stats["count"] += 1
+        if not stats["warned"] and stats["first"] and tokens >= stats["first"] * self._warn_ratio:
+            stats["warned"] = True
+            logger.warning(f"Prompt of node {node} grew from {stats['first']} to {tokens} tokens")
+        return tokens
+
+    def get(self, node: str) -> Optional[int]:
+        stats = self._nodes.get(node)
+        return stats["last"] if stats else None
+
+    def get_prefix(self, node: str) -> Optional[int]:
+        """Tokens the last prompt of ``node`` shared with the one before it, None until it was set twice"""
+        stats = self._nodes.get(node)
+        return stats["prefix"] if stats else None
+
+    def get_report(self) -> Dict[str, dict]:
+        return {
+            node: {
+                "last_tokens": stats["last"],
+                "max_tokens": stats["max"],
+                "avg_tokens": round(stats["total"] / stats["count"]),
+                "count": stats["count"],
+                "prefix_tokens": stats["prefix"],
+                "min_prefix_tokens": stats["min_prefix"],
+                "exact": _encoding is not None,
+            }
+            for node, stats in self._nodes.items()
+        }
@@ -0,0 +1,95 @@
+from typing import Any, Iterable, List, Optional, Sequence
+
+from crm_api_client.crm_manager_client.models.compact_rental_dto import CompactRentalDto
+
+
+# Everything the booking node can talk about; narrow it down with RentalsPromptRenderer(fields=...)
+RENTAL_FIELDS = ("id", "description", "price", "location", "amenities")
+
+
+def _clean(text: Any) -> str:
+    # The table is pipe separated and one rental per line
+    return " ".join(str(text).replace("|", "/").split())
+
+
+def get_price_amount(rental: CompactRentalDto) -> Optional[float]:
+    amount_micros = rental.price.additional_properties.get("amountMicros")
+    return None if amount_micros is None else amount_micros / 1_000_000
+
+
+def format_price(rental: CompactRentalDto) -> str:
+    price = rental.price.additional_properties
+    amount = get_price_amount(rental)
+    if amount is None:
+        return _clean(" ".join(str(value) for value in price.values()))
+    return f"{amount:g} {price.get('currency') or price.get('currencyCode') or ''}".strip()
+
+
+def format_location(rental: CompactRentalDto) -> str:
+    location = rental.location.additional_properties
+    street = " ".join(str(location[key]) for key in ("street", "houseNumber") if location.get(key))
+    if location.get("apparentNumber"):
+        street = f"{street} apt {location['apparentNumber']}"
+    parts = [part for part in (street, location.get("city")) if part]
+    if not parts:
+        parts = [str(value) for value in location.values() if value]
+    return _clean(", ".join(parts))
+
+
+def format_amenities(rental: CompactRentalDto) -> str:
+    titles = []
+    for amenity in rental.amenities:
+        properties = amenity.additional_properties
+        titles.append(properties.get("title") or " ".join(str(value) for value in properties.values()))
+    return _clean(",".join(titles))
+
+
+_FORMATTERS = {
+    "id": lambda rental: _clean(rental.id),
+    "description": lambda rental: _clean(rental.description),
+    "price": format_price,
+    "location": format_location,
+    "amenities": format_amenities,
+}
+
+
+def render_rentals(rentals: Iterable[CompactRentalDto], fields: Sequence[str] = RENTAL_FIELDS) -> str:
+    """
+    Render rentals as a pipe-separated table: a header line with the field names, then one line per rental.
+
+    Rentals keep the given order and fields are rendered in the order listed. Only the whitelisted fields
+    are read, which keeps lazy rental views mostly unparsed.
+    """
+    unknown = [field for field in fields if field not in _FORMATTERS]
+    if unknown:
+        raise ValueError(f"Unknown rental fields: {', '.join(unknown)}")
+    formatters = [_FORMATTERS[field] for field in fields]
+    lines = ["|".join(fields)]
+    for rental in rentals:
+        lines.append("|".join(formatter(rental) for formatter in formatters))
+    return "\n".join(lines)
+
+
+class RentalsPromptRenderer:
+    """
+    Renders the rentals catalogue for the booking prompt, caching the text for the catalogue it was made from.
+
+    The catalogue is shared by every call and only replaced on refresh, so most calls reuse the last rendering.
+    Rentals are sorted by id, so the same catalogue always renders to the same text. With ``max_rentals`` only
+    the first that many are rendered.
+    """
+
+    def __init__(self, fields: Sequence[str] = RENTAL_FIELDS, max_rentals: Optional[int] = None):
+        self._fields = tuple(fields)
+        self._max_rentals = max_rentals
+        self._rentals: Optional[List[CompactRentalDto]] = None
+        self._text = ""
+
+    def render(self, rentals: Optional[List[CompactRentalDto]]) -> str:
+        if rentals is None:
+            return ""
+        if rentals is not self._rentals:
+            shown = sorted(rentals, key=lambda rental: rental.id)[: self._max_rentals]
+            self._text = render_rentals(shown, self._fields)
+            self._rentals = rentals
+        return self._text
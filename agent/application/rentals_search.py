@@ -0,0 +1,74 @@
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from application.rentals_prompt import format_amenities, format_location, format_price, get_price_amount
+from crm_api_client.crm_manager_client.models.compact_rental_dto import CompactRentalDto
+
+
+def _tokenize(text: str) -> List[str]:
+    return re.findall(r"\w+", text.lower())
+
+
+class RentalsIndex:
+    """
+    BM25 index over the description, location, amenities and price of a rentals catalogue.
+
+    Built in memory from the catalogue, so a search costs no CRM request and no prompt tokens; only
+    the matches are shown to the LLM.
+    """
+
+    def __init__(self, rentals: List[CompactRentalDto], k1: float = 1.2, b: float = 0.75):
+        self._rentals = list(rentals)
+        self._k1 = k1
+        self._b = b
+        self._prices = [get_price_amount(rental) for rental in self._rentals]
+        self._postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self._lengths: List[int] = []
+        for doc, rental in enumerate(self._rentals):
+            terms = _tokenize(" ".join((rental.description, format_location(rental), format_amenities(rental), format_price(rental))))
+            self._lengths.append(len(terms))
+            for term, frequency in Counter(terms).items():
+                self._postings[term].append((doc, frequency))
+        self._average_length = sum(self._lengths) / len(self._lengths) if self._lengths else 0.0
+
+    def __len__(self) -> int:
+        return len(self._rentals)
+
+    def search(self, query: str, max_price: Optional[float] = None, limit: int = 5) -> List[CompactRentalDto]:
+        """
+        Rentals best matching ``query``, cheapest first among equal scores. An empty query matches every
+        rental; ``max_price`` drops rentals whose price is known and higher.
+        """
+        terms = set(_tokenize(query))
+        scores: Dict[int, float] = defaultdict(float)
+        count = len(self._rentals)
+        for term in terms:
+            postings = self._postings.get(term, [])
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc, frequency in postings:
+                normalization = self._k1 * (1 - self._b + self._b * self._lengths[doc] / self._average_length)
+                scores[doc] += idf * frequency * (self._k1 + 1) / (frequency + normalization)
+        candidates = scores.keys() if terms else range(count)
+        if max_price is not None:
+            candidates = [doc for doc in candidates if self._prices[doc] is None or self._prices[doc] <= max_price]
+        ranked = sorted(
+            candidates,
+            key=lambda doc: (-scores.get(doc, 0.0), self._prices[doc] if self._prices[doc] is not None else math.inf, self._rentals[doc].id),
+        )
+        return [self._rentals[doc] for doc in ranked[:limit]]
+
+
+class RentalsSearch:
+    """Keeps a RentalsIndex for the current catalogue, rebuilding it only when the catalogue is refreshed"""
+
+    def __init__(self):
+        self._rentals: Optional[List[CompactRentalDto]] = None
+        self._index = RentalsIndex([])
+
+    def get_index(self, rentals: Optional[List[CompactRentalDto]]) -> RentalsIndex:
+        if rentals is not None and rentals is not self._rentals:
+            self._index = RentalsIndex(rentals)
+            self._rentals = rentals
+        return self._index
@@ -0,0 +1,242 @@
+"""
+Load benchmark: N concurrent calls through bot.run_call with scripted STT, LLM and TTS and an in-process CRM.
+
+The calls run the real flows, handlers, CRM client and pipeline of bot.py; only the speech and LLM services, the
+transport, the CRM server, Redis and S3 are replaced (see benchmarks.fake_services and benchmarks.crm_stub).
+Scenarios are assigned round-robin: booking (search, availability, booking, end quote), settlement and
+info/emergency for known callers. The calls' clock is frozen at 14:00 today, within the settlement hours.
+
+Reports calls per second, CPU time per call, the agent's own latency per turn (the stages of TurnLatency while
+the fakes answer instantly) and peak memory per concurrent call. By default the caller's audio arrives at once,
+which measures throughput; with --realtime it arrives at the pace it is spoken, so calls overlap as they would
+live and the turn latency is not inflated by queued audio.
+
+Run from the agent directory:
+
+    python -m benchmarks.call_load --calls 200 --concurrency 20
+    python -m benchmarks.call_load --calls 200 --concurrency 50 --realtime
+"""
+import argparse
+import asyncio
+import contextlib
+import itertools
+import os
+import resource
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+import bot
+from benchmarks.crm_stub import CrmStub
+from benchmarks.fake_services import (
+    CallScript,
+    FakeCallTransport,
+    FakeLLMService,
+    FakePhraseSynthesizer,
+    FakeSTTService,
+    FakeTTSService,
+    ToolCall,
+    Turn,
+)
+from application.call_server import CallServer
+from infrastructure.events.call_completed_outbox import CallCompletedOutbox
+from infrastructure.metrics.percentile import nearest_rank
+from infrastructure.metrics.turn_latency import TurnLatencyStats
+from infrastructure.recording.recording_sink import RecordingSink
+from infrastructure.tts.phrase_audio_cache import PhraseAudio, PhraseAudioCache
+
+
+def booking_script(crm: CrmStub, phone_number: str) -> CallScript:
+    crm.add_client(phone_number)
+    dates = {
+        "rental_id": "rental-0",
+        "start_date": (date.today() + timedelta(days=7)).strftime("%d-%m-%Y"),
+        "end_date": (date.today() + timedelta(days=10)).strftime("%d-%m-%Y"),
+    }
+    return CallScript("booking", [
+        Turn("Hi, I would like to book an apartment.", [ToolCall("route_client_to_intent", {"intent": "booking"})]),
+        Turn("Something close to the city centre with wifi.", [ToolCall("search_rentals", {"query": "centre wifi"})]),
+        Turn("The first one sounds good. Is it free next week for three nights?", [ToolCall("get_rental_availability", dates)]),
+        Turn("Great, please book it.", [ToolCall("create_booking", dates)]),
+        Turn("No, that is all, thank you.", [ToolCall("booking_end_quote")]),
+    ])
+
+
+def settlement_script(crm: CrmStub, phone_number: str) -> CallScript:
+    crm.add_client(phone_number, "BOOKING_CONFIRMED", start_in_days=0, end_in_days=3)
+    return CallScript("settlement", [
+        Turn("Hi, I have just arrived and want to check in.", [
+            ToolCall("route_client_to_intent", {"intent": "settlement"}),
+            ToolCall("get_settlement_details"),
+        ]),
+        Turn("I am right outside the building.", []),
+        Turn("I am inside now, everything looks good.", [ToolCall("mark_user_get_inside")]),
+    ])
+
+
+def info_or_emergency_script(crm: CrmStub, phone_number: str) -> CallScript:
+    crm.add_client(phone_number, "SETTLED", start_in_days=-2, end_in_days=3)
+    return CallScript("info_or_emergency", [
+        Turn("Water is leaking in the bathroom, what should I do?", [
+            ToolCall("route_client_to_intent", {"intent": "info-or-emergency"}),
+            ToolCall("get_emergency_details"),
+        ]),
+        Turn("Okay, thank you, I will do that.", [ToolCall("info_or_emergency_conclude_call")]),
+    ])
+
+
+SCENARIOS: Dict[str, Callable[[CrmStub, str], CallScript]] = {
+    "booking": booking_script,
+    "settlement": settlement_script,
+    "info_or_emergency": info_or_emergency_script,
+}
+# Every call of the process gets its own caller, so no run finds the accommodation booked by an earlier one
+phone_numbers = itertools.count(1)
+
+
+class NullPublisher:
+    """Acknowledges call-completed events instead of sending them to Redis"""
+
+    def __init__(self):
+        self.published = 0
+
+    async def publish_batch(self, batch: List[dict]):
+        self.published += len(batch)
+
+
+class DiscardRecordingSink(RecordingSink):
+    """Counts the recorded audio instead of uploading it"""
+
+    async def write(self, audio: bytes):
+        self.bytes_written += len(audio)
+
+    async def close(self) -> Optional[str]:
+        return self.object_key if self.bytes_written else None
+
+    async def abort(self):
+        pass
+
+
+def peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class CallLoad:
+    def __init__(self, crm: CrmStub, scenarios: List[str], call_timeout: float, pause: float, realtime: bool):
+        self._crm = crm
+        self._scenarios = scenarios
+        self._call_timeout = call_timeout
+        self._pause = pause
+        self._realtime = realtime
+        # Scenario and seconds of the calls that finished their script
+        self.results: List[Tuple[str, float]] = []
+        self.failed = 0
+
+    async def _handle_call(self, session_id: str, phone_number: str, transport: FakeCallTransport):
+        script = transport.script
+        services = (FakeSTTService(script), FakeLLMService(script), FakeTTSService())
+        started_at = time.perf_counter()
+        try:
+            await asyncio.wait_for(bot.run_call(session_id, phone_number, transport, services=services), self._call_timeout)
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"{script.name} call {session_id} failed: {e!r}")
+            return
+        finally:
+            transport.cancel()
+        if not script.is_finished():
+            # The call ended early, e.g. the flow took a path the script does not follow
+            self.failed += 1
+            logger.error(f"{script.name} call {session_id} ended before its script finished")
+            return
+        self.results.append((script.name, time.perf_counter() - started_at))
+
+    async def run(self, calls: int, concurrency: int):
+        call_server = CallServer(self._handle_call, max_concurrent_calls=concurrency)
+        slots = asyncio.Semaphore(concurrency)
+        for i in range(calls):
+            await slots.acquire()
+            phone_number = f"+38050{next(phone_numbers):07d}"
+            script = SCENARIOS[self._scenarios[i % len(self._scenarios)]](self._crm, phone_number)
+            session = call_server.start_call(phone_number, FakeCallTransport(script, pause=self._pause, realtime=self._realtime))
+            session.task.add_done_callback(lambda _: slots.release())
+        await call_server.wait_idle()
+
+
+async def prepare(crm: CrmStub, work_dir: str):
+    """Point bot's process-wide clients at in-process stand-ins and warm them like bot.main does"""
+    bot.crm_client.set_async_httpx_client(crm.create_client())
+    # The fakes push frames far faster than a real call, so the pipeline's idle monitor falls behind; cancelling it
+    # with frames still queued is lost in asyncio.wait_for before Python 3.12 and the call never finishes.
+    # Benchmark calls cannot idle and are bounded by --call-timeout instead
+    bot.CALL_IDLE_TIMEOUT_SECS = 0
+    # Settlement is only allowed from 13:00 on the booking's start date, which the stub sets to today
+    settlement_time = datetime.now().replace(hour=14, minute=0, second=0, microsecond=0)
+    bot.conversation_clock = lambda: settlement_time
+    bot.call_completed_outbox = CallCompletedOutbox(os.path.join(work_dir, "outbox"), NullPublisher())
+    bot.create_recording_sink = DiscardRecordingSink
+    bot.phrase_audio = PhraseAudio(PhraseAudioCache(os.path.join(work_dir, "phrase_audio")), FakePhraseSynthesizer())
+    await bot.phrase_audio.warm(bot.FIXED_PHRASES, sample_rate=bot.AUDIO_OUT_SAMPLE_RATE)
+    await bot.rentals_catalogue.warm()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=60)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated, assigned round-robin")
+    parser.add_argument("--rentals", type=int, default=50, help="size of the CRM's rentals catalogue")
+    parser.add_argument("--crm-latency", type=float, default=0.0, help="seconds added to every CRM response")
+    parser.add_argument("--pause", type=float, default=0.05, help="seconds the caller waits before answering")
+    parser.add_argument("--realtime", action="store_true", help="the caller's audio arrives at the pace it is spoken")
+    parser.add_argument("--call-timeout", type=float, default=60.0)
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+
+    logger.remove()
+    logger.add(sys.stderr, level=args.log_level)
+    crm = CrmStub(rentals=args.rentals, latency=args.crm_latency)
+    with tempfile.TemporaryDirectory(prefix="call_load_") as work_dir, open(os.devnull, "w") as devnull:
+        await prepare(crm, work_dir)
+        # bot.py prints every event and CRM response; they are still formatted, just not shown
+        with contextlib.redirect_stdout(devnull):
+            # One call per scenario first, so imports and lazily built caches are not measured
+            await CallLoad(crm, scenarios, args.call_timeout, args.pause, args.realtime).run(len(scenarios), 1)
+            bot.turn_latency_stats = TurnLatencyStats()
+            load = CallLoad(crm, scenarios, args.call_timeout, args.pause, args.realtime)
+            crm_requests = crm.requests
+            rss_before = peak_rss_bytes()
+            cpu_started_at = time.process_time()
+            started_at = time.perf_counter()
+            await load.run(args.calls, args.concurrency)
+            elapsed = time.perf_counter() - started_at
+            cpu = time.process_time() - cpu_started_at
+            rss_growth = peak_rss_bytes() - rss_before
+        await bot.call_completed_outbox.stop()
+
+    durations = [seconds for _, seconds in load.results]
+    print(f"{args.calls} calls, {args.concurrency} concurrent, scenarios: {', '.join(scenarios)}")
+    for name in scenarios:
+        completed = sum(1 for scenario, _ in load.results if scenario == name)
+        print(f"  {name:<18} {completed:5d} completed")
+    print(f"  failed             {load.failed:5d}")
+    print(f"calls per second:    {len(load.results) / elapsed:8.2f}  ({elapsed:.1f} s)")
+    print(f"CPU per call:        {cpu / args.calls * 1000:8.1f} ms")
+    if durations:
+        print(f"call duration:       p50 {nearest_rank(durations, 50):.2f} s, p95 {nearest_rank(durations, 95):.2f} s")
+    print(f"CRM requests / call: {(crm.requests - crm_requests) / args.calls:8.1f}")
+    print(f"memory per call:     {rss_growth / args.concurrency / 1024:8.0f} KiB  (peak RSS growth / concurrency)")
+    print(f"turn latency with instant services, caller audio {'in real time' if args.realtime else 'at once'} (ms):")
+    for stage, metrics in bot.turn_latency_stats.get_metrics().items():
+        print(f"  {stage:<10} n={metrics['count']:<6d} p50 {metrics['p50']:6d}  p95 {metrics['p95']:6d}  p99 {metrics['p99']:6d}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,180 @@
+"""
+In-process stand-in for the CRM manager API, served through httpx.MockTransport.
+
+Requests are routed by the paths and operation ids of crm-api-scpec.json, so the generated client is exercised
+end to end: URL building, JSON bodies and response decoding. Operations the agent does not use answer 501.
+"""
+import asyncio
+import json
+import re
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.decode_rentals import make_rentals_payload
+
+
+SPEC_PATH = "crm-api-scpec.json"
+BASE_URL = "http://crm.stub"
+
+
+def _date_day(day: date) -> dict:
+    return {"year": day.year, "month": day.month, "day": day.day}
+
+
+def _not_found(message: str) -> httpx.Response:
+    return httpx.Response(404, json={"statusCode": 404, "message": message, "error": "Not Found"})
+
+
+class CrmStub:
+    """
+    Clients, accommodations and rentals the scripted calls of benchmarks.call_load need.
+
+    ``latency`` is added to every response, to see how calls behave when the CRM is slow.
+    """
+
+    def __init__(self, spec_path: str = SPEC_PATH, rentals: int = 50, latency: float = 0.0):
+        self._latency = latency
+        self._rentals: List[dict] = json.loads(make_rentals_payload(rentals))
+        self._rentals_by_id = {rental["id"]: rental for rental in self._rentals}
+        self._clients_by_phone: Dict[str, dict] = {}
+        self._accommodations: Dict[str, dict] = {}
+        self.requests = 0
+        handlers: Dict[str, Callable] = {
+            "ClientsController_findClientByPhone": self._find_client_by_phone,
+            "ClientsController_createClient": self._create_client,
+            "ClientsController_getCurrentAccommodation": self._get_current_accommodation,
+            "RentalsController_getRentals": self._get_rentals,
+            "RentalsController_getRentalById": self._get_rental_by_id,
+            "RentalsController_getRentalSettlementDetails": self._get_settlement_details,
+            "RentalsController_getRentalEmergencyDetails": self._get_emergency_details,
+            "RentalsController_getRentalAvailableDateSpans": self._get_available_date_spans,
+            "AccommodationsController_createBooking": self._create_booking,
+            "AccommodationsController_confirmSettlement": self._confirm_settlement,
+        }
+        with open(spec_path, encoding="utf-8") as f:
+            spec = json.load(f)
+        self._routes: List[Tuple[str, re.Pattern, Optional[Callable]]] = []
+        for path, operations in spec["paths"].items():
+            pattern = re.compile("^" + re.sub(r"\{(\w+)\}", r"(?P<\1>[^/]+)", path) + "$")
+            for method, operation in operations.items():
+                self._routes.append((method.upper(), pattern, handlers.get(operation["operationId"])))
+
+    def create_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(base_url=BASE_URL, transport=httpx.MockTransport(self.handle))
+
+    def add_client(self, phone_number: str, accommodation_status: Optional[str] = None, start_in_days: int = 0, end_in_days: int = 3) -> dict:
+        """Register a caller, with an accommodation of the first rental when ``accommodation_status`` is given"""
+        client_id = f"client-{len(self._clients_by_phone) + 1}"
+        client = {
+            "id": client_id,
+            "firstName": "Olena",
+            "lastName": "Koval",
+            "middleName": "",
+            "phoneNumber": phone_number,
+            "preferredLanguage": "en",
+            "preferences": ["quiet area"],
+            "note": "Prefers short answers",
+        }
+        self._clients_by_phone[phone_number] = client
+        if accommodation_status is not None:
+            today = date.today()
+            self._add_accommodation(
+                client_id, self._rentals[0]["id"], today + timedelta(days=start_in_days), today + timedelta(days=end_in_days), accommodation_status
+            )
+        return client
+
+    def _add_accommodation(self, client_id: str, rental_id: str, start: date, end: date, status: str) -> dict:
+        accommodation = {
+            "id": f"accommodation-{len(self._accommodations) + 1}",
+            "clientId": client_id,
+            "rentalId": rental_id,
+            "startDate": _date_day(start),
+            "endDate": _date_day(end),
+            "status": status,
+            "rental": self._rentals_by_id[rental_id],
+        }
+        self._accommodations[client_id] = accommodation
+        return accommodation
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        if self._latency:
+            await asyncio.sleep(self._latency)
+        for method, pattern, handler in self._routes:
+            match = pattern.match(request.url.path)
+            if match is None or method != request.method:
+                continue
+            if handler is None:
+                return httpx.Response(501, json={"statusCode": 501, "message": "Not implemented by the stub"})
+            return handler(request, **match.groupdict())
+        return _not_found(f"Cannot {request.method} {request.url.path}")
+
+    def _find_client_by_phone(self, request: httpx.Request, phoneNumber: str) -> httpx.Response:
+        client = self._clients_by_phone.get(phoneNumber)
+        if client is None:
+            return _not_found("Client not found")
+        return httpx.Response(200, json=client)
+
+    def _create_client(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        client = self.add_client(body["phoneNumber"])
+        client.update(firstName=body["firstName"], lastName=body["lastName"], middleName=body.get("middleName", ""))
+        return httpx.Response(201, json=client)
+
+    def _get_current_accommodation(self, request: httpx.Request, id: str) -> httpx.Response:
+        accommodation = self._accommodations.get(id)
+        if accommodation is None:
+            return _not_found("Client has no current accommodation")
+        return httpx.Response(200, json=accommodation)
+
+    def _get_rentals(self, request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json=self._rentals)
+
+    def _get_rental_by_id(self, request: httpx.Request, id: str) -> httpx.Response:
+        rental = self._rentals_by_id.get(id)
+        if rental is None:
+            return _not_found("Rental not found")
+        return httpx.Response(200, json=rental)
+
+    def _get_settlement_details(self, request: httpx.Request, id: str) -> httpx.Response:
+        return httpx.Response(200, json={
+            "settlementDetails": "1. The entrance is on the left side of the building; intercom code: 045. "
+                                 "2. Take the lift to the third floor. 3. The key box is next to door 12, code 7781.",
+        })
+
+    def _get_emergency_details(self, request: httpx.Request, id: str) -> httpx.Response:
+        return httpx.Response(200, json={
+            "emergencyDetails": "Water leak: close the main valve under the kitchen sink and call the plumber at +380441234567. "
+                                "Fire or gas: leave the apartment and call 112.",
+        })
+
+    def _get_available_date_spans(self, request: httpx.Request, id: str) -> httpx.Response:
+        # The agent sends the requested dates as DD-MM-YYYY; the spans only have to be plausible
+        start = date.today()
+        spans = [
+            {"startDate": (start + timedelta(days=offset)).isoformat(), "endDate": (start + timedelta(days=offset + 3)).isoformat(), "daysCount": 3}
+            for offset in range(0, 28, 7)
+        ]
+        return httpx.Response(200, json={"rentalId": id, "availableSpans": spans})
+
+    def _create_booking(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        start = date(**body["startDate"])
+        end = date(**body["endDate"])
+        accommodation = self._add_accommodation(body["clientId"], body["rentalId"], start, end, "BOOKING_PENDING")
+        return httpx.Response(201, json={
+            "id": accommodation["id"],
+            "clientId": body["clientId"],
+            "rentalId": body["rentalId"],
+            "startDate": start.isoformat(),
+            "endDate": end.isoformat(),
+        })
+
+    def _confirm_settlement(self, request: httpx.Request, id: str) -> httpx.Response:
+        for accommodation in self._accommodations.values():
+            if accommodation["id"] == id:
+                accommodation["status"] = "SETTLED"
+                return httpx.Response(201)
+        return _not_found("Accommodation not found")
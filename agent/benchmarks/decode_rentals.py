@@ -0,0 +1,75 @@
+"""
+Micro-benchmark: decoding a large rentals list with the generated from_dict vs infrastructure.crm.fast_decode,
+eagerly and as lazy views of which only the ids are read.
+
+Run from the agent directory:
+
+    python -m benchmarks.decode_rentals --rentals 5000 --repeat 20
+"""
+import argparse
+import json
+import time
+
+from crm_api_client.crm_manager_client.models.compact_rental_dto import CompactRentalDto
+from infrastructure.crm import fast_decode
+from infrastructure.crm.lazy_models import get_view_converter
+
+
+def make_rentals_payload(count: int) -> bytes:
+    rentals = [
+        {
+            "id": f"rental-{i}",
+            "price": {"amount": 40 + i % 200, "currency": "EUR", "period": "night"},
+            "description": f"Cosy {1 + i % 4}-room apartment number {i}, close to the city centre and public transport.",
+            "location": {"city": "Kyiv", "district": f"District {i % 10}", "address": f"Street {i}, {i % 50}", "lat": 50.45, "lng": 30.52},
+            "amenities": [
+                {"name": name, "available": True}
+                for name in ("wifi", "parking", "kitchen", "washer", "air conditioning")[: 1 + i % 5]
+            ],
+        }
+        for i in range(count)
+    ]
+    return json.dumps(rentals).encode("utf-8")
+
+
+def generated_decode(content: bytes) -> list[CompactRentalDto]:
+    # What rentals_controller_get_rentals._parse_response does with response.json()
+    return [CompactRentalDto.from_dict(item) for item in json.loads(content)]
+
+
+def best_of(decode, content: bytes, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        decode(content)
+        timings.append(time.perf_counter() - started_at)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rentals", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    content = make_rentals_payload(args.rentals)
+    fast = fast_decode.get_decoder(list[CompactRentalDto])
+    lazy = fast_decode.get_decoder(list[CompactRentalDto], get_view_converter)
+
+    def lazy_ids(content: bytes) -> list[str]:
+        return [rental.id for rental in lazy(content)]
+
+    # All paths have to produce equal models
+    assert fast(content) == generated_decode(content) == lazy(content)
+
+    generated = best_of(generated_decode, content, args.repeat)
+    compiled = best_of(fast, content, args.repeat)
+    lazy_views = best_of(lazy_ids, content, args.repeat)
+    print(f"{args.rentals} rentals, {len(content) / 1024:.0f} KiB, JSON decoder: {fast_decode.loads.__module__}")
+    print(f"generated from_dict: {generated * 1000:8.2f} ms")
+    print(f"fast_decode:         {compiled * 1000:8.2f} ms  ({generated / compiled:.1f}x)")
+    print(f"lazy views, ids:     {lazy_views * 1000:8.2f} ms  ({generated / lazy_views:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+"""
+Scripted stand-ins for the per-call services and transport of bot.run_call, used by benchmarks.call_load.
+
+A CallScript is one caller: what they say in each turn and the tool calls the LLM answers with. The fakes
+take no time of their own, so what is measured is the agent's own work: flows, handlers, CRM client, frame
+processing and bookkeeping.
+"""
+import asyncio
+import itertools
+import json
+from collections import deque
+from dataclasses import dataclass, field
+from typing import AsyncGenerator, Deque, List, Optional
+
+from openai.types.chat import ChatCompletionChunk
+from openai.types.chat.chat_completion_chunk import Choice, ChoiceDelta, ChoiceDeltaToolCall, ChoiceDeltaToolCallFunction
+from pipecat.frames.frames import (
+    BotStartedSpeakingFrame,
+    BotStoppedSpeakingFrame,
+    CancelFrame,
+    EndFrame,
+    Frame,
+    InputAudioRawFrame,
+    LLMFullResponseEndFrame,
+    LLMFullResponseStartFrame,
+    OutputAudioRawFrame,
+    StartFrame,
+    StartInterruptionFrame,
+    StopInterruptionFrame,
+    TranscriptionFrame,
+    TTSAudioRawFrame,
+    TTSStartedFrame,
+    TTSStoppedFrame,
+    UserStartedSpeakingFrame,
+    UserStoppedSpeakingFrame,
+    VADUserStartedSpeakingFrame,
+    VADUserStoppedSpeakingFrame,
+)
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+from pipecat.services.openai.llm import OpenAILLMService
+from pipecat.services.stt_service import STTService
+from pipecat.services.tts_service import TTSService
+from pipecat.utils.time import time_now_iso8601
+
+
+# What the fake LLM says whenever it does not call a tool
+REPLY = "Alright, I can help you with that. Let me know how you would like to continue."
+# Seconds of speech per word of the caller and per character of the agent
+CALLER_SECS_PER_WORD = 0.3
+AGENT_SECS_PER_CHAR = 0.06
+AUDIO_CHUNK_SECS = 0.02
+
+
+@dataclass
+class ToolCall:
+    name: str
+    arguments: dict = field(default_factory=dict)
+
+
+@dataclass
+class Turn:
+    user_text: str
+    tool_calls: List[ToolCall] = field(default_factory=list)
+
+
+class CallScript:
+    """
+    One caller. Before the first turn and after every turn the agent answers; the turn's tool calls are made by
+    the LLM in order, each as soon as the current flow node offers it. The answer is over once all of them were
+    made and the LLM replied with text.
+    """
+
+    def __init__(self, name: str, turns: List[Turn]):
+        self.name = name
+        self._turns = turns
+        self._next_turn = 0
+        self._pending: Deque[ToolCall] = deque()
+        self.answered = False
+        self.transcript: Optional[str] = None
+
+    def next_tool_call(self, available: set) -> Optional[ToolCall]:
+        if self._pending and self._pending[0].name in available:
+            return self._pending.popleft()
+        return None
+
+    def on_reply(self):
+        if not self._pending:
+            self.answered = True
+
+    def is_finished(self) -> bool:
+        return self._next_turn >= len(self._turns) and not self._pending
+
+    def next_utterance(self) -> Optional[str]:
+        """What the caller says next, None once the script is over or the agent has not answered yet"""
+        if not self.answered or self._next_turn >= len(self._turns):
+            return None
+        turn = self._turns[self._next_turn]
+        self._next_turn += 1
+        self._pending = deque(turn.tool_calls)
+        self.answered = False
+        self.transcript = turn.user_text
+        return turn.user_text
+
+
+class FakeSTTService(STTService):
+    """Transcribes the caller's current utterance as soon as its audio starts to arrive"""
+
+    def __init__(self, script: CallScript, **kwargs):
+        super().__init__(**kwargs)
+        self._script = script
+
+    async def run_stt(self, audio: bytes) -> AsyncGenerator[Frame, None]:
+        text, self._script.transcript = self._script.transcript, None
+        if text:
+            yield TranscriptionFrame(text, "caller", time_now_iso8601())
+        else:
+            yield None
+
+
+class FakeLLMService(OpenAILLMService):
+    """
+    Streams scripted chat completion chunks instead of calling OpenAI. Being an OpenAILLMService, the chunks go
+    through the same parsing, function calling and flows adapter as real responses.
+    """
+
+    def __init__(self, script: CallScript, words_per_chunk: int = 3, **kwargs):
+        super().__init__(api_key="benchmark", **kwargs)
+        self._script = script
+        self._words_per_chunk = words_per_chunk
+        self._call_ids = itertools.count(1)
+
+    async def get_chat_completions(self, context, messages) -> AsyncGenerator[ChatCompletionChunk, None]:
+        tools = context.tools
+        available = {tool["function"]["name"] for tool in tools} if isinstance(tools, list) else set()
+        tool_call = self._script.next_tool_call(available)
+        if tool_call is not None:
+            delta = ChoiceDelta(tool_calls=[ChoiceDeltaToolCall(
+                index=0,
+                id=f"call_{next(self._call_ids)}",
+                function=ChoiceDeltaToolCallFunction(name=tool_call.name, arguments=json.dumps(tool_call.arguments)),
+            )])
+            return self._stream([delta])
+        self._script.on_reply()
+        words = REPLY.split(" ")
+        deltas = [
+            ChoiceDelta(content=" ".join(words[i:i + self._words_per_chunk]) + " ")
+            for i in range(0, len(words), self._words_per_chunk)
+        ]
+        return self._stream(deltas)
+
+    async def _stream(self, deltas: List[ChoiceDelta]) -> AsyncGenerator[ChatCompletionChunk, None]:
+        for delta in deltas:
+            yield ChatCompletionChunk(
+                id="benchmark",
+                choices=[Choice(index=0, delta=delta)],
+                created=0,
+                model=self.model_name,
+                object="chat.completion.chunk",
+            )
+
+
+class FakeTTSService(TTSService):
+    """Synthesises silence as long as the text would take to speak, in AUDIO_CHUNK_SECS chunks"""
+
+    async def run_tts(self, text: str) -> AsyncGenerator[Frame, None]:
+        chunk_bytes = int(self.sample_rate * AUDIO_CHUNK_SECS) * 2
+        yield TTSStartedFrame()
+        for _ in range(max(1, int(len(text) * AGENT_SECS_PER_CHAR / AUDIO_CHUNK_SECS))):
+            yield TTSAudioRawFrame(audio=bytes(chunk_bytes), sample_rate=self.sample_rate, num_channels=1)
+        yield TTSStoppedFrame()
+
+
+class FakePhraseSynthesizer:
+    """Stands in for CartesiaPhraseSynthesizer when the phrase audio cache is warmed"""
+
+    voice_id = "benchmark"
+    model = "benchmark"
+
+    async def synthesize(self, text: str, sample_rate: int) -> bytes:
+        return bytes(int(len(text) * AGENT_SECS_PER_CHAR * sample_rate) * 2)
+
+
+class FakeCallerInput(FrameProcessor):
+    """
+    Pushes the caller's utterances the way the input transport does with a VAD analyzer. The audio of an utterance
+    arrives at once, or at the pace it is spoken with ``realtime``.
+    """
+
+    def __init__(self, realtime: bool = False, **kwargs):
+        super().__init__(**kwargs)
+        self._realtime = realtime
+        self._sample_rate = 16000
+        self.hung_up = False
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+        if isinstance(frame, StartFrame):
+            self._sample_rate = frame.audio_in_sample_rate
+        elif isinstance(frame, (EndFrame, CancelFrame)):
+            # Nothing may follow the end of the call into the pipeline, like a real transport's input stopping
+            self.hung_up = True
+        await self.push_frame(frame, direction)
+
+    async def speak(self, text: str):
+        if self.hung_up:
+            return
+        await self.push_frame(VADUserStartedSpeakingFrame())
+        await self.push_frame(UserStartedSpeakingFrame())
+        if self.interruptions_allowed:
+            await self.push_frame(StartInterruptionFrame())
+        chunk = bytes(int(self._sample_rate * AUDIO_CHUNK_SECS) * 2)
+        for _ in range(int(len(text.split()) * CALLER_SECS_PER_WORD / AUDIO_CHUNK_SECS)):
+            if self.hung_up:
+                return
+            await self.push_frame(InputAudioRawFrame(audio=chunk, sample_rate=self._sample_rate, num_channels=1))
+            # Even at once, the rest of the pipeline runs between chunks as it would between network reads
+            await asyncio.sleep(AUDIO_CHUNK_SECS if self._realtime else 0)
+        await self.push_frame(VADUserStoppedSpeakingFrame())
+        await self.push_frame(UserStoppedSpeakingFrame())
+        if self.interruptions_allowed:
+            await self.push_frame(StopInterruptionFrame())
+
+
+class FakeCallerOutput(FrameProcessor):
+    """
+    Consumes the agent's audio the way the output transport does and reports when the bot starts and stops
+    speaking: at its first audio, and at the end of the LLM response or of a phrase spoken outside of one.
+    """
+
+    def __init__(self, transport: "FakeCallTransport", **kwargs):
+        super().__init__(**kwargs)
+        self._transport = transport
+        self._speaking = False
+        self._responding = False
+        self.audio_bytes = 0
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if isinstance(frame, OutputAudioRawFrame):
+            self.audio_bytes += len(frame.audio)
+            if not self._speaking:
+                await self._set_speaking(True)
+            return
+        await self.push_frame(frame, direction)
+        if isinstance(frame, LLMFullResponseStartFrame):
+            self._responding = True
+        elif isinstance(frame, LLMFullResponseEndFrame):
+            self._responding = False
+            if self._speaking:
+                await self._set_speaking(False)
+        elif isinstance(frame, TTSStoppedFrame):
+            if self._speaking and not self._responding:
+                await self._set_speaking(False)
+        elif isinstance(frame, StartInterruptionFrame):
+            self._responding = False
+            if self._speaking:
+                await self._set_speaking(False)
+
+    async def _set_speaking(self, speaking: bool):
+        self._speaking = speaking
+        frame_type = BotStartedSpeakingFrame if speaking else BotStoppedSpeakingFrame
+        await self.push_frame(frame_type())
+        await self.push_frame(frame_type(), FrameDirection.UPSTREAM)
+        self._transport.on_bot_speaking(speaking)
+
+
+class FakeCallTransport:
+    """
+    Transport of one scripted call: the caller answers ``pause`` seconds after the agent has finished answering,
+    unless the agent starts speaking again in the meantime.
+    """
+
+    def __init__(self, script: CallScript, pause: float = 0.05, realtime: bool = False):
+        self.script = script
+        self._pause = pause
+        self._input = FakeCallerInput(realtime)
+        self._output = FakeCallerOutput(self)
+        self._reply_task: Optional[asyncio.Task] = None
+        self._replying = False
+
+    def input(self) -> FakeCallerInput:
+        return self._input
+
+    def output(self) -> FakeCallerOutput:
+        return self._output
+
+    def on_bot_speaking(self, speaking: bool):
+        # A caller already speaking finishes the utterance
+        if self._replying or self._input.hung_up:
+            return
+        # One still waiting to reply starts over; the task may not have run yet, so it is replaced, not awaited
+        if self._reply_task is not None:
+            self._reply_task.cancel()
+            self._reply_task = None
+        if not speaking and self.script.answered:
+            self._reply_task = asyncio.create_task(self._reply())
+
+    async def _reply(self):
+        await asyncio.sleep(self._pause)
+        text = self.script.next_utterance()
+        if text is None:
+            return
+        self._replying = True
+        try:
+            await self._input.speak(text)
+        finally:
+            self._replying = False
+
+    def cancel(self):
+        if self._reply_task is not None and not self._reply_task.done():
+            self._reply_task.cancel()
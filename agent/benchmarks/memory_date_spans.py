@@ -0,0 +1,59 @@
+"""
+Memory benchmark: an availability response with many date spans decoded with the generated from_dict vs
+compact models (infrastructure.crm.compact_models).
+
+Run from the agent directory:
+
+    python -m benchmarks.memory_date_spans --spans 10000
+"""
+import argparse
+import gc
+import json
+import tracemalloc
+
+from crm_api_client.crm_manager_client.models.available_date_spans_dto import AvailableDateSpansDto
+from infrastructure.crm import fast_decode
+from infrastructure.crm.compact_models import get_compact_converter
+
+
+def make_spans_payload(count: int) -> bytes:
+    spans = [
+        {"startDate": f"2025-{1 + i % 12:02d}-{1 + i % 28:02d}", "endDate": f"2025-{1 + i % 12:02d}-{2 + i % 27:02d}", "daysCount": 1 + i % 14}
+        for i in range(count)
+    ]
+    return json.dumps({"rentalId": "rental-1", "availableSpans": spans}).encode("utf-8")
+
+
+def retained_bytes(decode, content: bytes) -> int:
+    """Bytes still allocated while the decoded result is alive"""
+    gc.collect()
+    tracemalloc.start()
+    result = decode(content)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--spans", type=int, default=10000)
+    args = parser.parse_args()
+
+    content = make_spans_payload(args.spans)
+    compact = fast_decode.get_decoder(AvailableDateSpansDto, get_compact_converter)
+
+    def generated(content: bytes) -> AvailableDateSpansDto:
+        return AvailableDateSpansDto.from_dict(json.loads(content))
+
+    assert compact(content) == generated(content)
+
+    generated_size = retained_bytes(generated, content)
+    compact_size = retained_bytes(compact, content)
+    print(f"{args.spans} spans")
+    print(f"generated models: {generated_size / 1024:9.1f} KiB  ({generated_size / args.spans:.0f} bytes per span)")
+    print(f"compact models:   {compact_size / 1024:9.1f} KiB  ({compact_size / args.spans:.0f} bytes per span, {1 - compact_size / generated_size:.0%} less)")
+
+
+if __name__ == "__main__":
+    main()
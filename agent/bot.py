@@ -1,15 +1,13 @@
 import asyncio
 from datetime import datetime
-import io
 import sys
 import os
 import json
-from typing import Tuple
+import math
+from typing import Optional, Tuple
 from uuid import uuid4
-import wave
 import boto3
-# import io  # Removed
-# import wave  # Removed
+import httpx
 
 import aiofiles
 from dotenv import load_dotenv
@@ -24,14 +22,18 @@ from crm_api_client.crm_manager_client.api.rentals import rentals_controller_get
 from crm_api_client.crm_manager_client.api.accommodations import accommodations_controller_confirm_settlement, accommodations_controller_create_booking
 from select_audio_device import AudioDevice, run_device_selector
 
-from pipecat.frames.frames import Frame, TranscriptionFrame
+from pipecat.clocks.system_clock import SystemClock
+from pipecat.frames.frames import LLMMessagesAppendFrame, TTSSpeakFrame
 from pipecat.pipeline.pipeline import Pipeline
 from pipecat.pipeline.runner import PipelineRunner
 from pipecat.pipeline.task import PipelineTask
-from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
 from pipecat.processors.audio.audio_buffer_processor import AudioBufferProcessor
 from pipecat.transports.local.audio import LocalAudioTransport, LocalAudioTransportParams
+from pipecat.audio.vad.silero import SileroVADAnalyzer
+from pipecat.audio.vad.vad_analyzer import VADParams
 from pipecat.services.deepgram.stt import DeepgramSTTService
+from pipecat.services.stt_service import STTService
+from pipecat.services.tts_service import TTSService
 from pipecat.services.deepgram.stt import LiveOptions
 from pipecat.services.cartesia.tts import CartesiaTTSService
 from pipecat.services.openai.llm import OpenAILLMService
@@ -40,13 +42,87 @@ from pipecat.pipeline.task import PipelineParams
 from pipecat_flows import FlowManager, FlowsFunctionSchema, FlowArgs, NodeConfig
 from crm_api_client.crm_manager_client.models.date_day_dto import DateDayDto
 from domain.events.call_completed_event import CallCompletedEvent, Replica
-from bullmq import Queue
+from application.call_server import CallServer
+from application.call_supervisor import CallSupervisor
+from application.caller_lookup import CallerLookup
+from application.intent_prefetch import IntentPrefetch
+from application.prompt_layout import PromptLayout
+from application.prompt_tokens import PromptSizeReport
+from application.rentals_prompt import RENTAL_FIELDS, RentalsPromptRenderer, render_rentals
+from application.rentals_search import RentalsSearch
+from infrastructure.recording.recording_sink import CallRecorder, RecordingSink, S3MultipartRecordingSink, SpoolRecordingSink
+from infrastructure.recording.audio_encoder import AudioEncoder, get_recording_format
+from infrastructure.crm.rentals_catalogue import RentalsCatalogue
+from infrastructure.events.call_completed_outbox import CallCompletedOutbox
+from infrastructure.events.call_completed_publisher import CallCompletedPublisher
+from infrastructure.metrics.turn_latency import TurnLatencyObserver, TurnLatencyStats
+from infrastructure.storage.s3_bucket import BucketReadiness
+from infrastructure.storage.upload_executor import UploadExecutor
+from infrastructure.storage.upload_spill import UploadSpill
+from infrastructure.stt.speech_gate import SpeechGate
+from infrastructure.tts.cached_phrase_player import CachedPhrasePlayer
+from infrastructure.tts.phrase_audio_cache import CartesiaPhraseSynthesizer, PhraseAudio, PhraseAudioCache
 
 load_dotenv(override=True)
 S3_BUCKET = os.getenv("S3_BUCKET")
 S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")
 AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
 
+# Call recordings are streamed while the call is running: "s3" uploads multipart parts, "spool" writes a local file
+RECORDING_SINK = os.getenv("RECORDING_SINK", "s3")
+RECORDING_SPOOL_DIR = os.getenv("RECORDING_SPOOL_DIR", None)
+# 16 kHz, 16-bit, stereo: 64000 bytes per second of conversation
+RECORDING_CHUNK_BYTES = int(os.getenv("RECORDING_CHUNK_BYTES", 64000 * 5))
+# "wav", "flac" or "opus"; compressed formats are encoded from a spool file at hang-up
+RECORDING_FORMAT = get_recording_format(os.getenv("RECORDING_FORMAT", "wav"))
+RECORDING_ENCODER_WORKERS = int(os.getenv("RECORDING_ENCODER_WORKERS", 1))
+# Dedicated pool for blocking boto3 calls; uploads that find its queue full are spilled to disk
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", 4))
+UPLOAD_QUEUE_SIZE = int(os.getenv("UPLOAD_QUEUE_SIZE", 32))
+UPLOAD_SPILL_DIR = os.getenv("UPLOAD_SPILL_DIR", ".upload_spill")
+
+# Call server
+MAX_CONCURRENT_CALLS = int(os.getenv("MAX_CONCURRENT_CALLS", 10))
+CALL_WORKERS = int(os.getenv("CALL_WORKERS", 1))
+LOCAL_CALLER_PHONE_NUMBER = os.getenv("LOCAL_CALLER_PHONE_NUMBER", "+380991111112")
+# Seconds without speech or LLM responses after which a call is cancelled; 0 turns the idle monitor off
+CALL_IDLE_TIMEOUT_SECS = float(os.getenv("CALL_IDLE_TIMEOUT_SECS", 300))
+
+# CRM connection pool, sized for the calls hosted by one process
+CRM_MAX_CONNECTIONS = int(os.getenv("CRM_MAX_CONNECTIONS", MAX_CONCURRENT_CALLS * 2))
+CRM_KEEPALIVE_CONNECTIONS = int(os.getenv("CRM_KEEPALIVE_CONNECTIONS", MAX_CONCURRENT_CALLS))
+CRM_KEEPALIVE_EXPIRY = float(os.getenv("CRM_KEEPALIVE_EXPIRY", 30))
+CRM_HTTP2 = os.getenv("CRM_HTTP2", "false").lower() == "true"
+CRM_WARM_CONNECTIONS = int(os.getenv("CRM_WARM_CONNECTIONS", 2))
+# Seconds a CRM read on the voice path may take before the caller gets a fallback answer
+CRM_DEADLINE = float(os.getenv("CRM_DEADLINE", 2.5))
+# Seconds after which a slow CRM read is raced by a second request, until enough latencies are known to use their p95
+CRM_HEDGE_AFTER = float(os.getenv("CRM_HEDGE_AFTER", 0.5))
+# Decode CRM responses with orjson and precompiled model converters instead of the generated from_dict
+CRM_FAST_DECODE = os.getenv("CRM_FAST_DECODE", "true").lower() == "true"
+# Return the rentals catalogue and accommodations as lazy views whose nested objects are built on first access
+CRM_LAZY_MODELS = os.getenv("CRM_LAZY_MODELS", "true").lower() == "true"
+# Decode other CRM responses into slot-only models that allocate additional_properties only when needed
+CRM_COMPACT_MODELS = os.getenv("CRM_COMPACT_MODELS", "true").lower() == "true"
+# Fetch settlement / emergency details of a known caller's rental during the greeting, before the LLM asks for them
+INTENT_PREFETCH = os.getenv("INTENT_PREFETCH", "true").lower() == "true"
+
+# Voice of the agent and the rate calls are played at; cached phrase audio is keyed by both
+AUDIO_OUT_SAMPLE_RATE = 16000
+TTS_VOICE_ID = "5c42302c-194b-4d0c-ba1a-8cb485c84ab9"
+TTS_MODEL = "sonic-2"
+# Play the fixed greeting and goodbye phrases from synthesised audio kept on disk instead of streaming them through TTS
+PHRASE_AUDIO_CACHE = os.getenv("PHRASE_AUDIO_CACHE", "true").lower() == "true"
+PHRASE_AUDIO_CACHE_DIR = os.getenv("PHRASE_AUDIO_CACHE_DIR", ".phrase_audio")
+PHRASE_AUDIO_CACHE_BYTES = int(os.getenv("PHRASE_AUDIO_CACHE_BYTES", 50 * 1024 * 1024))
+
+# Run Silero VAD on the caller's audio and only stream speech to Deepgram
+VAD_GATE = os.getenv("VAD_GATE", "true").lower() == "true"
+# Seconds of silence after which the caller's turn is over; Deepgram is asked to finalize the transcript right then
+VAD_STOP_SECS = float(os.getenv("VAD_STOP_SECS", 0.5))
+# Seconds of audio before the detected speech start that are sent to Deepgram as well
+VAD_PRE_ROLL_SECS = float(os.getenv("VAD_PRE_ROLL_SECS", 0.5))
+
 # Redis connection for BullMQ
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
@@ -60,6 +136,12 @@ elif REDIS_PASSWORD:
 else:
     REDIS_URL = f"{REDIS_PROTOCOL}://{REDIS_HOST}:{REDIS_PORT}"
 
+# One Redis connection shared by every call instead of a new one per hang-up
+call_completed_publisher = CallCompletedPublisher(REDIS_URL)
+# Events are written to a local outbox first and forwarded to Redis in the background
+CALL_COMPLETED_OUTBOX_DIR = os.getenv("CALL_COMPLETED_OUTBOX_DIR", ".outbox")
+call_completed_outbox = CallCompletedOutbox(CALL_COMPLETED_OUTBOX_DIR, call_completed_publisher)
+
 s3_client = boto3.client(
     "s3",
     aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
@@ -71,48 +153,28 @@ s3_client = boto3.client(
         s3={'addressing_style': 'path'}
     )
 )
-async def save_audio(audio: bytes, sample_rate: int, num_channels: int, name: str):
-    if len(audio) > 0:
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        object_key = f"{name}_conversation_recording{timestamp}.wav"
-        with io.BytesIO() as buffer:
-            with wave.open(buffer, "wb") as wf:
-                wf.setsampwidth(2)
-                wf.setnchannels(num_channels)
-                wf.setframerate(sample_rate)
-                wf.writeframes(audio)
-            buffer.seek(0)
-            loop = asyncio.get_running_loop()
-            
-            # Check if bucket exists and create it if it doesn't
-            try:
-                await loop.run_in_executor(None, lambda: s3_client.head_bucket(Bucket=S3_BUCKET))
-            except Exception:
-                # Bucket doesn't exist, create it
-                try:
-                    create_bucket_kwargs = {'Bucket': S3_BUCKET}
-                    # If we're not using the default region (us-east-1), we need to specify LocationConstraint
-                    if AWS_REGION != 'us-east-1':
-                        create_bucket_kwargs['CreateBucketConfiguration'] = {
-                            'LocationConstraint': AWS_REGION
-                        }
-                    await loop.run_in_executor(None, lambda: s3_client.create_bucket(**create_bucket_kwargs))
-                    print(f"Created bucket: {S3_BUCKET}")
-                except Exception as e:
-                    print(f"Error creating bucket: {str(e)}")
-                    return None
-            
-            try:
-                await loop.run_in_executor(None, s3_client.upload_fileobj, buffer, S3_BUCKET, object_key)
-                print(f"Merged audio saved to s3://{S3_BUCKET}/{object_key}")
-                return object_key
-            except Exception as e:
-                print(f"Error uploading to S3: {str(e)}")
-                return None
-    else:
-        print("No audio data to save")
-        return None
-        
+upload_executor = UploadExecutor(max_workers=UPLOAD_WORKERS, max_queue_size=UPLOAD_QUEUE_SIZE)
+# Checked once at startup instead of a head_bucket round-trip on every call
+recordings_bucket = BucketReadiness(s3_client, S3_BUCKET, AWS_REGION, executor=upload_executor)
+upload_spill = UploadSpill(UPLOAD_SPILL_DIR, recordings_bucket)
+
+recording_encoder = AudioEncoder(max_workers=RECORDING_ENCODER_WORKERS)
+
+def create_recording_sink(object_key: str, sample_rate: int, num_channels: int) -> RecordingSink:
+    # Compressed formats need the complete recording, so they always go through a spool file
+    if RECORDING_SINK == "spool" or RECORDING_FORMAT.is_compressed():
+        return SpoolRecordingSink(
+            recordings_bucket,
+            object_key,
+            sample_rate,
+            num_channels,
+            spool_dir=RECORDING_SPOOL_DIR,
+            recording_format=RECORDING_FORMAT,
+            encoder=recording_encoder,
+            spill=upload_spill,
+        )
+    return S3MultipartRecordingSink(recordings_bucket, object_key, sample_rate, num_channels, spill=upload_spill)
+
 voice_instructions = """
 You are a helpful assistant in a call center. You are talking to a client.
 Organization is called "AI Rentals".
@@ -127,6 +189,9 @@ Implicit Communicative Intent: Subtly convey the underlying purpose or tone (e.g
 Fostering Listener Engagement: Where appropriate, use intonation and phrasing that naturally invites continued interaction or signals attentiveness to the conversational partner. This can include slight upward inflections for questions or statements that invite a response, without being overtly demanding.
 </voice_instructions>
 """
+# Every node starts with the same role messages so the provider can cache the prompt prefix
+prompt_layout = PromptLayout([voice_instructions])
+
 async def initial_collect_full_name_handler(args: FlowArgs, flow_manager: FlowManager):
     """Handler for collecting user's full name."""
     first_name = args.get("first_name")
@@ -155,43 +220,69 @@ initial_collect_full_name_schema = FlowsFunctionSchema(
 )
 
 from crm_api_client.crm_manager_client.client import Client
-
-crm_client = Client(base_url=os.getenv("CRM_MANAGER_URL"))
-
-async def search_client_by_phone_number(phone_number: str):
-    result = await clients_controller_find_client_by_phone.asyncio(
-        client=crm_client, 
-        phone_number=phone_number
+from infrastructure.crm import connection_pool
+from infrastructure.crm.deadlines import DeadlineExceeded, LatencyBudget, apply_latency_budgets
+from infrastructure.crm.fast_decode import enable_fast_decode
+from infrastructure.crm.single_flight import coalesce_get_requests
+
+crm_pool_limits = httpx.Limits(
+    max_connections=CRM_MAX_CONNECTIONS,
+    max_keepalive_connections=CRM_KEEPALIVE_CONNECTIONS,
+    keepalive_expiry=CRM_KEEPALIVE_EXPIRY,
+)
+# http2 needs the h2 package and is only used when the server supports it
+crm_client = Client(
+    base_url=os.getenv("CRM_MANAGER_URL"),
+    httpx_args={"limits": crm_pool_limits, "http2": CRM_HTTP2},
+)
+# Reads the caller waits on get a latency budget; applied before coalescing so hedged requests are not merged
+voice_path_budget = LatencyBudget(timeout=CRM_DEADLINE, hedge_after=CRM_HEDGE_AFTER)
+crm_deadlines = apply_latency_budgets({
+    clients_controller_find_client_by_phone: voice_path_budget,
+    clients_controller_get_current_accommodation: voice_path_budget,
+    rentals_controller_get_rental_by_id: voice_path_budget,
+    rentals_controller_get_rental_available_date_spans: voice_path_budget,
+    rentals_controller_get_rental_emergency_details: voice_path_budget,
+    rentals_controller_get_rental_settlement_details: voice_path_budget,
+})
+if CRM_FAST_DECODE:
+    enable_fast_decode(
+        lazy=(rentals_controller_get_rentals, clients_controller_get_current_accommodation) if CRM_LAZY_MODELS else (),
+        compact=CRM_COMPACT_MODELS,
     )
-
-    return result
-
+# Concurrent calls asking for the same rental share one CRM request
+crm_single_flight = coalesce_get_requests()
+# Shared by every call; served from memory once warmed and refreshed in the background after the TTL
+rentals_catalogue = RentalsCatalogue(crm_client, ttl=float(os.getenv("RENTALS_CACHE_TTL", 300)))
+# Fields of each rental shown to the booking node, rendered once per catalogue refresh
+RENTALS_PROMPT_FIELDS = [field.strip() for field in os.getenv("RENTALS_PROMPT_FIELDS", ",".join(RENTAL_FIELDS)).split(",") if field.strip()]
+# Catalogues larger than this are not listed in full; the booking node gets a shortlist and searches the rest
+RENTALS_PROMPT_MAX = int(os.getenv("RENTALS_PROMPT_MAX", 20))
+RENTALS_SEARCH_LIMIT = int(os.getenv("RENTALS_SEARCH_LIMIT", 5))
+rentals_prompt = RentalsPromptRenderer(RENTALS_PROMPT_FIELDS, max_rentals=RENTALS_PROMPT_MAX)
+rentals_search = RentalsSearch()
+prompt_size_report = PromptSizeReport()
+
+# Fixed phrases are spoken verbatim, so their audio can be synthesised once and replayed on every call
+WELCOME_PHRASE = "Welcome to AI Assistant Rentals. I am your personal assistant. I can help you with booking, settlement and emergencies."
+SETTLEMENT_GOODBYE_PHRASE = "We hope you have a wonderful stay at AI Rentals. If you need anything else, feel free to reach out. Goodbye!"
+INFO_OR_EMERGENCY_GOODBYE_PHRASE = "If you need anything else, please don't hesitate to call again. Goodbye!"
+FIXED_PHRASES = (WELCOME_PHRASE, SETTLEMENT_GOODBYE_PHRASE, INFO_OR_EMERGENCY_GOODBYE_PHRASE)
+# Built by start_call_process when enabled, since the cache creates and scans its directory
+phrase_audio: Optional[PhraseAudio] = None
+# Percentiles of every voice latency stage over the calls of this process
+turn_latency_stats = TurnLatencyStats()
+# Current time for the date checks and settlement hours of every call
+conversation_clock = datetime.now
+
+UNKNOWN_CLIENT_INITIAL_INSTRUCTIONS = """The introduction message has already been played to the user:
+                    "Welcome to AI Assistant Rentals. I am your personal assistant. I can help you with booking, settlement and emergencies."
+                    Do not repeat it. Continue with:
+                    "Could you please provide me with your full name so we can continue?"
+                    """
 
 def create_unknown_client_initial_flow():
-    flow_config = {
-            "role_messages": [
-                {
-                    "role": "system",
-                    "content": "You are a helpful assistant. Your responses will be converted to audio."
-                },
-                {
-                    "role": "system",
-                    "content": voice_instructions
-                }
-            ],
-            "task_messages": [
-                {
-                    "role": "system",
-                    "content": """Start by greeting the user with message. Use introduction message:
-                    "Welcome to AI Assistant Rentals. I am your personal assistant. I can help you with booking, settlement and emergencies
-                    Could you please provide me with your full name so we can continue?"
-                    "
-                    """
-                }
-            ],
-            "functions": [initial_collect_full_name_schema]
-    }
-    return flow_config
+    return unknown_client_initial_template.render()
 
 
 async def get_additional_rental_details(rental_id: str):
@@ -210,7 +301,7 @@ async def get_rental_availability_handler(args: FlowArgs, flow_manager: FlowMana
     
     # Validate date formats and values
     from datetime import datetime
-    current_date = datetime.now().date()
+    current_date = conversation_clock().date()
     
     # Date format validation function
     def is_valid_date_format(date_str):
@@ -251,10 +342,14 @@ async def get_rental_availability_handler(args: FlowArgs, flow_manager: FlowMana
             start_date=start_date,
             end_date=end_date
         )
-        # The API might return a complex object. We need to format it or decide what to return.
-        # For now, returning the raw response. This might need adjustment based on actual API response structure.
         logger.info(f"Availability spans: {availability_spans}")
-        return {"status": "success", "rental_id": rental_id, "availability": availability_spans}
+        # The function result goes into the LLM context as JSON, so the DTO is reduced to plain spans
+        spans = availability_spans.available_spans if availability_spans is not None else []
+        availability = [
+            {"start_date": span.start_date, "end_date": span.end_date, "days_count": span.days_count}
+            for span in spans
+        ]
+        return {"status": "success", "rental_id": rental_id, "availability": availability}
     except Exception as e:
         logger.error(f"Error getting rental availability: {e}")
         return {"status": "error", "message": str(e)}
@@ -312,27 +407,39 @@ create_booking_schema = FlowsFunctionSchema(
     handler=create_booking_handler,
 )
 
-async def create_booking_flow():
-    rentals_list = await rentals_controller_get_rentals.asyncio(
-        client=crm_client,
-    )
-    # Get current date in DD-MM-YYYY format for the system prompt
-    from datetime import datetime
-    current_date = datetime.now().strftime("%d-%m-%Y")
-    
-    flow_config = {
-        "role_messages": [
-            {
-                "role": "system",
-                "content": voice_instructions
-            }
-        ],
-        "task_messages": [
-            {
-                "role": "system",
-                "content": f"""Your goal is to help the client book accommodation.
+async def search_rentals_handler(args: FlowArgs, flow_manager: FlowManager):
+    """Handler for searching the rentals catalogue."""
+    query = args.get("query", "")
+    max_price = args.get("max_price")
+    # The LLM may send the price as a string, or something that is not a price at all
+    try:
+        max_price = float(max_price) if max_price is not None else None
+    except (TypeError, ValueError):
+        logger.warning(f"Ignoring invalid max price {max_price!r} in rentals search")
+        max_price = None
+    if max_price is not None and not math.isfinite(max_price):
+        max_price = None
+    index = rentals_search.get_index(await rentals_catalogue.get())
+    matches = index.search(query, max_price=max_price, limit=RENTALS_SEARCH_LIMIT)
+    logger.info(f"Rentals search for '{query}' (max price {max_price}) found {len(matches)} of {len(index)} rentals")
+    if not matches:
+        return {"status": "success", "message": "No rentals match these criteria. Ask the client what they could be flexible about and search again."}
+    return {"status": "success", "rentals": render_rentals(matches, RENTALS_PROMPT_FIELDS)}
+
+search_rentals_schema = FlowsFunctionSchema(
+    name="search_rentals",
+    description="Search all available rentals by the client's wishes. Returns the best matching rentals, one per line, with the fields named in the first line.",
+    properties={
+        "query": {"type": "string", "description": "Keywords for what the client wants, e.g. area, street, amenities, apartment type. Empty to list any rentals."},
+        "max_price": {"type": "number", "description": "Highest price the client accepts, if they mentioned one."},
+    },
+    required=["query"],
+    handler=search_rentals_handler,
+)
+
+BOOKING_INSTRUCTIONS = """Your goal is to help the client book accommodation.
                 You are able to retrieve information about available rentals and book them.
-                Today's date is {current_date}. Speak dates naturally, for example, instead of "10-05-2025", say "the tenth of May".
+                Today's date is given in <call_data>. Speak dates naturally, for example, instead of "10-05-2025", say "the tenth of May".
                 Follow these steps:
                 1. Present available rentals to the client one by one from the <rentals> section. Provide only a brief description (e.g., name of the rental or type of apartment and general location). Wait for the user to ask for more details if they are interested.
                     Example:
@@ -346,34 +453,35 @@ async def create_booking_flow():
                 3. Use the `get_rental_availability` function to fetch available date spans. Provide the `rental_id` of the selected rental along with the `start_date` and `end_date` parameters in DD-MM-YYYY format. You will need to convert the user's date input to this format.
                    IMPORTANT DATE VALIDATIONS (for your internal processing before calling the function):
                    - Ensure dates are converted to DD-MM-YYYY format.
-                   - Check that the start_date is not in the past (today is {current_date}, speak it naturally).
+                   - Check that the start_date is not in the past (today's date is in <call_data>, speak it naturally).
                    - Verify that the end_date is after the start_date.
                    - If validation fails, the function will return an error message - inform the client naturally and ask for new dates.
                 4. Inform the client about the availability, speaking dates naturally.
                 5. If the client confirms a date and wants to book, use the `create_booking` function. Provide the `rental_id`, `start_date` (check-in), and `end_date` (check-out) for the booking. Ensure all dates are in DD-MM-YYYY format internally.
                 6. After successfully calling `create_booking`, confirm the booking details (rental, check-in date, check-out date, spoken naturally) with the client and inform them that their booking is complete.
                 7. Once the booking is confirmed and the client has no more questions, or if the client wishes to end the conversation at any point, call the `booking_end_quote` function to terminate the call.
-                """
-            },
-            {
-                "role": "system",
-                "content": f"""
-                <rentals>
-                {rentals_list}
-                </rentals>
-                When calling `get_rental_availability` or `create_booking`, ensure you use the correct `rental_id` from the list above for the rental the user is interested in.
+
+                When calling `get_rental_availability` or `create_booking`, ensure you use the correct `rental_id` from the <rentals> section for the rental the user is interested in.
                 Internally, always use DD-MM-YYYY format for dates when calling functions. When speaking to the user, express dates naturally (e.g., "the tenth of May").
                 Remember these validation rules for `get_rental_availability` and before calling `create_booking`:
                 1. Dates must be in DD-MM-YYYY format for function calls.
-                2. Start date must not be before today ({current_date}, spoken naturally).
+                2. Start date must not be before today (given in <call_data>, spoken naturally).
                 3. End date must be after start date.
                 If the user provides dates that don't meet these criteria, explain the issue naturally and ask for new dates before proceeding.
                 """
-            }
-        ],
-        "functions": [get_rental_availability_schema, create_booking_schema, booking_end_quote_schema]
-    }
-    return flow_config
+
+async def create_booking_flow():
+    rentals = await rentals_catalogue.get()
+    rentals_list = rentals_prompt.render(rentals)
+    if rentals and len(rentals) > RENTALS_PROMPT_MAX:
+        rentals_note = f"""These are only {RENTALS_PROMPT_MAX} of {len(rentals)} available rentals. As soon as the client mentions what they are looking for (area, amenities, budget, size), call `search_rentals` with those criteria and present the rentals it returns instead."""
+    else:
+        rentals_note = "These are all available rentals. You can also call `search_rentals` to find the ones matching the client's wishes."
+    # Get current date in DD-MM-YYYY format for the system prompt
+    from datetime import datetime
+    current_date = conversation_clock().strftime("%d-%m-%Y")
+
+    return booking_template.render(rentals=rentals_list, rentals_note=rentals_note, today=current_date)
 
 
 
@@ -382,28 +490,17 @@ async def create_booking_flow():
 async def create_settlement_success_end_node(context: ConversationContext) -> NodeConfig:
     """Creates a node to confirm successful settlement and end the call."""
     # Potentially fetch updated accommodation details if necessary
-    return {
-        "role_messages": [
-            {
-                "role": "system",
-                "content": voice_instructions
-            }
-        ],
-        "task_messages": [
-            {
-                "role": "system",
-                "content": f"Great news, {context.get_client().first_name}! Your settlement has been successfully confirmed. We hope you have a wonderful stay at AI Rentals. If you need anything else, feel free to reach out. Goodbye!"
-            }
-        ],
-        "functions": [],
-        "post_actions": [{"type": "end_conversation"}],
-    }
+    return settlement_success_end_template.render(client_first_name=context.get_client().first_name)
 
 async def get_settlement_details_handler(args: FlowArgs, flow_manager: FlowManager):
-    settlement_details = await rentals_controller_get_rental_settlement_details.asyncio(
-        client=crm_client,
-        id=flow_manager.state['context'].get_client_accommodation().rental_id
-    )
+    try:
+        # Usually prefetched while the client was greeted
+        settlement_details = await flow_manager.state['intent_prefetch'].get_settlement_details(
+            flow_manager.state['context'].get_client_accommodation().rental_id
+        )
+    except DeadlineExceeded as e:
+        logger.warning(f"Settlement details timed out: {e}")
+        return {"status": "error", "message": "The settlement instructions are taking longer than usual to load. Apologize briefly, ask the client to hold on for a moment and call get_settlement_details again."}
     print(settlement_details)
     return {"status": "success", "settlement_details": settlement_details.settlement_details}
 
@@ -431,56 +528,21 @@ settlement_success_conclude_call_schema = FlowsFunctionSchema(
     handler=settlement_success_conclude_call_handler,
 )
 
-async def create_settlement_flow(context: ConversationContext) -> dict:
-    settlement_check = context.check_is_allowed_to_settle()
-    client_name = context.get_client().first_name if context.get_client() else "there"
-    print(settlement_check)
-    if not settlement_check["success"]:
-        denial_reason = settlement_check["message"]
-        flow_config = {
-            "role_messages": [
-                {
-                    "role": "system",
-                    "content": voice_instructions
-                }
-            ],
-            "task_messages": [
-                {
-                    "role": "system",
-                    # Need to be rewritten to be actual prompt
-                    "content": f"Hello {client_name}. You've indicated you'd like to settle in. I've checked the details for your accommodation. You need to inform the user clearly that settlement cannot proceed right now due to the following reason: '{denial_reason}'. After explaining this, you should inform caller that you are unable to help him and ending the call."
-                }
-            ],
-            "functions": [],
-            "post_actions": [{"type": "end_conversation"}],
-        }
-        return flow_config
-    
-    flow_config = {
-        "role_messages": [
-            {
-                "role": "system",
-                "content": voice_instructions
-            }   
-        ],
-        "task_messages": [
-            {
-                "role": "system",
-                "content": f"""Your primary role is to assist {context.get_client().first_name}, our valued guest, with settling into their accommodation: {context.get_client_accommodation()}.
+SETTLEMENT_INSTRUCTIONS = """Your primary role is to assist the client, our valued guest, with settling into their accommodation described in <call_data>.
                 You are to embody the persona of a friendly, patient, and very helpful property owner guiding them remotely, step-by-step. Think of this as a casual, helpful phone call where you're making sure they get in smoothly and without any fuss. Your language should be natural and flowing.
 
-                Your first action is to call the \`get_settlement_details\` function. This function will provide you with specific, ordered, step-by-step instructions. Treat each instruction from these details as a goal that you might need to break down into several smaller, sequential conversational turns to guide the user effectively.
+                Your first action is to call the `get_settlement_details` function. This function will provide you with specific, ordered, step-by-step instructions. Treat each instruction from these details as a goal that you might need to break down into several smaller, sequential conversational turns to guide the user effectively.
 
                 Once you have received the settlement instructions from the function:
 
                 1.  **Getting Started - Location and First Instruction Piece**:
-                    *   Your very first question to {context.get_client().first_name} is to confirm their current location. Phrasing should be friendly: "Hi {context.get_client().first_name}, it's AI Rentals. To help you get settled in, could you tell me where you are right now in relation to the property?"
-                    *   Once they confirm their location (e.g., "I'm right outside"), acknowledge naturally ("Okay, perfect!") and then begin guiding them through the *first instruction* from \`get_settlement_details\`. If the first instruction is multi-part (e.g., "The entrance is on the left side of the building; intercom code: 045"), break it down. 
+                    *   Your very first question to the client is to confirm their current location. Phrasing should be friendly: "Hi [client's first name], it's AI Rentals. To help you get settled in, could you tell me where you are right now in relation to the property?"
+                    *   Once they confirm their location (e.g., "I'm right outside"), acknowledge naturally ("Okay, perfect!") and then begin guiding them through the *first instruction* from `get_settlement_details`. If the first instruction is multi-part (e.g., "The entrance is on the left side of the building; intercom code: 045"), break it down. 
                         Example LLM first guiding turn (after location confirmation): "Great, glad you're there! So, the first thing is to find the main entrance – it should be on the left side of the building. Can you spot that for me?"
 
                 2.  **Guiding Through Instructions - The Conversational Loop**:
-                    *   For each instruction from \`get_settlement_details\` (or part of a broken-down instruction):
-                        *   Wait for {context.get_client().first_name} to indicate they've completed the previous action or are ready for the next piece of information.
+                    *   For each instruction from `get_settlement_details` (or part of a broken-down instruction):
+                        *   Wait for the client to indicate they've completed the previous action or are ready for the next piece of information.
                         *   **Natural Feedback**: Offer positive feedback (e.g., "Excellent!", "Sounds good!", "Perfect!") when it feels natural and encouraging, especially after a slightly more complex step or if the user expresses success. Avoid cheering after every single confirmation from the user, as this can sound repetitive.
                         *   **Deliver Next Piece of Instruction**: Provide the next clear action or piece of information from the current settlement instruction. Keep each individual guiding sentence focused and relatively concise. If an instruction involves multiple actions (e.g., 'find X, then use code Y, then open Z'), guide the user through each part sequentially, one main action or query per turn.
                             *   Example of breaking down "The entrance is on the left side of the building; intercom code: 045":
@@ -498,23 +560,31 @@ async def create_settlement_flow(context: ConversationContext) -> dict:
                     *   Maintain a consistently warm, patient, and encouraging tone.
 
                 5.  **Handling Difficulties Gracefully**:
-                    *   If {context.get_client().first_name} mentions they're having trouble, respond with patience: "No worries at all! Let's try that bit again. So, you're looking for [repeat/rephrase instruction clearly]." or "Okay, let's figure this out. Can you tell me a bit more about what you're seeing there?" Stick to the information provided in \`get_settlement_details\`.
+                    *   If the client mentions they're having trouble, respond with patience: "No worries at all! Let's try that bit again. So, you're looking for [repeat/rephrase instruction clearly]." or "Okay, let's figure this out. Can you tell me a bit more about what you're seeing there?" Stick to the information provided in `get_settlement_details`.
 
-                6.  **Completing the Steps**: Continue this natural, step-by-step guidance until all instructions from \`get_settlement_details\` have been completed, and {context.get_client().first_name} is successfully inside the property.
+                6.  **Completing the Steps**: Continue this natural, step-by-step guidance until all instructions from `get_settlement_details` have been completed, and the client is successfully inside the property.
 
-                7.  **Final Confirmation and Function Call**: After {context.get_client().first_name} confirms completion of the *final* instruction from `get_settlement_details` (meaning they should now be inside the property), your next step is to ask a brief, final question to ensure they are indeed inside and everything is satisfactory. For example: "Fantastic, sounds like you're all in! Is everything looking good inside the apartment?"
-                    Once {context.get_client().first_name} gives a clear positive confirmation to your question (e.g., "Yes, all good!"), your immediate next action MUST be to call the `mark_user_get_inside` function. It is crucial that you do NOT provide any further verbal response, pleasantries, or farewells yourself in this current flow; the `mark_user_get_inside` function call is your very next action and will trigger the appropriate concluding messages from a subsequent flow.
+                7.  **Final Confirmation and Function Call**: After the client confirms completion of the *final* instruction from `get_settlement_details` (meaning they should now be inside the property), your next step is to ask a brief, final question to ensure they are indeed inside and everything is satisfactory. For example: "Fantastic, sounds like you're all in! Is everything looking good inside the apartment?"
+                    Once the client gives a clear positive confirmation to your question (e.g., "Yes, all good!"), your immediate next action MUST be to call the `mark_user_get_inside` function. It is crucial that you do NOT provide any further verbal response, pleasantries, or farewells yourself in this current flow; the `mark_user_get_inside` function call is your very next action and will trigger the appropriate concluding messages from a subsequent flow.
 
                 Remember, the initial greeting has already been handled. Your conversation should pick up naturally. Absolutely do not greet the client again.
-                The client\'s full name is {context.get_client().first_name} {context.get_client().last_name}.
+                The client's name and accommodation are in <call_data>.
                 """
-            }   
-        ],
-        "functions": [get_settlement_details_schema, settlement_success_conclude_call_schema],
-    }
-    return flow_config
-  
-    
+
+async def create_settlement_flow(context: ConversationContext) -> dict:
+    settlement_check = context.check_is_allowed_to_settle()
+    client_name = context.get_client().first_name if context.get_client() else "there"
+    print(settlement_check)
+    if not settlement_check["success"]:
+        return settlement_denied_template.render(client_first_name=client_name, denial_reason=settlement_check["message"])
+
+    client = context.get_client()
+    return settlement_template.render(
+        client_first_name=client.first_name,
+        client_full_name=f"{client.first_name} {client.last_name}",
+        accommodation=context.get_client_accommodation(),
+    )
+
 
 async def get_emergency_details_handler(args: FlowArgs, flow_manager: FlowManager):
     try:
@@ -523,16 +593,16 @@ async def get_emergency_details_handler(args: FlowArgs, flow_manager: FlowManage
             logger.error("Rental ID not found in context for emergency details.")
             return {"status": "error", "message": "Could not find your current rental information."}
         
-        emergency_details_dto = await rentals_controller_get_rental_emergency_details.asyncio(
-            client=crm_client,
-            id=rental_id
-        )
+        emergency_details_dto = await flow_manager.state['intent_prefetch'].get_emergency_details(rental_id)
         if emergency_details_dto and emergency_details_dto.emergency_details:
             logger.info(f"Fetched emergency details for rental {rental_id}")
             return {"status": "success", "emergency_details": emergency_details_dto.emergency_details}
         else:
             logger.warning(f"No emergency details found for rental {rental_id}")
             return {"status": "success", "emergency_details": "No specific emergency instructions are available for this rental. I can still help with general information or try to connect you to support if needed."}
+    except DeadlineExceeded as e:
+        logger.warning(f"Emergency details timed out: {e}")
+        return {"status": "error", "message": "The emergency instructions for this rental could not be loaded in time. If anyone is in danger, tell the client to call 112 right away. Otherwise give general safety advice and offer to try again."}
     except AttributeError:
         logger.error("Client accommodation or rental ID not found in context.")
         return {"status": "error", "message": "I couldn\'t retrieve your accommodation details. Please ensure you have an active booking."}
@@ -550,19 +620,7 @@ get_emergency_details_schema = FlowsFunctionSchema(
 
 async def create_info_or_emergency_end_node(context: ConversationContext) -> NodeConfig:
     client_name = context.get_client().first_name if context.get_client() else "there"
-    return {
-        "role_messages": [
-            {"role": "system", "content": voice_instructions}
-        ],
-        "task_messages": [
-            {
-                "role": "system",
-                "content": f"Okay {client_name}, I hope I was able to assist you. If you need anything else, please don\'t hesitate to call again. Goodbye!"
-            }
-        ],
-        "functions": [],
-        "post_actions": [{"type": "end_conversation"}],
-    }
+    return info_or_emergency_end_template.render(client_first_name=client_name)
 
 async def info_or_emergency_conclude_call_handler(args: FlowArgs, flow_manager: FlowManager):
     node_config = await create_info_or_emergency_end_node(flow_manager.state['context'])
@@ -578,44 +636,7 @@ info_or_emergency_conclude_call_schema = FlowsFunctionSchema(
     handler=info_or_emergency_conclude_call_handler,
 )
 
-async def create_info_or_emergency_flow(context: ConversationContext) -> dict:
-    client_name = context.get_client().first_name if context.get_client() else "Guest"
-    
-    stay_check = context.is_currently_staying()
-    if not stay_check["success"]:
-        denial_reason = stay_check["message"]
-        logger.warning(f"Info/Emergency flow denied for {client_name if context.get_client() else 'Unknown Client'}: {denial_reason}")
-        flow_config = {
-            "role_messages": [
-                {"role": "system", "content": voice_instructions}
-            ],
-            "task_messages": [
-                {
-                    "role": "system",
-                    "content": f"Hello {client_name}. I understand you're looking for information or assistance. However, I can only provide specific emergency or informational details for guests who are currently settled and whose stay is ongoing. My records show: '{denial_reason}'. If you believe this is an error, please contact our support line. For now, I won't be able to proceed with this specific request. Is there anything general I can help you with before we disconnect?"
-                    # Alternative: a more direct ending if no general help is offered.
-                    # "content": f"Hello {client_name}. I understand you're looking for information or assistance. However, my records show: '{denial_reason}'. Therefore, I cannot proceed with providing specific emergency or rental information at this time. Please contact our support line if you believe this is incorrect. Goodbye."
-                }
-            ],
-            "functions": [], # No functions needed if we are just informing and ending.
-            "post_actions": [{"type": "end_conversation"}]
-        }
-        return flow_config
-
-    # If stay_check passed, we know accommodation is valid and has a rental_id.
-    accommodation = context.get_client_accommodation()
-
-    flow_config = {
-        "role_messages": [
-            {
-                "role": "system",
-                "content": voice_instructions
-            }
-        ],
-        "task_messages": [
-            {
-                "role": "system",
-                "content": f"""Your primary role is to assist {client_name} with their information request or emergency concerning their accommodation: {accommodation}.
+INFO_OR_EMERGENCY_INSTRUCTIONS = """Your primary role is to assist the client with their information request or emergency concerning their accommodation described in <call_data>.
                 You are to embody the persona of a calm, helpful, and efficient assistant.
 
                 Your first action is to call the `get_emergency_details` function. This function will provide you with specific instructions or information related to the rental.
@@ -627,7 +648,7 @@ async def create_info_or_emergency_flow(context: ConversationContext) -> dict:
                     *   **If the details suggest an URGENT EMERGENCY (e.g., mentions fire, gas leak, immediate danger):**
                         *   Your responses MUST be as SHORT and CLEAR as possible. Brevity is key.
                         *   Relay the critical instructions from `emergency_details` immediately and precisely.
-                        *   Example: "Okay, {client_name}, the instructions say: [critical instruction]. Please do that now."
+                        *   Example: "Okay, [client's first name], the instructions say: [critical instruction]. Please do that now."
                         *   If the instructions advise calling emergency services, state that clearly: "The instructions say to call emergency services at [phone number if provided, otherwise 'your local emergency number']. Please do so immediately."
                         *   After relaying critical emergency steps, if appropriate and you are not advising to call emergency services directly as the primary step, you may then call `info_or_emergency_conclude_call` or await further instruction from the user if they are still on the line and it's safe to continue.
                     *   **If the details are INFORMATIONAL or describe a NON-IMMEDIATE issue:**
@@ -636,24 +657,35 @@ async def create_info_or_emergency_flow(context: ConversationContext) -> dict:
                         *   Example: "I have the information for you. It says: [details from function]. Does that help, or do you have more questions?"
 
                 2.  **Guiding and Assisting**:
-                    *   Listen to {client_name}\'s responses and questions carefully.
+                    *   Listen to the client's responses and questions carefully.
                     *   Provide assistance based on the information you have.
-                    *   If you don\'t have the answer, be honest. You can say something like: "I don\'t have that specific information, but I can [suggest an alternative, e.g., note it down, suggest they contact support through another channel if appropriate after this call]."
+                    *   If you don't have the answer, be honest. You can say something like: "I don't have that specific information, but I can [suggest an alternative, e.g., note it down, suggest they contact support through another channel if appropriate after this call]."
 
                 3.  **Concluding the Interaction**:
-                    *   Once {client_name} confirms they have the information they need, or the emergency steps (that you can guide them through) are completed, or if they indicate they will take over (e.g., by calling emergency services as instructed), you MUST call the `info_or_emergency_conclude_call` function.
+                    *   Once the client confirms they have the information they need, or the emergency steps (that you can guide them through) are completed, or if they indicate they will take over (e.g., by calling emergency services as instructed), you MUST call the `info_or_emergency_conclude_call` function.
                     *   Do not say goodbye yourself; the function call will handle the call conclusion.
 
                 Remember, the initial greeting has already been handled. Your conversation should pick up naturally. Absolutely do not greet the client again.
-                The client\'s full name is {context.get_client().first_name} {context.get_client().last_name}.
-                Current accommodation details: {accommodation}.
+                The client's name and accommodation are in <call_data>.
                 Speak clearly and calmly, especially if it seems like an emergency. If it is an emergency, prioritize brevity and directness in your speech after obtaining details from the function.
                 """
-            }
-        ],
-        "functions": [get_emergency_details_schema, info_or_emergency_conclude_call_schema],
-    }
-    return flow_config
+
+async def create_info_or_emergency_flow(context: ConversationContext) -> dict:
+    client_name = context.get_client().first_name if context.get_client() else "Guest"
+    
+    stay_check = context.is_currently_staying()
+    if not stay_check["success"]:
+        denial_reason = stay_check["message"]
+        logger.warning(f"Info/Emergency flow denied for {client_name if context.get_client() else 'Unknown Client'}: {denial_reason}")
+        return info_or_emergency_denied_template.render(client_first_name=client_name, denial_reason=denial_reason)
+
+    # If stay_check passed, we know accommodation is valid and has a rental_id.
+    client = context.get_client()
+    return info_or_emergency_template.render(
+        client_first_name=client_name,
+        client_full_name=f"{client.first_name} {client.last_name}",
+        accommodation=context.get_client_accommodation(),
+    )
 
 async def route_client_to_intent_handler(args: FlowArgs, flow_manager: FlowManager):
     intent = args.get("intent")
@@ -661,10 +693,13 @@ async def route_client_to_intent_handler(args: FlowArgs, flow_manager: FlowManag
     if intent == "booking":
         await flow_manager.set_node("booking",  await create_booking_flow())
     elif intent == "settlement":
+        # The accommodation is fetched in the background while the client is greeted
+        await flow_manager.state['caller_lookup'].wait_for_accommodation()
         # Pass flow_manager to create_settlement_flow as it needs to set state
         settlement_flow_config = await create_settlement_flow(flow_manager.state['context'])
         await flow_manager.set_node("settlement", settlement_flow_config)
     elif intent == "info-or-emergency":
+        await flow_manager.state['caller_lookup'].wait_for_accommodation()
         info_emergency_flow_config = await create_info_or_emergency_flow(flow_manager.state['context'])
         await flow_manager.set_node("info_or_emergency", info_emergency_flow_config)
     else:
@@ -682,36 +717,18 @@ route_client_to_intent_schema = FlowsFunctionSchema(
 
 async def create_booking_end_node(context: ConversationContext) -> NodeConfig:
     """Create the final node."""
-    booking_details = await clients_controller_get_current_accommodation.asyncio(
-        client=crm_client,
-        id=context.get_client().id
-    )
+    try:
+        booking_details = await clients_controller_get_current_accommodation.asyncio(
+            client=crm_client,
+            id=context.get_client().id
+        )
+    except DeadlineExceeded as e:
+        # The booking itself is done; the client just hears a shorter summary
+        logger.warning(f"Booking details timed out: {e}")
+        booking_details = "The booking is confirmed. The details will be sent to the client shortly."
 
-    return {
-        "role_messages": [
-            {
-                "role": "system",
-                "content": voice_instructions
-            }
-        ],
-        "task_messages": [
-            {
-                "role": "system",
-                "content": (
-                    f"""Thank the customer for their time and end the conversation. 
-                    Mention that a representative will contact them about the quote. 
-                    Client name is: {context.get_client().first_name} {context.get_client().last_name}
-                    Inform client that he has booked accommodation with the following details:
-                    <accommodation>
-                    {booking_details}
-                    </accommodation>
-                    """
-                ),
-            }
-        ],
-        "functions": [],
-        "post_actions": [{"type": "end_conversation"}],
-    }
+    client = context.get_client()
+    return booking_end_template.render(client_full_name=f"{client.first_name} {client.last_name}", booked_accommodation=booking_details)
 
 async def booking_end_quote_handler(args: FlowArgs, flow_manager: FlowManager):
     node = await create_booking_end_node(context=flow_manager.state['context'])
@@ -725,98 +742,174 @@ booking_end_quote_schema = FlowsFunctionSchema(
     handler=booking_end_quote_handler,
 )
 
-def create_client_initial_flow(context: ConversationContext):
-    flow_config = {
-        "role_messages": [
-            {
-                "role": "system",
-                "content": voice_instructions
-            }
-        ],
-        "task_messages": [
-            {
-                "role": "system",
-                "content": """Start by greeting the user with message calling him by name. Use introduction message:
-                "Welcome to AI Assistant Rentals. I am your personal assistant. I can help you with booking, settlement and emergencies"
-                Account for note and preferences.
-                After you have understood client's intent: do not respond to customer and immediately call route_client_to_intent function with intent as argument.
-                """
-            },
-            {
-                "role": "system",
-                "content": f"""
-                Client name is: {context.get_client().first_name} {context.get_client().last_name}
-                You can call client by name.
-                <note>
-                {context.get_client().note}
-                </note>
-                <preferences>
-                Client preferences are: {context.get_client().preferences}
-                </preferences>
+def create_client_accommodation_message(context: ConversationContext) -> dict:
+    return {
+        "role": "system",
+        "content": f"""
                 <accommodation>
                 Client accommodation is: {context.get_client_accommodation()}
                 In case he has no accommodation, you should ask him to book one.
                 </accommodation>
                 """
-            }
-        ],
-        "functions": [initial_collect_full_name_schema, route_client_to_intent_schema]
     }
-    return flow_config
 
+CLIENT_INITIAL_INSTRUCTIONS = """The introduction message has already been played to the user:
+                "Welcome to AI Assistant Rentals. I am your personal assistant. I can help you with booking, settlement and emergencies."
+                Do not repeat it. Continue by greeting the user calling him by name and asking how you can help.
+                Account for note and preferences.
+                After you have understood client's intent: do not respond to customer and immediately call route_client_to_intent function with intent as argument.
+                The client's name, note, preferences and accommodation are in <call_data>. You can call client by name.
+                In case he has no accommodation, you should ask him to book one.
+                """
 
-logger.remove(0)
-logger.add(sys.stderr, level="DEBUG")
+def create_client_initial_flow(context: ConversationContext, accommodation_loaded: bool = True):
+    client = context.get_client()
+    client_name = f"{client.first_name} {client.last_name}"
+    if not accommodation_loaded:
+        return client_initial_loading_template.render(client_name=client_name, note=client.note, preferences=client.preferences)
+    return client_initial_template.render(
+        client_name=client_name,
+        note=client.note,
+        preferences=client.preferences,
+        accommodation=context.get_client_accommodation(),
+    )
 
 
-class TranscriptionLogger(FrameProcessor):
-    async def process_frame(self, frame: Frame, direction: FrameDirection):
-        await super().process_frame(frame, direction)
+# Node templates are compiled once per process; creating them checks their placeholders, so a broken one fails at startup
+end_conversation = [{"type": "end_conversation"}]
+# Spoken with the play_phrase action before the LLM continues the greeting
+play_welcome = [{"type": "play_phrase", "text": WELCOME_PHRASE}]
+unknown_client_initial_template = prompt_layout.create_template(
+    "initial", UNKNOWN_CLIENT_INITIAL_INSTRUCTIONS, functions=[initial_collect_full_name_schema], pre_actions=play_welcome,
+)
+client_initial_template = prompt_layout.create_template(
+    "initial", CLIENT_INITIAL_INSTRUCTIONS,
+    placeholders=("client_name", "note", "preferences", "accommodation"),
+    functions=[initial_collect_full_name_schema, route_client_to_intent_schema],
+    pre_actions=play_welcome,
+)
+client_initial_loading_template = prompt_layout.create_template(
+    "initial", CLIENT_INITIAL_INSTRUCTIONS,
+    placeholders=("client_name", "note", "preferences"),
+    shared=["Client accommodation details are still loading and will follow in a separate message. Do not talk about the accommodation until you have them."],
+    functions=[initial_collect_full_name_schema, route_client_to_intent_schema],
+    pre_actions=play_welcome,
+)
+# The rentals only change when the catalogue is refreshed, so they go before the call data
+booking_template = prompt_layout.create_template(
+    "booking", BOOKING_INSTRUCTIONS,
+    placeholders=("rentals", "rentals_note", "today"),
+    shared=["""
+                <rentals>
+$rentals
+                </rentals>
+                The rentals are listed one per line with the fields named in the first line, separated by "|".
+                $rentals_note
+                """],
+    functions=[search_rentals_schema, get_rental_availability_schema, create_booking_schema, booking_end_quote_schema],
+)
+booking_end_template = prompt_layout.create_template(
+    "booking_end_quote",
+    """Thank the customer for their time and end the conversation. 
+                    Mention that a representative will contact them about the quote. 
+                    Call the client by the name given in <call_data>.
+                    Inform client that he has booked accommodation with the details given in <call_data>.
+                    """,
+    placeholders=("client_full_name", "booked_accommodation"),
+    post_actions=end_conversation,
+)
+settlement_template = prompt_layout.create_template(
+    "settlement", SETTLEMENT_INSTRUCTIONS,
+    placeholders=("client_first_name", "client_full_name", "accommodation"),
+    functions=[get_settlement_details_schema, settlement_success_conclude_call_schema],
+)
+# Need to be rewritten to be actual prompt
+settlement_denied_template = prompt_layout.create_template(
+    "settlement",
+    "You've indicated you'd like to settle in. Greet the client by the first name from <call_data>. I've checked the details for your accommodation. You need to inform the user clearly that settlement cannot proceed right now due to the denial reason given in <call_data>. After explaining this, you should inform caller that you are unable to help him and ending the call.",
+    placeholders=("client_first_name", "denial_reason"),
+    post_actions=end_conversation,
+)
+settlement_success_end_template = prompt_layout.create_template(
+    "settlement_success_final",
+    "Tell the client, calling them by the first name from <call_data>: \"Great news! Your settlement has been successfully confirmed.\" Say nothing else: the goodbye is played right after you.",
+    placeholders=("client_first_name",),
+    # end_conversation speaks its text after the LLM response and then ends the call
+    post_actions=[{"type": "end_conversation", "text": SETTLEMENT_GOODBYE_PHRASE}],
+)
+info_or_emergency_template = prompt_layout.create_template(
+    "info_or_emergency", INFO_OR_EMERGENCY_INSTRUCTIONS,
+    placeholders=("client_first_name", "client_full_name", "accommodation"),
+    functions=[get_emergency_details_schema, info_or_emergency_conclude_call_schema],
+)
+# No functions needed if we are just informing and ending.
+info_or_emergency_denied_template = prompt_layout.create_template(
+    "info_or_emergency",
+    "Greet the client by the first name from <call_data>. I understand you're looking for information or assistance. However, I can only provide specific emergency or informational details for guests who are currently settled and whose stay is ongoing. Tell the client what the records show, using the denial reason from <call_data>. If you believe this is an error, please contact our support line. For now, I won't be able to proceed with this specific request. Is there anything general I can help you with before we disconnect?",
+    placeholders=("client_first_name", "denial_reason"),
+    post_actions=end_conversation,
+)
+info_or_emergency_end_template = prompt_layout.create_template(
+    "info_or_emergency_end_final",
+    "Tell the client, calling them by the first name from <call_data>: \"Okay, I hope I was able to assist you.\" Say nothing else: the goodbye is played right after you.",
+    placeholders=("client_first_name",),
+    post_actions=[{"type": "end_conversation", "text": INFO_OR_EMERGENCY_GOODBYE_PHRASE}],
+)
 
-        if isinstance(frame, TranscriptionFrame):
-            print(f"Transcription: {frame.text}")
 
+logger.remove(0)
+logger.add(sys.stderr, level="DEBUG")
 
 
-async def main(input_device: int, output_device: int):
-    transport = LocalAudioTransport(
-        LocalAudioTransportParams(
-            audio_in_enabled=True,
-            audio_out_enabled=True,
-            input_device_index=input_device,
-            output_device_index=output_device,
-        )
-    )
+def create_call_services() -> Tuple[STTService, OpenAILLMService, TTSService]:
+    """Speech-to-text, LLM and text-to-speech services of one call"""
     stt = DeepgramSTTService(api_key=os.getenv("DEEPGRAM_API_KEY"), live_options=LiveOptions(language="en", model="nova-2", smart_format=True))
+    llm = OpenAILLMService(api_key=os.getenv("OPENAI_API_KEY"))
+    tts = CartesiaTTSService(api_key=os.getenv("CARTESIA_API_KEY"), voice_id=TTS_VOICE_ID, model=TTS_MODEL)
+    return stt, llm, tts
 
 
-    llm = OpenAILLMService(api_key=os.getenv("OPENAI_API_KEY"))
+async def run_call(session_id: str, phone_number: str, transport, services: Optional[Tuple[STTService, OpenAILLMService, TTSService]] = None):
+    """
+    Run one call end to end. Every object created here belongs to this call only.
+
+    ``services`` replaces the STT, LLM and TTS services of create_call_services, e.g. with the scripted fakes of
+    benchmarks.call_load.
+    """
+    stt, llm, tts = services or create_call_services()
  
     llm_context = OpenAILLMContext() # Renamed from 'context' for clarity
     context_aggregator = llm.create_context_aggregator(llm_context)
     
-    tts = CartesiaTTSService(api_key=os.getenv("CARTESIA_API_KEY"), voice_id="5c42302c-194b-4d0c-ba1a-8cb485c84ab9", model="sonic-2")
-    audiobuffer = AudioBufferProcessor()
+    audiobuffer = AudioBufferProcessor(buffer_size=RECORDING_CHUNK_BYTES)
 
 
+    speech_gate = SpeechGate(pre_roll_secs=VAD_PRE_ROLL_SECS) if VAD_GATE else None
+
     pipeline = Pipeline([
         transport.input(),
+        *([speech_gate] if speech_gate else []),
         # user_audio_recorder,      # Removed
         stt,
-        # tl, # Not using TranscriptionLogger for final transcript
         context_aggregator.user(),
         llm,
+        *([CachedPhrasePlayer(phrase_audio)] if phrase_audio is not None else []),
         tts,
         audiobuffer,
         transport.output(),
         context_aggregator.assistant()
     ])
 
+    # Sees the frames of every stage, so per-turn latency is measured without adding a processor to the pipeline
+    turn_latency = TurnLatencyObserver(turn_latency_stats)
+
+    # PipelineTask's default clock is one instance for the whole process, restarted by every call that starts, so
+    # concurrent calls would see each other's restarts in their frame timestamps
     task = PipelineTask(pipeline, params=PipelineParams(
         audio_in_sample_rate=16000, 
-        audio_out_sample_rate=16000,
+        audio_out_sample_rate=AUDIO_OUT_SAMPLE_RATE,
         allow_interruptions=True
-    ))
+    ), clock=SystemClock(), idle_timeout_secs=CALL_IDLE_TIMEOUT_SECS or None, observers=[turn_latency])
     
     flow_manager = FlowManager(
         task=task,
@@ -824,11 +917,36 @@ async def main(input_device: int, output_device: int):
         context_aggregator=context_aggregator,
         tts=tts,
     )
-    phone_number="+380991111112"
+    async def play_phrase(action: dict):
+        # Goes down the pipeline as a TTSSpeakFrame, so a cached phrase never reaches TTS
+        await task.queue_frame(TTSSpeakFrame(text=action["text"]))
+
+    flow_manager.register_action("play_phrase", play_phrase)
+    set_node = flow_manager.set_node
+
+    async def set_node_and_record_prompt_size(node_id: str, node_config: NodeConfig):
+        prompt_size_report.record(node_id, node_config)
+        await set_node(node_id, node_config)
+
+    # Every node goes through set_node, so this sees the prompt size of all of them
+    flow_manager.set_node = set_node_and_record_prompt_size
     
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    recorder = CallRecorder(
+        lambda sample_rate, num_channels: create_recording_sink(
+            f"{session_id}_conversation_recording{timestamp}{RECORDING_FORMAT.extension}", sample_rate, num_channels
+        )
+    )
+
     @audiobuffer.event_handler("on_audio_data")
     async def on_audio_data(buffer, audio, sample_rate, num_channels):
-        print(f"Audio data received. Length: {len(audio)}, SR: {sample_rate}, Channels: {num_channels}")
+        # Called every RECORDING_CHUNK_BYTES and once more with the remainder when recording stops
+        try:
+            await recorder.on_audio_data(audio, sample_rate, num_channels)
+        except Exception:
+            logger.exception("Failed to write audio chunk")
+
+    async def publish_call_completed():
         conversation_messages = []
         if hasattr(llm_context, 'messages') and isinstance(llm_context.messages, list):
             conversation_messages = llm_context.messages
@@ -846,7 +964,7 @@ async def main(input_device: int, output_device: int):
         
         # Try to save audio, but continue if it fails
         try:
-            file_id = await save_audio(audio, sample_rate, num_channels, "full")
+            file_id = await recorder.finish()
         except Exception as e:
             print(f"Failed to save audio: {str(e)}")
             file_id = None
@@ -856,58 +974,168 @@ async def main(input_device: int, output_device: int):
             client.id if client else None,
             accommodation.id if accommodation else None,
             filtered_transcript,
-            file_id
+            file_id,
+            turn_latency.get_latency(),
         )
         print("CallCompletedEvent:", event.to_plain())
 
-        call_completed_queue = Queue("call-completed", {"connection": REDIS_URL})
-        await call_completed_queue.add("call-completed", event.to_plain())
-        await call_completed_queue.close()
+        await call_completed_outbox.append(event)
 
 
 
 
     flow_manager.state['context'] = ConversationContext(
         phone_number=phone_number,
+        now=conversation_clock,
     )
-    await audiobuffer.start_recording()
-    client_info = await search_client_by_phone_number(phone_number)
-    if client_info is not None:
-        flow_manager.state['context'].set_client(client_info)
-        client_accommodation = await clients_controller_get_current_accommodation.asyncio(
-            client=crm_client,
-            id=client_info.id
+    # Phone lookup runs while the pipeline is being set up; the accommodation follows in the background
+    caller_lookup = CallerLookup(crm_client, flow_manager.state['context'])
+    flow_manager.state['caller_lookup'] = caller_lookup
+    # Settlement and emergency details are fetched as soon as the accommodation shows the client may need them
+    intent_prefetch = IntentPrefetch(crm_client, flow_manager.state['context'])
+    flow_manager.state['intent_prefetch'] = intent_prefetch
+    if INTENT_PREFETCH:
+        caller_lookup.on_accommodation(intent_prefetch.on_accommodation)
+    caller_lookup.start()
+    try:
+        await audiobuffer.start_recording()
+        await flow_manager.initialize()
+        client_info = await caller_lookup.wait_for_client()
+
+        if client_info is None:
+            await flow_manager.set_node("initial", create_unknown_client_initial_flow())
+        else:
+            accommodation_loaded = caller_lookup.is_accommodation_loaded()
+            await flow_manager.set_node("initial", create_client_initial_flow(flow_manager.state['context'], accommodation_loaded))
+            if not accommodation_loaded:
+                # Registered after the initial node is queued so the details are appended to it, not replaced by it
+                async def send_accommodation(accommodation):
+                    await task.queue_frames([LLMMessagesAppendFrame(messages=[
+                        create_client_accommodation_message(flow_manager.state['context'])
+                    ])])
+
+                caller_lookup.on_accommodation(send_accommodation)
+
+        # Signals belong to the call server, not to individual calls
+        runner = PipelineRunner(handle_sigint=False)
+
+        logger.info(f"Starting pipeline runner for call {session_id}...")
+        await runner.run(task)
+        logger.info(f"Pipeline runner for call {session_id} has finished.")
+
+        # Flushes the last chunk through on_audio_data and resets the audio buffers
+        await audiobuffer.stop_recording()
+        await publish_call_completed()
+        logger.debug(f"Upload executor: {upload_executor.get_metrics()}")
+        logger.debug(f"CRM requests: {crm_single_flight.started} sent, {crm_single_flight.coalesced} coalesced")
+        logger.debug(f"CRM connection pool: {connection_pool.get_pool_metrics(crm_client, crm_pool_limits)}")
+        logger.debug(f"CRM latency: {crm_deadlines.get_metrics()}")
+        logger.debug(f"Prompt tokens per node: {prompt_size_report.get_report()}")
+        logger.debug(f"Intent prefetch: {intent_prefetch.get_metrics()}")
+        if phrase_audio is not None:
+            logger.debug(f"Phrase audio cache: {phrase_audio.get_metrics()}")
+        if speech_gate:
+            logger.debug(f"Audio sent to STT: {speech_gate.get_metrics()}")
+        logger.debug(f"Turn latency (ms): {turn_latency_stats.get_metrics()}")
+    finally:
+        caller_lookup.cancel()
+        intent_prefetch.cancel()
+        # Only left with a sink here when the call failed before the recording was finished
+        await recorder.discard()
+        # Drop everything this call accumulated so a long-running server does not keep it alive
+        llm_context.set_messages([])
+        flow_manager.state.clear()
+
+
+def create_local_audio_transport(input_device_index: int, output_device_index: int) -> LocalAudioTransport:
+    return LocalAudioTransport(
+        LocalAudioTransportParams(
+            audio_in_enabled=True,
+            audio_out_enabled=True,
+            input_device_index=input_device_index,
+            output_device_index=output_device_index,
+            # The analyzer keeps state per audio stream, so every transport gets its own
+            vad_analyzer=SileroVADAnalyzer(params=VADParams(stop_secs=VAD_STOP_SECS)) if VAD_GATE else None,
         )
-        flow_manager.state['context'].set_client_accommodation(client_accommodation)
-    
-    await flow_manager.initialize()
+    )
 
-    if flow_manager.state['context'].get_client() is None:
-        await flow_manager.set_node("initial", create_unknown_client_initial_flow())
-    else:
-        await flow_manager.set_node("initial", create_client_initial_flow(flow_manager.state['context']))
 
-    runner = PipelineRunner(handle_sigint=False if sys.platform == "win32" else True)
+async def start_call_process():
+    """Bring up the clients and caches shared by every call in this process."""
+    global phrase_audio
+    if not await recordings_bucket.ensure_ready():
+        logger.warning(f"Recordings bucket {S3_BUCKET} is not available, it will be checked again on the first upload")
+    upload_spill.start()
+    await call_completed_publisher.start()
+    await call_completed_outbox.start()
+    # The first caller should not pay for the TCP and TLS handshakes
+    warm_connections = await connection_pool.warm_up(crm_client, CRM_WARM_CONNECTIONS)
+    logger.info(f"Opened {warm_connections} of {CRM_WARM_CONNECTIONS} CRM connections")
+    await rentals_catalogue.warm()
+    if PHRASE_AUDIO_CACHE and phrase_audio is None:
+        phrase_audio = PhraseAudio(
+            PhraseAudioCache(PHRASE_AUDIO_CACHE_DIR, max_bytes=PHRASE_AUDIO_CACHE_BYTES),
+            CartesiaPhraseSynthesizer(os.getenv("CARTESIA_API_KEY"), TTS_VOICE_ID, TTS_MODEL),
+        )
+    if phrase_audio is not None:
+        cached, ready = await phrase_audio.warm(FIXED_PHRASES, sample_rate=AUDIO_OUT_SAMPLE_RATE)
+        logger.info(f"Phrase audio: {cached} of {len(FIXED_PHRASES)} phrases were cached, {ready} are ready")
 
-    logger.info("Starting pipeline runner...")
-    await runner.run(task)
-    logger.info("Pipeline runner has finished.")
 
-    await audiobuffer.stop_recording()
+def get_call_process_metrics() -> dict:
+    return {"upload_executor": upload_executor.get_metrics()}
 
-    session_id = str(uuid4())
 
+async def stop_call_process():
+    """Flush and close what start_call_process brought up, once the calls in this process have ended."""
+    logger.info(f"Call process metrics: {get_call_process_metrics()}")
+    recording_encoder.shutdown()
+    await call_completed_outbox.stop()
+    await call_completed_publisher.close()
+    await upload_spill.stop()
+    upload_executor.shutdown()
 
 
-    
+async def main(input_device: int, output_device: int):
+    # Picks up recordings spilled by earlier runs
+    upload_spill.recover()
+
+    if CALL_WORKERS > 1:
+        # Calls are sharded across worker processes; transports are built inside the worker that takes the call
+        supervisor = CallSupervisor(
+            run_call,
+            create_local_audio_transport,
+            num_workers=CALL_WORKERS,
+            max_concurrent_calls_per_worker=MAX_CONCURRENT_CALLS,
+            worker_startup=start_call_process,
+            worker_shutdown=stop_call_process,
+            worker_metrics=get_call_process_metrics,
+        )
+        supervisor.start()
+        try:
+            supervisor.assign_call(
+                LOCAL_CALLER_PHONE_NUMBER,
+                input_device_index=input_device,
+                output_device_index=output_device,
+            )
+            await supervisor.wait_idle()
+            logger.info(f"Worker loads: {supervisor.get_worker_loads()}")
+        finally:
+            await supervisor.shutdown()
+        return
 
-        
-  
+    await start_call_process()
+    call_server = CallServer(run_call, max_concurrent_calls=MAX_CONCURRENT_CALLS)
 
+    # A local sound card can only carry one call; network transports are handed to
+    # call_server.start_call the same way, one transport per incoming call.
+    call_server.start_call(LOCAL_CALLER_PHONE_NUMBER, create_local_audio_transport(input_device, output_device))
 
-    
-    
-    
+    try:
+        await call_server.wait_idle()
+    finally:
+        await call_server.shutdown(timeout=10)
+        await stop_call_process()
 
 
 if __name__ == "__main__":
@@ -946,4 +1174,4 @@ if __name__ == "__main__":
                 "output_device_index": res[1].index
             }, f)
         
-        asyncio.run(main(res[0].index, res[1].index))
\ No newline at end of file
+        asyncio.run(main(res[0].index, res[1].index))
@@ -1,4 +1,4 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 class Replica:
     def __init__(self, role: str, text: str):
@@ -11,20 +11,109 @@ class Replica:
     def to_plain(self) -> dict:
         return {"role": self.role, "text": self.text}
 
+def _span(start: Optional[float], end: Optional[float]) -> Optional[float]:
+    if start is None or end is None:
+        return None
+    return round(max(0.0, end - start), 3)
+
+class TurnLatency:
+    """
+    Milestones of one caller turn, in seconds since the call started. None when the turn never got that far,
+    e.g. because the caller interrupted the answer.
+    """
+    def __init__(
+        self,
+        user_started_at: float,
+        user_stopped_at: Optional[float] = None,
+        transcript_at: Optional[float] = None,
+        llm_first_token_at: Optional[float] = None,
+        tts_first_audio_at: Optional[float] = None,
+        bot_started_speaking_at: Optional[float] = None,
+    ):
+        """
+        :param user_started_at: The VAD detected the caller speaking
+        :param user_stopped_at: The VAD detected the end of the caller's turn, its stop_secs after the last word
+        :param transcript_at: The last final transcript of the turn arrived
+        :param llm_first_token_at: The first text token of the answer arrived from the LLM
+        :param tts_first_audio_at: The first audio of the answer arrived from TTS
+        :param bot_started_speaking_at: The output transport started playing the answer
+        """
+        self.user_started_at = user_started_at
+        self.user_stopped_at = user_stopped_at
+        self.transcript_at = transcript_at
+        self.llm_first_token_at = llm_first_token_at
+        self.tts_first_audio_at = tts_first_audio_at
+        self.bot_started_speaking_at = bot_started_speaking_at
+
+    def get_stages(self) -> Dict[str, Optional[float]]:
+        """
+        Seconds spent in each stage. A transcript finalized before the VAD stop counts as no STT time, and the
+        LLM is waited for from whichever of the two came last. Tool calls made before the answer are LLM time.
+        """
+        heard_at = self.transcript_at
+        if heard_at is not None and self.user_stopped_at is not None:
+            heard_at = max(heard_at, self.user_stopped_at)
+        return {
+            "stt": _span(self.user_stopped_at, self.transcript_at),
+            "llm": _span(heard_at, self.llm_first_token_at),
+            "tts": _span(self.llm_first_token_at, self.tts_first_audio_at),
+            "transport": _span(self.tts_first_audio_at, self.bot_started_speaking_at),
+            "total": _span(self.user_stopped_at, self.bot_started_speaking_at),
+        }
+
+    def to_dict(self) -> dict:
+        return {
+            "user_started_at": self.user_started_at,
+            "user_stopped_at": self.user_stopped_at,
+            "transcript_at": self.transcript_at,
+            "llm_first_token_at": self.llm_first_token_at,
+            "tts_first_audio_at": self.tts_first_audio_at,
+            "bot_started_speaking_at": self.bot_started_speaking_at,
+            "stages": self.get_stages(),
+        }
+
+    def to_plain(self) -> dict:
+        return {
+            "userStartedAt": self.user_started_at,
+            "userStoppedAt": self.user_stopped_at,
+            "transcriptAt": self.transcript_at,
+            "llmFirstTokenAt": self.llm_first_token_at,
+            "ttsFirstAudioAt": self.tts_first_audio_at,
+            "botStartedSpeakingAt": self.bot_started_speaking_at,
+            "stages": self.get_stages(),
+        }
+
+class CallLatency:
+    def __init__(self, first_audio_at: Optional[float], turns: List[TurnLatency]):
+        """
+        :param first_audio_at: Seconds from the start of the call until the greeting started playing
+        :param turns: Latency timeline of every caller turn that was transcribed
+        """
+        self.first_audio_at = first_audio_at
+        self.turns = turns
+
+    def to_dict(self) -> dict:
+        return {"first_audio_at": self.first_audio_at, "turns": [t.to_dict() for t in self.turns]}
+
+    def to_plain(self) -> dict:
+        return {"firstAudioAt": self.first_audio_at, "turns": [t.to_plain() for t in self.turns]}
+
 class CallCompletedEvent:
-    def __init__(self, intent: str, client_id: str, accommodation_id: str, transcript: List[Replica], audio_file_id: str):
+    def __init__(self, intent: str, client_id: str, accommodation_id: str, transcript: List[Replica], audio_file_id: str, latency: Optional[CallLatency] = None):
         """
         :param intent: The intent of the call (e.g., booking, inquiry, etc.)
         :param client_id: The unique identifier for the client
         :param accommodation_id: The unique identifier for the accommodation
         :param transcript: A list of Replica objects from assistant and user.
         :param audio_file_id: The identifier for the associated audio file
+        :param latency: Voice latency timeline of the call
         """
         self.intent = intent
         self.client_id = client_id
         self.accommodation_id = accommodation_id
         self.transcript = transcript
         self.audio_file_id = audio_file_id
+        self.latency = latency
 
     def to_dict(self) -> dict:
         return {
@@ -33,6 +122,7 @@ class CallCompletedEvent:
             "accommodation_id": self.accommodation_id,
             "transcript": [r.to_dict() for r in self.transcript],
             "audio_file_id": self.audio_file_id,
+            "latency": self.latency.to_dict() if self.latency else None,
         }
 
     def to_plain(self) -> dict:
@@ -45,4 +135,5 @@ class CallCompletedEvent:
             "accommodationId": self.accommodation_id,
             "transcript": [r.to_plain() for r in self.transcript],
             "audioFileId": self.audio_file_id,
+            "latency": self.latency.to_plain() if self.latency else None,
         } 
\ No newline at end of file
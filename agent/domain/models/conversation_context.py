@@ -5,14 +5,19 @@ from crm_api_client.crm_manager_client.client import Client
 from crm_api_client.crm_manager_client.api.clients import clients_controller_get_current_accommodation
 from crm_api_client.crm_manager_client.models.date_day_dto import DateDayDto
 from datetime import datetime, date, time
+from typing import Callable
 
 class ConversationContext:
     phone_number: str
     accommodation: ClientAccommodationDto | None
     intent: str | None
-    def __init__(self, phone_number: str):
+    def __init__(self, phone_number: str, now: Callable[[], datetime] = datetime.now):
         self.phone_number = phone_number
+        # Current time for the settlement and stay rules
+        self._now = now
         self.client: ClientDto | None = None
+        self.client_accommodation: ClientAccommodationDto | None = None
+        self.intent: str | None = None
 
     def set_client(self, client: ClientDto | None):
         self.client = client
@@ -60,7 +65,7 @@ class ConversationContext:
             return {"success": False, "message": "Booking status is missing for your current accommodation."}
         booking_status = accommodation.status
 
-        current_dt = datetime.now()
+        current_dt = self._now()
         current_date = current_dt.date()
         current_time = current_dt.time()
 
@@ -120,7 +125,7 @@ class ConversationContext:
         except ValueError as e: # Handles issues like invalid date components for datetime constructor
             return {"success": False, "message": f"Your accommodation end date appears to be invalid: {e}"}
 
-        current_datetime = datetime.now()
+        current_datetime = self._now()
 
         if current_datetime >= checkout_datetime:
             return {
@@ -0,0 +1,58 @@
+"""Compact variants of the generated models
+
+The generated models are slotted attrs classes, but every instance still carries its own, almost always
+empty, ``additional_properties`` dict. A compact variant is a slot-only subclass that allocates that dict
+only when the JSON object had unknown keys or when the property is first used, which roughly halves the
+size of small models such as ``DaysSpanDto`` and ``DateDayDto``. Compact models compare equal to the
+generated ones and behave the same in every other respect.
+"""
+
+from typing import Any
+
+from infrastructure.crm.fast_decode import Converter, compile_converter, model_equality
+
+_compact_classes: dict[type, type] = {}
+_compact_converters: dict[type, Converter] = {}
+
+
+def _additional_properties(slot: Any) -> property:
+    def get(self: Any) -> dict[str, Any]:
+        try:
+            return slot.__get__(self, type(self))
+        except AttributeError:
+            value: dict[str, Any] = {}
+            slot.__set__(self, value)
+            return value
+
+    return property(get, slot.__set__)
+
+
+def get_compact_class(cls: type) -> type:
+    """Get the compact variant of the generated model ``cls``"""
+    compact = _compact_classes.get(cls)
+    if compact is None:
+        namespace: dict[str, Any] = {
+            "__slots__": (),
+            "__doc__": f"Compact variant of {cls.__name__}, see compact_models",
+            "__module__": __name__,
+            "additional_properties": _additional_properties(cls.__dict__["additional_properties"]),
+        }
+        namespace.update(model_equality(cls))
+        compact = _compact_classes[cls] = type(f"Compact{cls.__name__}", (cls,), namespace)
+    return compact
+
+
+def get_compact_converter(cls: type) -> Converter:
+    """Get a compiled converter from a decoded JSON object to the compact variant of ``cls``
+
+    Like the fast_decode converters it takes ownership of the object and falls back to ``from_dict``.
+    """
+    converter = _compact_converters.get(cls)
+    if converter is None:
+        _compact_converters[cls] = cls.from_dict
+        try:
+            converter = compile_converter(cls, get_compact_converter, get_compact_class(cls))
+        except (TypeError, NameError, KeyError):
+            converter = cls.from_dict
+        _compact_converters[cls] = converter
+    return converter
@@ -0,0 +1,48 @@
+import asyncio
+from typing import Any, Dict, Union
+
+import httpx
+
+from crm_api_client.crm_manager_client.client import AuthenticatedClient, Client
+
+
+async def warm_up(client: Union[AuthenticatedClient, Client], connections: int = 1, path: str = "/") -> int:
+    """
+    Open up to ``connections`` pooled connections ahead of the first real request.
+
+    Sends ``connections`` concurrent GET requests to ``path`` and returns how many of them got a response.
+    Failures are not raised: the pool then simply opens connections on demand.
+    """
+    async_client = client.get_async_httpx_client()
+
+    async def open_connection() -> bool:
+        try:
+            await async_client.get(path)
+            return True
+        except httpx.HTTPError:
+            return False
+
+    # Concurrent requests make the pool open one connection each; they stay in the pool as keep-alive connections
+    results = await asyncio.gather(*(open_connection() for _ in range(connections)))
+    return sum(results)
+
+
+def get_pool_metrics(client: Union[AuthenticatedClient, Client], limits: httpx.Limits) -> Dict[str, Any]:
+    """Size and utilisation of the client's async connection pool, which was created with ``limits``."""
+    # httpx has no public pool statistics, so this reads the httpcore pool of the default transport
+    pool = getattr(getattr(client.get_async_httpx_client(), "_transport", None), "_pool", None)
+    connections = list(getattr(pool, "connections", []))
+    requests = list(getattr(pool, "_requests", []))
+    idle = sum(1 for connection in connections if connection.is_idle())
+    waiting = sum(1 for request in requests if request.is_queued())
+    return {
+        "max_connections": limits.max_connections,
+        "max_keepalive_connections": limits.max_keepalive_connections,
+        "connections": len(connections),
+        "active_connections": len(connections) - idle,
+        "idle_connections": idle,
+        "http2_connections": sum(1 for connection in connections if connection.info().startswith("HTTP/2")),
+        "in_flight_requests": len(requests) - waiting,
+        "waiting_requests": waiting,
+        "utilisation": (len(connections) - idle) / limits.max_connections if limits.max_connections else None,
+    }
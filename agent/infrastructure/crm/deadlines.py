@@ -0,0 +1,166 @@
+"""Latency budgets and hedged requests for the generated endpoints"""
+
+import asyncio
+import functools
+import time
+from collections import deque
+from collections.abc import Awaitable, Mapping
+from types import ModuleType
+from typing import Any, Callable, Optional
+
+from attrs import define
+
+from infrastructure.metrics.percentile import nearest_rank
+
+
+class DeadlineExceeded(Exception):
+    """Raised by api functions with a latency budget when no response arrived within the budget"""
+
+    def __init__(self, endpoint: str, budget: float):
+        self.endpoint = endpoint
+        self.budget = budget
+
+        super().__init__(f"No response from {endpoint} within {budget:.2f}s")
+
+
+@define
+class LatencyBudget:
+    """How long a call to one endpoint may take
+
+    Attributes:
+        timeout: Seconds the caller waits for a response in total, hedged request included.
+        hedge_after: Seconds after which an identical second request is sent to a GET endpoint. Replaced by the
+            observed ``hedge_percentile`` once ``min_samples`` responses were seen. None disables hedging.
+        hedge_percentile: Percentile of observed response times used as the hedge delay.
+        min_samples: Responses needed before the observed percentile is used.
+    """
+
+    timeout: float
+    hedge_after: Optional[float] = None
+    hedge_percentile: float = 95
+    min_samples: int = 20
+
+
+class EndpointLatency:
+    """Response times and hedging counters of one endpoint"""
+
+    def __init__(self, budget: LatencyBudget, window: int = 256) -> None:
+        self.budget = budget
+        self._samples: deque[float] = deque(maxlen=window)
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.deadline_exceeded = 0
+
+    def record(self, latency: float) -> None:
+        self._samples.append(latency)
+
+    def percentile(self, percentile: float) -> Optional[float]:
+        return nearest_rank(self._samples, percentile)
+
+    def hedge_delay(self) -> Optional[float]:
+        if self.budget.hedge_after is None:
+            return None
+        if len(self._samples) < self.budget.min_samples:
+            return self.budget.hedge_after
+        return self.percentile(self.budget.hedge_percentile)
+
+    def get_metrics(self) -> dict[str, Any]:
+        return {
+            "timeout": self.budget.timeout,
+            "requests": self.requests,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "deadline_exceeded": self.deadline_exceeded,
+            "hedge_delay": self.hedge_delay(),
+            "latency_p50": self.percentile(50),
+            "latency_p95": self.percentile(95),
+        }
+
+
+async def _hedged(call: Callable[[], Awaitable[Any]], latency: EndpointLatency) -> Any:
+    async def attempt() -> Any:
+        started_at = time.monotonic()
+        result = await call()
+        # Only finished attempts are sampled; a cancelled loser says nothing about how long it would have taken
+        latency.record(time.monotonic() - started_at)
+        return result
+
+    primary = asyncio.ensure_future(attempt())
+    attempts = [primary]
+    try:
+        delay = latency.hedge_delay()
+        if delay is not None:
+            done, _ = await asyncio.wait(attempts, timeout=delay)
+            if not done:
+                latency.hedged += 1
+                attempts.append(asyncio.ensure_future(attempt()))
+
+        pending = set(attempts)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is not primary:
+                        latency.hedge_wins += 1
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in attempts:
+            if not task.done():
+                task.cancel()
+
+
+class EndpointDeadlines:
+    """Latency budgets installed on generated endpoint modules, see ``apply_latency_budgets``"""
+
+    def __init__(self) -> None:
+        self._endpoints: dict[str, EndpointLatency] = {}
+
+    def install(self, module: ModuleType, budget: LatencyBudget) -> None:
+        original = module.asyncio_detailed
+        if getattr(original, "_coalesced", False):
+            raise RuntimeError(f"Latency budgets must be applied before coalescing {module.__name__}")
+        endpoint = module.__name__.rpartition(".")[2]
+        if getattr(original, "_latency", None) is not None:
+            original._latency.budget = budget
+            self._endpoints[endpoint] = original._latency
+            return
+
+        latency = EndpointLatency(budget)
+        self._endpoints[endpoint] = latency
+
+        @functools.wraps(original)
+        async def asyncio_detailed(*args: Any, client: Any, **kwargs: Any) -> Any:
+            hedge = module._get_kwargs(*args, **kwargs)["method"].lower() == "get"
+            call = functools.partial(original, *args, client=client, **kwargs)
+            latency.requests += 1
+            try:
+                return await asyncio.wait_for(
+                    _hedged(call, latency) if hedge else call(), timeout=latency.budget.timeout
+                )
+            except asyncio.TimeoutError:
+                latency.deadline_exceeded += 1
+                raise DeadlineExceeded(endpoint, latency.budget.timeout) from None
+
+        asyncio_detailed._latency = latency
+        module.asyncio_detailed = asyncio_detailed
+
+    def get_metrics(self) -> dict[str, dict[str, Any]]:
+        return {endpoint: latency.get_metrics() for endpoint, latency in self._endpoints.items()}
+
+
+def apply_latency_budgets(budgets: Mapping[ModuleType, LatencyBudget]) -> EndpointDeadlines:
+    """Give each endpoint module a latency budget
+
+    Its ``asyncio_detailed`` (and so ``asyncio``) raises errors.DeadlineExceeded when no response arrived
+    within ``budget.timeout``; GET endpoints send a hedged second request after the hedge delay and return
+    whichever response comes first. Must run before ``single_flight.coalesce_get_requests``, otherwise
+    the hedged request would be coalesced with the one it is meant to race.
+    """
+    deadlines = EndpointDeadlines()
+    for module, budget in budgets.items():
+        deadlines.install(module, budget)
+    return deadlines
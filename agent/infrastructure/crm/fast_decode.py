@@ -0,0 +1,233 @@
+"""Fast decoding of API responses into the generated models
+
+``from_dict`` copies every JSON object with ``dict(src_dict)`` and pops its keys one by one, once per nested
+model. The converters compiled here read the decoded dict in place and only build ``additional_properties``
+when unknown keys are present. Responses are decoded with orjson when it is installed.
+"""
+
+import enum
+import json
+import typing
+from collections.abc import Collection, Mapping
+from types import ModuleType
+from typing import Any, Callable, Optional, Union
+
+import attrs
+
+from crm_api_client.crm_manager_client import models
+from crm_api_client.crm_manager_client.api.accommodations import accommodations_controller_create_booking
+from crm_api_client.crm_manager_client.api.clients import (
+    clients_controller_create_client,
+    clients_controller_find_client_by_phone,
+    clients_controller_get_client_by_id,
+    clients_controller_get_current_accommodation,
+)
+from crm_api_client.crm_manager_client.api.rentals import (
+    rentals_controller_get_rental_available_date_spans,
+    rentals_controller_get_rental_by_id,
+    rentals_controller_get_rental_emergency_details,
+    rentals_controller_get_rental_settlement_details,
+    rentals_controller_get_rentals,
+)
+from crm_api_client.crm_manager_client.types import UNSET, Unset
+
+try:
+    import orjson
+
+    loads: Callable[[Union[bytes, str]], Any] = orjson.loads
+except ImportError:
+    loads = json.loads
+
+Converter = Callable[[Any], Any]
+
+# Endpoints returning a model, with the status code their model is returned for
+MODEL_ENDPOINTS: dict[ModuleType, int] = {
+    accommodations_controller_create_booking: 201,
+    clients_controller_create_client: 201,
+    clients_controller_find_client_by_phone: 200,
+    clients_controller_get_client_by_id: 200,
+    clients_controller_get_current_accommodation: 200,
+    rentals_controller_get_rental_available_date_spans: 200,
+    rentals_controller_get_rental_by_id: 200,
+    rentals_controller_get_rental_emergency_details: 200,
+    rentals_controller_get_rental_settlement_details: 200,
+    rentals_controller_get_rentals: 200,
+}
+
+_converters: dict[type, Converter] = {}
+
+
+def json_key(name: str) -> str:
+    """Key of the JSON document holding the attribute ``name``, which the generator snake-cased"""
+    first, *rest = name.split("_")
+    return first + "".join(part.capitalize() for part in rest)
+
+
+def _is_model(tp: Any) -> bool:
+    return isinstance(tp, type) and attrs.has(tp) and hasattr(tp, "from_dict")
+
+
+def value_expression(
+    tp: Any, value: str, namespace: dict[str, Any], model_converter: Optional[Callable[[type], Converter]] = None
+) -> str:
+    """Python expression converting ``value`` to ``tp``, with the names it needs added to ``namespace``
+
+    Models are converted with ``model_converter(model)``, the compiled converter by default.
+    """
+    if _is_model(tp):
+        name = f"_convert_{tp.__name__}"
+        namespace[name] = (model_converter or get_converter)(tp)
+        return f"{name}({value})"
+    if isinstance(tp, type) and issubclass(tp, enum.Enum):
+        namespace[tp.__name__] = tp
+        return f"{tp.__name__}({value})"
+    origin = typing.get_origin(tp)
+    if origin is list:
+        (item_tp,) = typing.get_args(tp)
+        item = value_expression(item_tp, "item", namespace, model_converter)
+        # Lists of plain values are used as decoded, like the generated cast()
+        return value if item == "item" else f"[{item} for item in {value}]"
+    if origin is Union:
+        options = [arg for arg in typing.get_args(tp) if arg is not type(None) and arg is not Unset]
+        if len(options) == 1:
+            inner = value_expression(options[0], value, namespace, model_converter)
+            return value if inner == value else f"(None if {value} is None else {inner})"
+        if all(value_expression(option, value, namespace, model_converter) == value for option in options):
+            return value
+        raise TypeError(f"Cannot compile a converter for {tp}")
+    if tp in (str, int, float, bool, Any):
+        return value
+    raise TypeError(f"Cannot compile a converter for {tp}")
+
+
+def is_optional(tp: Any) -> bool:
+    """Whether a field of type ``tp`` may be missing from the JSON document"""
+    return typing.get_origin(tp) is Union and Unset in typing.get_args(tp)
+
+
+def model_equality(cls: type) -> dict[str, Callable[[Any, Any], Any]]:
+    """``__eq__``/``__ne__`` for a subclass of a generated model that compares equal to the model itself
+
+    attrs only compares instances of the exact same class.
+    """
+    compared = [field.name for field in attrs.fields(cls) if field.eq]
+
+    def __eq__(self: Any, other: Any) -> Any:
+        if not isinstance(other, cls):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in compared)
+
+    def __ne__(self: Any, other: Any) -> Any:
+        result = __eq__(self, other)
+        return result if result is NotImplemented else not result
+
+    return {"__eq__": __eq__, "__ne__": __ne__}
+
+
+def compile_converter(
+    cls: type, model_converter: Optional[Callable[[type], Converter]] = None, target: Optional[type] = None
+) -> Converter:
+    """Compile a converter for ``cls``
+
+    With a ``target`` subclass the instance is created without running ``__init__`` and its slots are set
+    directly, which leaves ``additional_properties`` unset unless there are unknown keys.
+    """
+    hints = typing.get_type_hints(cls, localns=vars(models))
+    fields = [field for field in attrs.fields(cls) if field.init]
+    namespace: dict[str, Any] = {"_cls": target or cls, "_new": object.__new__, "UNSET": UNSET}
+    keys = tuple(json_key(field.name) for field in fields)
+    namespace["_keys"] = frozenset(keys)
+
+    lines = ["def convert(src):"]
+    arguments = []
+    required = 0
+    for index, (field, key) in enumerate(zip(fields, keys)):
+        tp = hints[field.name]
+        variable = f"v{index}"
+        if is_optional(tp):
+            lines.append(f"    {variable} = src.get({key!r}, UNSET)")
+            inner = value_expression(tp, variable, namespace, model_converter)
+            if inner != variable:
+                lines.append(f"    if {variable} is not UNSET:")
+                lines.append(f"        {variable} = {inner}")
+        else:
+            required += 1
+            lines.append(f"    {variable} = {value_expression(tp, f'src[{key!r}]', namespace, model_converter)}")
+        arguments.append(variable)
+    if target is None:
+        lines.append(f"    obj = _cls({', '.join(arguments)})")
+    else:
+        lines.append("    obj = _new(_cls)")
+        lines.extend(f"    obj.{field.name} = {variable}" for field, variable in zip(fields, arguments))
+    if not fields:
+        # Models without declared properties keep the whole (freshly decoded) object
+        lines.append("    obj.additional_properties = src")
+    else:
+        lines.append(f"    if len(src) > {required}:")
+        lines.append("        extra = {key: value for key, value in src.items() if key not in _keys}")
+        lines.append("        if extra:")
+        lines.append("            obj.additional_properties = extra")
+    lines.append("    return obj")
+
+    exec("\n".join(lines), namespace)
+    return namespace["convert"]
+
+
+def get_converter(cls: type) -> Converter:
+    """Get the compiled converter of a generated model, falling back to ``from_dict`` if it cannot be compiled
+
+    Converters take ownership of the dict they are given: it may end up as the model's ``additional_properties``.
+    """
+    converter = _converters.get(cls)
+    if converter is None:
+        # Registered before compiling so self-referencing models resolve to the fallback instead of recursing
+        _converters[cls] = cls.from_dict
+        try:
+            converter = compile_converter(cls)
+        except (TypeError, NameError, KeyError):
+            converter = cls.from_dict
+        _converters[cls] = converter
+    return converter
+
+
+def get_decoder(tp: Any, model_converter: Optional[Callable[[type], Converter]] = None) -> Callable[[Union[bytes, str]], Any]:
+    """Get a function decoding a JSON document into ``tp``: a model, a list of models or a plain type"""
+    namespace: dict[str, Any] = {"loads": loads}
+    expression = value_expression(tp, "data", namespace, model_converter)
+    exec(f"def decode(content):\n    data = loads(content)\n    return {expression}", namespace)
+    return namespace["decode"]
+
+
+def enable_fast_decode(
+    endpoints: Mapping[ModuleType, int] = MODEL_ENDPOINTS, lazy: Collection[ModuleType] = (), compact: bool = False
+) -> None:
+    """Decode the given status code of each endpoint module with orjson and the compiled converters
+
+    Endpoints listed in ``lazy`` return lazy views instead (see ``lazy_models``), the others return compact
+    models when ``compact`` is set (see ``compact_models``). Replaces the module's ``_parse_response``; other
+    status codes still go through the generated one, so ``raise_on_unexpected_status`` keeps working.
+    Safe to call more than once.
+    """
+    from infrastructure.crm.compact_models import get_compact_converter
+    from infrastructure.crm.lazy_models import get_view_converter
+
+    for module, status_code in endpoints.items():
+        original = module._parse_response
+        if getattr(original, "_fast", False):
+            continue
+        return_type = typing.get_type_hints(original, localns=vars(models))["return"]
+        (model_type,) = [arg for arg in typing.get_args(return_type) if arg is not type(None)]
+        if module in lazy:
+            decode = get_decoder(model_type, get_view_converter)
+        else:
+            decode = get_decoder(model_type, get_compact_converter if compact else None)
+
+        def _parse_response(
+            *, client: Any, response: Any, _original: Any = original, _decode: Any = decode, _status: int = status_code
+        ) -> Optional[Any]:
+            if response.status_code == _status:
+                return _decode(response.content)
+            return _original(client=client, response=response)
+
+        _parse_response._fast = True
+        module._parse_response = _parse_response
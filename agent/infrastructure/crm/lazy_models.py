@@ -0,0 +1,102 @@
+"""Lazy views of the generated models
+
+A view keeps the decoded JSON object of a model and converts each field the first time it is read; nested
+models become views as well, so a rental's ``Price``, ``Location`` and ``Amenity`` objects are only built
+when something looks at them. Views subclass the generated models: isinstance checks, ``to_dict``,
+comparison and repr work unchanged (the last three read, and so convert, every field). Missing required
+keys raise KeyError when the field is read rather than when the response is parsed.
+"""
+
+import typing
+from typing import Any, Optional
+
+import attrs
+
+from crm_api_client.crm_manager_client import models
+from crm_api_client.crm_manager_client.types import UNSET
+from infrastructure.crm.fast_decode import Converter, is_optional, json_key, model_equality, value_expression
+
+_view_converters: dict[type, Converter] = {}
+
+
+def _field_converter(tp: Any) -> Optional[Converter]:
+    namespace: dict[str, Any] = {}
+    expression = value_expression(tp, "value", namespace, get_view_converter)
+    if expression == "value":
+        return None
+    exec(f"def convert(value):\n    return {expression}", namespace)
+    return namespace["convert"]
+
+
+def _lazy_field(slot: Any, key: str, convert: Optional[Converter], optional: bool) -> property:
+    # The model's own slot caches the converted value; the property only fills it on first read
+    def get(self: Any) -> Any:
+        try:
+            return slot.__get__(self, type(self))
+        except AttributeError:
+            pass
+        value = self._raw.get(key, UNSET) if optional else self._raw[key]
+        if convert is not None and value is not UNSET:
+            value = convert(value)
+        slot.__set__(self, value)
+        return value
+
+    def set(self: Any, value: Any) -> None:
+        slot.__set__(self, value)
+
+    return property(get, set)
+
+
+def _lazy_additional_properties(slot: Any, keys: frozenset[str]) -> property:
+    def get(self: Any) -> dict[str, Any]:
+        try:
+            return slot.__get__(self, type(self))
+        except AttributeError:
+            pass
+        # Models without declared properties keep the whole (freshly decoded) object
+        value = {key: item for key, item in self._raw.items() if key not in keys} if keys else self._raw
+        slot.__set__(self, value)
+        return value
+
+    def set(self: Any, value: dict[str, Any]) -> None:
+        slot.__set__(self, value)
+
+    return property(get, set)
+
+
+def _build_view(cls: type) -> Converter:
+    hints = typing.get_type_hints(cls, localns=vars(models))
+    fields = [field for field in attrs.fields(cls) if field.init]
+    keys = frozenset(json_key(field.name) for field in fields)
+    namespace: dict[str, Any] = {
+        "__slots__": ("_raw",),
+        "__doc__": f"Lazy view of {cls.__name__}, see lazy_models",
+        "__module__": __name__,
+    }
+    for field in fields:
+        tp = hints[field.name]
+        namespace[field.name] = _lazy_field(
+            cls.__dict__[field.name], json_key(field.name), _field_converter(tp), is_optional(tp)
+        )
+    namespace["additional_properties"] = _lazy_additional_properties(cls.__dict__["additional_properties"], keys)
+    # A view equals the eager model it stands for
+    namespace.update(model_equality(cls))
+    view = type(f"Lazy{cls.__name__}", (cls,), namespace)
+
+    def from_raw(raw: Any) -> Any:
+        instance = object.__new__(view)
+        instance._raw = raw
+        return instance
+
+    return from_raw
+
+
+def get_view_converter(cls: type) -> Converter:
+    """Get a function wrapping a decoded JSON object in a lazy view of the generated model ``cls``
+
+    The view takes ownership of the object and keeps it alive as long as the view itself.
+    """
+    converter = _view_converters.get(cls)
+    if converter is None:
+        converter = _view_converters[cls] = _build_view(cls)
+    return converter
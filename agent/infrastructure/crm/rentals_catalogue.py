@@ -0,0 +1,64 @@
+import asyncio
+import time
+from typing import List, Optional, Union
+
+from loguru import logger
+
+from crm_api_client.crm_manager_client.api.rentals import rentals_controller_get_rentals
+from crm_api_client.crm_manager_client.client import AuthenticatedClient, Client
+from crm_api_client.crm_manager_client.models.compact_rental_dto import CompactRentalDto
+
+
+class RentalsCatalogue:
+    """
+    Process-wide cache of the rentals list with stale-while-revalidate refresh.
+
+    Once warmed, ``get`` always answers from memory: when the entry is older than ``ttl`` the cached list
+    is returned and a single background refresh is started. Only a cold cache (or one dropped with
+    ``invalidate(drop=True)``) makes callers wait, and concurrent callers then share one CRM request.
+    """
+
+    def __init__(self, client: Union[AuthenticatedClient, Client], ttl: float = 300.0):
+        self._client = client
+        self._ttl = ttl
+        self._rentals: Optional[List[CompactRentalDto]] = None
+        self._fetched_at = 0.0
+        self._refresh: Optional[asyncio.Task] = None
+
+    def is_fresh(self) -> bool:
+        return self._rentals is not None and time.monotonic() - self._fetched_at < self._ttl
+
+    async def get(self) -> Optional[List[CompactRentalDto]]:
+        if self._rentals is None:
+            return await self._start_refresh()
+        if not self.is_fresh():
+            self._start_refresh()
+        return self._rentals
+
+    async def warm(self) -> Optional[List[CompactRentalDto]]:
+        return await self._start_refresh()
+
+    def invalidate(self, drop: bool = False):
+        """Mark the catalogue stale so the next ``get`` refreshes it; ``drop`` also forgets the cached list."""
+        self._fetched_at = 0.0
+        if drop:
+            self._rentals = None
+
+    def _start_refresh(self) -> asyncio.Task:
+        if self._refresh is None or self._refresh.done():
+            self._refresh = asyncio.create_task(self._fetch())
+        return self._refresh
+
+    async def _fetch(self) -> Optional[List[CompactRentalDto]]:
+        try:
+            rentals = await rentals_controller_get_rentals.asyncio(client=self._client)
+        except Exception as e:
+            logger.error(f"Error refreshing rentals catalogue: {e}")
+            return self._rentals
+        if rentals is None:
+            logger.warning("CRM returned no rentals catalogue, keeping the cached one")
+            return self._rentals
+        self._rentals = rentals
+        self._fetched_at = time.monotonic()
+        logger.debug(f"Rentals catalogue refreshed with {len(rentals)} rentals")
+        return rentals
@@ -0,0 +1,106 @@
+"""Request coalescing for the generated GET endpoints"""
+
+import asyncio
+import functools
+from collections.abc import Awaitable
+from types import ModuleType
+from typing import Any, Callable, Hashable, Optional
+
+from crm_api_client.crm_manager_client.api.clients import (
+    clients_controller_find_client_by_phone,
+    clients_controller_get_client_by_id,
+    clients_controller_get_current_accommodation,
+)
+from crm_api_client.crm_manager_client.api.rentals import (
+    rentals_controller_get_rental_available_date_spans,
+    rentals_controller_get_rental_by_id,
+    rentals_controller_get_rental_emergency_details,
+    rentals_controller_get_rental_settlement_details,
+    rentals_controller_get_rentals,
+)
+
+GET_ENDPOINTS: tuple[ModuleType, ...] = (
+    clients_controller_find_client_by_phone,
+    clients_controller_get_client_by_id,
+    clients_controller_get_current_accommodation,
+    rentals_controller_get_rental_available_date_spans,
+    rentals_controller_get_rental_by_id,
+    rentals_controller_get_rental_emergency_details,
+    rentals_controller_get_rental_settlement_details,
+    rentals_controller_get_rentals,
+)
+
+
+def _freeze(value: Any) -> Hashable:
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+class SingleFlight:
+    """Shares one in-flight call between every caller asking for the same key
+
+    The shared call runs in its own task, so a caller that is cancelled (e.g. on hang-up) does not
+    cancel the request for the others. Nothing is cached: the key is forgotten as soon as the call finishes.
+    """
+
+    def __init__(self) -> None:
+        self._in_flight: dict[Hashable, asyncio.Task] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+    async def run(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(call())
+            self._in_flight[key] = task
+            task.add_done_callback(functools.partial(self._on_done, key))
+            self.started += 1
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _on_done(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Mark the exception as retrieved in case every caller was cancelled before it arrived
+        if not task.cancelled():
+            task.exception()
+
+
+def coalesce_endpoint(module: ModuleType, flight: SingleFlight) -> None:
+    """Replace ``asyncio_detailed`` of a generated endpoint module with a coalescing version
+
+    The generated ``asyncio`` looks ``asyncio_detailed`` up in its module, so it is covered as well and
+    callers keep using ``module.asyncio(...)`` unchanged. Identical requests share the same Response,
+    including the parsed model, which callers must therefore treat as read-only.
+    """
+    original = module.asyncio_detailed
+    if getattr(original, "_coalesced", False):
+        return
+
+    @functools.wraps(original)
+    async def asyncio_detailed(*args: Any, client: Any, **kwargs: Any) -> Any:
+        request = module._get_kwargs(*args, **kwargs)
+        if request["method"].lower() != "get":
+            return await original(*args, client=client, **kwargs)
+        key = (id(client), request["url"], _freeze(request.get("params")))
+        return await flight.run(key, lambda: original(*args, client=client, **kwargs))
+
+    asyncio_detailed._coalesced = True
+    module.asyncio_detailed = asyncio_detailed
+
+
+def coalesce_get_requests(
+    modules: tuple[ModuleType, ...] = GET_ENDPOINTS, flight: Optional[SingleFlight] = None
+) -> SingleFlight:
+    """Coalesce identical in-flight requests to the given endpoints. Endpoints already coalesced keep their flight."""
+    flight = flight or SingleFlight()
+    for module in modules:
+        coalesce_endpoint(module, flight)
+    return flight
@@ -0,0 +1,258 @@
+import asyncio
+import json
+import os
+from typing import List, Optional, Tuple
+
+from loguru import logger
+
+from domain.events.call_completed_event import CallCompletedEvent
+from infrastructure.events.call_completed_publisher import CallCompletedPublisher
+from infrastructure.system.processes import pid_is_alive
+
+
+def _read_ack(ack_path: str) -> int:
+    try:
+        with open(ack_path) as f:
+            return int(f.read().strip() or 0)
+    except FileNotFoundError:
+        return 0
+
+
+def _write_ack(ack_path: str, seq: int):
+    tmp_path = f"{ack_path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(str(seq))
+    os.replace(tmp_path, ack_path)
+
+
+def _read_records(log_path: str, offset: int, limit: int, max_seq: Optional[int] = None) -> Tuple[List[Tuple[int, dict]], int]:
+    """
+    Read up to ``limit`` complete records starting at byte ``offset``, stopping before any record newer
+    than ``max_seq``. Returns them and the offset after them.
+    """
+    records = []
+    with open(log_path, "rb") as f:
+        f.seek(offset)
+        while len(records) < limit:
+            line = f.readline()
+            # A line without a newline is a torn write from a crash, or an append that is not synced yet
+            if not line or not line.endswith(b"\n"):
+                break
+            record = json.loads(line)
+            if max_seq is not None and record["seq"] > max_seq:
+                break
+            offset += len(line)
+            records.append((record["seq"], record["event"]))
+    return records, offset
+
+
+class CallCompletedOutbox:
+    """
+    Durable local outbox in front of the call-completed queue.
+
+    Events are appended to a per-process log file; appends made close together share one fsync, so a
+    hang-up only waits for a local write. A background drainer forwards the log to BullMQ in order and
+    records the last delivered sequence number in an ack file. Delivery is at-least-once: an event sent
+    right before a crash may be sent again. Logs left behind by processes that are no longer running are
+    drained and removed by whichever process starts next, in a task of their own so a slow backlog never
+    holds up the live log. A process claims such a log by renaming it; claims of processes that died
+    while draining are taken over the same way.
+    """
+
+    def __init__(
+        self,
+        outbox_dir: str,
+        publisher: CallCompletedPublisher,
+        fsync_interval: float = 0.02,
+        drain_batch_size: int = 50,
+        retry_interval: float = 1.0,
+        compact_bytes: int = 1024 * 1024,
+    ):
+        self._outbox_dir = outbox_dir
+        self._publisher = publisher
+        self._fsync_interval = fsync_interval
+        self._drain_batch_size = drain_batch_size
+        self._retry_interval = retry_interval
+        self._compact_bytes = compact_bytes
+        self._log_path = os.path.join(outbox_dir, f"{os.getpid()}.log")
+        self._ack_path = os.path.join(outbox_dir, f"{os.getpid()}.ack")
+        self._file = None
+        self._next_seq = 1
+        self._acked_seq = 0
+        self._synced_seq = 0
+        self._read_offset = 0
+        self._sync_waiters: List[asyncio.Future] = []
+        self._sync_task: Optional[asyncio.Task] = None
+        self._drainer: Optional[asyncio.Task] = None
+        self._orphans: Optional[asyncio.Task] = None
+        self._new_data: Optional[asyncio.Event] = None
+
+    def _open(self):
+        os.makedirs(self._outbox_dir, exist_ok=True)
+        self._acked_seq = _read_ack(self._ack_path)
+        last_seq = self._acked_seq
+        if os.path.exists(self._log_path):
+            # Same pid as a previous run: carry on after whatever it left in the log
+            offset = 0
+            while True:
+                records, offset = _read_records(self._log_path, offset, self._drain_batch_size)
+                if not records:
+                    break
+                last_seq = max(last_seq, records[-1][0])
+        self._next_seq = last_seq + 1
+        self._synced_seq = last_seq
+        self._file = open(self._log_path, "ab")
+
+    def _ensure_started(self):
+        if self._file is None:
+            self._open()
+        if self._drainer is None or self._drainer.done():
+            self._new_data = asyncio.Event()
+            self._drainer = asyncio.get_running_loop().create_task(self._drain_forever())
+        if self._orphans is None:
+            self._orphans = asyncio.get_running_loop().create_task(self._drain_orphans())
+
+    async def start(self):
+        self._ensure_started()
+
+    async def append(self, event: CallCompletedEvent):
+        """Durably record the event. Returns once it has been fsynced, before it is sent to Redis."""
+        self._ensure_started()
+        seq = self._next_seq
+        self._next_seq += 1
+        line = json.dumps({"seq": seq, "event": event.to_plain()}, separators=(",", ":")) + "\n"
+        self._file.write(line.encode("utf-8"))
+        waiter = asyncio.get_running_loop().create_future()
+        self._sync_waiters.append(waiter)
+        if self._sync_task is None or self._sync_task.done():
+            self._sync_task = asyncio.create_task(self._sync_soon())
+        await waiter
+
+    async def _sync_soon(self):
+        # Group commit: everything appended during the interval shares one fsync
+        await asyncio.sleep(self._fsync_interval)
+        waiters, self._sync_waiters = self._sync_waiters, []
+        synced_seq = self._next_seq - 1
+        try:
+            self._file.flush()
+            await asyncio.get_running_loop().run_in_executor(None, os.fsync, self._file.fileno())
+        except Exception as e:
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_exception(e)
+            return
+        self._synced_seq = max(self._synced_seq, synced_seq)
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+        self._new_data.set()
+
+    async def _drain_forever(self):
+        while True:
+            try:
+                delivered = await self._drain_once()
+            except Exception as e:
+                logger.warning(f"Forwarding call-completed events failed, will retry: {e}")
+                delivered = 0
+                await asyncio.sleep(self._retry_interval)
+            if delivered == 0:
+                try:
+                    await asyncio.wait_for(self._new_data.wait(), timeout=self._retry_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._new_data.clear()
+
+    async def _drain_once(self) -> int:
+        loop = asyncio.get_running_loop()
+        records, offset = await loop.run_in_executor(
+            None, _read_records, self._log_path, self._read_offset, self._drain_batch_size, self._synced_seq
+        )
+        if not records:
+            return 0
+        pending = [event for seq, event in records if seq > self._acked_seq]
+        await self._publisher.publish_batch(pending)
+        self._acked_seq = max(self._acked_seq, records[-1][0])
+        self._read_offset = offset
+        await loop.run_in_executor(None, _write_ack, self._ack_path, self._acked_seq)
+        self._compact()
+        return len(records)
+
+    def _compact(self):
+        # Only when every appended event has been delivered, so nothing but delivered records is dropped
+        if self._acked_seq != self._next_seq - 1 or self._read_offset < self._compact_bytes:
+            return
+        self._file.flush()
+        self._file.truncate(0)
+        self._read_offset = 0
+
+    def _claim_orphans(self) -> List[Tuple[str, str]]:
+        """Claim the logs of dead processes, and the claims of dead drainers. Returns (pid, claimed path) pairs."""
+        claimed = []
+        for name in sorted(os.listdir(self._outbox_dir)):
+            pid, _, extension = name.partition(".")
+            if not pid.isdigit() or int(pid) == os.getpid():
+                continue
+            if extension == "log":
+                if pid_is_alive(int(pid)):
+                    continue
+            elif extension.startswith("log.claimed."):
+                owner = extension.rpartition(".")[2]
+                # A claim of this pid can only be left over from an earlier process, this one claims once
+                if not owner.isdigit() or (int(owner) != os.getpid() and pid_is_alive(int(owner))):
+                    continue
+            else:
+                continue
+            claimed_path = os.path.join(self._outbox_dir, f"{pid}.log.claimed.{os.getpid()}")
+            try:
+                os.rename(os.path.join(self._outbox_dir, name), claimed_path)
+            except FileNotFoundError:
+                # Claimed by another process
+                continue
+            claimed.append((pid, claimed_path))
+        return claimed
+
+    async def _drain_orphans(self):
+        loop = asyncio.get_running_loop()
+        for pid, claimed_path in self._claim_orphans():
+            ack_path = os.path.join(self._outbox_dir, f"{pid}.ack")
+            acked_seq = _read_ack(ack_path)
+            offset = 0
+            while True:
+                records, offset = await loop.run_in_executor(None, _read_records, claimed_path, offset, self._drain_batch_size)
+                if not records:
+                    break
+                pending = [event for seq, event in records if seq > acked_seq]
+                while True:
+                    try:
+                        await self._publisher.publish_batch(pending)
+                        break
+                    except Exception as e:
+                        logger.warning(f"Forwarding events left by process {pid} failed, will retry: {e}")
+                        await asyncio.sleep(self._retry_interval)
+                acked_seq = records[-1][0]
+                await loop.run_in_executor(None, _write_ack, ack_path, acked_seq)
+            os.remove(claimed_path)
+            if os.path.exists(ack_path):
+                os.remove(ack_path)
+            logger.info(f"Forwarded call-completed events left by process {pid}")
+
+    async def stop(self, timeout: float = 5.0):
+        """Flush pending appends, give the drainer ``timeout`` seconds to catch up and stop it."""
+        if self._sync_task is not None:
+            await self._sync_task
+        if self._drainer is not None:
+            deadline = asyncio.get_running_loop().time() + timeout
+            while self._acked_seq < self._synced_seq and asyncio.get_running_loop().time() < deadline:
+                self._new_data.set()
+                await asyncio.sleep(0.05)
+            self._drainer.cancel()
+            await asyncio.gather(self._drainer, return_exceptions=True)
+            self._drainer = None
+        if self._orphans is not None:
+            # An unfinished claim is taken over by the next process that starts
+            self._orphans.cancel()
+            await asyncio.gather(self._orphans, return_exceptions=True)
+            self._orphans = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
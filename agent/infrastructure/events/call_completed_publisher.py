@@ -0,0 +1,73 @@
+import asyncio
+from typing import List, Optional
+
+from bullmq import Queue
+from loguru import logger
+
+
+CALL_COMPLETED_QUEUE = "call-completed"
+
+
+class CallCompletedPublisher:
+    """
+    Process-wide BullMQ producer for CallCompletedEvent.
+
+    The queue connection is opened once and shared by every call. Events reach it through the
+    CallCompletedOutbox drainer, which sends them in ordered batches with a single addBulk each. Failed
+    adds are retried with exponential backoff on a fresh connection.
+    """
+
+    def __init__(
+        self,
+        redis_url: str,
+        queue_name: str = CALL_COMPLETED_QUEUE,
+        max_retries: int = 5,
+        base_backoff: float = 0.2,
+        max_backoff: float = 5.0,
+    ):
+        self._redis_url = redis_url
+        self._queue_name = queue_name
+        self._max_retries = max_retries
+        self._base_backoff = base_backoff
+        self._max_backoff = max_backoff
+        self._queue: Optional[Queue] = None
+
+    def _get_queue(self) -> Queue:
+        if self._queue is None:
+            self._queue = Queue(self._queue_name, {"connection": self._redis_url})
+        return self._queue
+
+    async def start(self):
+        self._get_queue()
+
+    async def _reconnect(self):
+        queue, self._queue = self._queue, None
+        if queue is not None:
+            try:
+                await queue.close()
+            except Exception as e:
+                logger.debug(f"Error closing {self._queue_name} queue: {e}")
+
+    async def _with_retries(self, operation):
+        attempt = 0
+        while True:
+            try:
+                return await operation(self._get_queue())
+            except Exception as e:
+                attempt += 1
+                if attempt > self._max_retries:
+                    raise
+                backoff = min(self._max_backoff, self._base_backoff * 2 ** (attempt - 1))
+                logger.warning(f"Adding to {self._queue_name} failed ({e}), reconnecting in {backoff:.1f}s")
+                await asyncio.sleep(backoff)
+                await self._reconnect()
+
+    async def publish_batch(self, batch: List[dict]):
+        """Send already serialized events, in order, with a single addBulk."""
+        if not batch:
+            return
+        jobs = [{"name": self._queue_name, "data": data} for data in batch]
+        await self._with_retries(lambda queue: queue.addBulk(jobs))
+
+    async def close(self):
+        await self._reconnect()
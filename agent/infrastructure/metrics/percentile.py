@@ -0,0 +1,9 @@
+from typing import Iterable, Optional
+
+
+def nearest_rank(samples: Iterable[float], percentile: float) -> Optional[float]:
+    """The sample at ``percentile`` (0 to 100) of the sorted samples, or None when there are none"""
+    ordered = sorted(samples)
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))]
@@ -0,0 +1,115 @@
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from loguru import logger
+from pipecat.frames.frames import (
+    BotStartedSpeakingFrame,
+    LLMTextFrame,
+    TranscriptionFrame,
+    TTSAudioRawFrame,
+    UserStartedSpeakingFrame,
+    UserStoppedSpeakingFrame,
+)
+from pipecat.observers.base_observer import BaseObserver, FramePushed
+
+from domain.events.call_completed_event import CallLatency, TurnLatency
+from infrastructure.metrics.percentile import nearest_rank
+
+
+class TurnLatencyStats:
+    """
+    Process-wide distribution of the voice latency stages, over the last ``window`` samples of each.
+
+    Fed by every call's TurnLatencyObserver: ``first_audio`` once per call, the stages of TurnLatency once per
+    answered turn.
+    """
+
+    def __init__(self, window: int = 1024):
+        self._window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._counts: Dict[str, int] = {}
+
+    def record(self, stage: str, seconds: Optional[float]):
+        if seconds is None:
+            return
+        samples = self._samples.get(stage)
+        if samples is None:
+            samples = self._samples[stage] = deque(maxlen=self._window)
+            self._counts[stage] = 0
+        samples.append(seconds)
+        self._counts[stage] += 1
+
+    def record_turn(self, turn: TurnLatency):
+        for stage, seconds in turn.get_stages().items():
+            self.record(stage, seconds)
+
+    def get_metrics(self) -> dict:
+        """Sample count and p50 / p95 / p99 of every stage, in milliseconds"""
+        metrics = {}
+        for stage, samples in self._samples.items():
+            metrics[stage] = {"count": self._counts[stage]}
+            for percentile in (50, 95, 99):
+                metrics[stage][f"p{percentile}"] = round(nearest_rank(samples, percentile) * 1000)
+        return metrics
+
+
+class TurnLatencyObserver(BaseObserver):
+    """
+    Timestamps the milestones of every caller turn of one call: user stopped speaking, final transcript, first
+    LLM token, first TTS audio and the bot starting to speak.
+
+    Passed to the PipelineTask as an observer, so it sees the frames wherever they are consumed without being a
+    stage of the pipeline. Times come from the pipeline clock, which starts with the call. A frame is seen once
+    per processor it passes, so each milestone keeps its first sighting. Turns are opened by the transport's VAD
+    events; without a VAD analyzer only ``first_audio_at`` is measured.
+    """
+
+    def __init__(self, stats: TurnLatencyStats):
+        self._stats = stats
+        self._turns: List[TurnLatency] = []
+        self._turn: Optional[TurnLatency] = None
+        self._last_frame_ids: Dict[type, int] = {}
+        self.first_audio_at: Optional[float] = None
+
+    def _is_new(self, frame) -> bool:
+        if self._last_frame_ids.get(type(frame)) == frame.id:
+            return False
+        self._last_frame_ids[type(frame)] = frame.id
+        return True
+
+    async def on_push_frame(self, data: FramePushed):
+        frame = data.frame
+        at = round(data.timestamp / 1e9, 3)
+        turn = self._turn
+
+        if isinstance(frame, UserStartedSpeakingFrame):
+            if self._is_new(frame):
+                self._turn = TurnLatency(user_started_at=at)
+                self._turns.append(self._turn)
+        elif isinstance(frame, BotStartedSpeakingFrame):
+            if self.first_audio_at is None:
+                self.first_audio_at = at
+                self._stats.record("first_audio", at)
+            if turn is not None and turn.tts_first_audio_at is not None and turn.bot_started_speaking_at is None:
+                turn.bot_started_speaking_at = at
+                self._stats.record_turn(turn)
+                logger.debug(f"Turn latency: {turn.get_stages()}")
+        elif turn is None:
+            return
+        elif isinstance(frame, UserStoppedSpeakingFrame):
+            if turn.user_stopped_at is None:
+                turn.user_stopped_at = at
+        elif isinstance(frame, TranscriptionFrame):
+            # The last final transcript before the LLM answers is the one the answer waited for
+            if turn.llm_first_token_at is None and self._is_new(frame):
+                turn.transcript_at = at
+        elif isinstance(frame, LLMTextFrame):
+            if turn.user_stopped_at is not None and turn.transcript_at is not None and turn.llm_first_token_at is None:
+                turn.llm_first_token_at = at
+        elif isinstance(frame, TTSAudioRawFrame):
+            if turn.llm_first_token_at is not None and turn.tts_first_audio_at is None:
+                turn.tts_first_audio_at = at
+
+    def get_latency(self) -> CallLatency:
+        # Turns without a transcript were noise or a pause the caller talked on after
+        return CallLatency(self.first_audio_at, [turn for turn in self._turns if turn.transcript_at is not None])
@@ -0,0 +1,87 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+
+class RecordingFormat:
+    def __init__(self, name: str, extension: str, content_type: str, soundfile_format: Optional[str] = None, soundfile_subtype: Optional[str] = None):
+        self.name = name
+        self.extension = extension
+        self.content_type = content_type
+        self.soundfile_format = soundfile_format
+        self.soundfile_subtype = soundfile_subtype
+
+    def is_compressed(self) -> bool:
+        return self.soundfile_format is not None
+
+
+RECORDING_FORMATS: Dict[str, RecordingFormat] = {
+    "wav": RecordingFormat("wav", ".wav", "audio/wav"),
+    # Lossless, typically about half the size of 16-bit PCM for speech
+    "flac": RecordingFormat("flac", ".flac", "audio/flac", "FLAC", "PCM_16"),
+    # Speech codec, roughly a tenth of the size of FLAC
+    "opus": RecordingFormat("opus", ".ogg", "audio/ogg", "OGG", "OPUS"),
+}
+
+
+def get_recording_format(name: str) -> RecordingFormat:
+    try:
+        return RECORDING_FORMATS[name.lower()]
+    except KeyError:
+        raise ValueError(f"Unknown recording format: {name}, expected one of: {', '.join(RECORDING_FORMATS)}")
+
+
+def encode_wav_file(src_path: str, recording_format_name: str, block_frames: int = 16000) -> str:
+    """
+    Encode a 16-bit PCM WAV file into ``recording_format_name`` next to it and return the new path.
+
+    The file is converted block by block and is never loaded into memory as a whole.
+    """
+    # soundfile bundles libsndfile with FLAC and Opus support; it is only loaded once a compressed recording is stored
+    import soundfile
+
+    recording_format = get_recording_format(recording_format_name)
+    dst_path = os.path.splitext(src_path)[0] + recording_format.extension
+    info = soundfile.info(src_path)
+    with soundfile.SoundFile(
+        dst_path,
+        mode="w",
+        samplerate=info.samplerate,
+        channels=info.channels,
+        format=recording_format.soundfile_format,
+        subtype=recording_format.soundfile_subtype,
+    ) as dst:
+        for block in soundfile.blocks(src_path, blocksize=block_frames, dtype="int16"):
+            dst.write(block)
+    return dst_path
+
+
+class AudioEncoder:
+    """
+    Encodes spooled WAV recordings in a pool of threads.
+
+    Compression is CPU bound, but libsndfile releases the GIL while it encodes, so threads keep it off the
+    event loop. A process pool cannot be used: call workers are daemon processes, which may not have
+    children, and forking a process that runs an event loop and upload threads is unsafe.
+    """
+
+    def __init__(self, max_workers: int = 1):
+        self._max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="recording-encoder")
+        return self._executor
+
+    async def encode(self, src_path: str, recording_format: RecordingFormat) -> str:
+        if not recording_format.is_compressed():
+            return src_path
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), encode_wav_file, src_path, recording_format.name)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
@@ -0,0 +1,405 @@
+import abc
+import asyncio
+import os
+import struct
+import tempfile
+import wave
+from typing import Callable, List, Optional
+
+from loguru import logger
+
+from infrastructure.recording.audio_encoder import RECORDING_FORMATS, AudioEncoder, RecordingFormat
+from infrastructure.storage.s3_bucket import BucketReadiness, BucketRecreatedError
+from infrastructure.storage.upload_executor import UploadQueueFullError
+from infrastructure.storage.upload_spill import UploadSpill
+
+
+SAMPLE_WIDTH = 2
+WAV_HEADER_SIZE = 44
+# S3 rejects multipart parts below 5 MiB, except for the last one
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+def build_wav_header(sample_rate: int, num_channels: int, data_size: int) -> bytes:
+    """Canonical 44 byte PCM WAV header for 16-bit samples."""
+    byte_rate = sample_rate * num_channels * SAMPLE_WIDTH
+    block_align = num_channels * SAMPLE_WIDTH
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF",
+        36 + data_size,
+        b"WAVE",
+        b"fmt ",
+        16,
+        1,
+        num_channels,
+        sample_rate,
+        byte_rate,
+        block_align,
+        SAMPLE_WIDTH * 8,
+        b"data",
+        data_size,
+    )
+
+
+class RecordingSink(abc.ABC):
+    """
+    Receives a call recording chunk by chunk while the call is running.
+
+    ``close`` finishes the recording and returns the object key it was stored under, or None if nothing
+    was stored. ``abort`` throws away whatever was written so far.
+    """
+
+    def __init__(self, object_key: str, sample_rate: int, num_channels: int):
+        self.object_key = object_key
+        self.sample_rate = sample_rate
+        self.num_channels = num_channels
+        self.bytes_written = 0
+
+    @abc.abstractmethod
+    async def write(self, audio: bytes):
+        ...
+
+    @abc.abstractmethod
+    async def close(self) -> Optional[str]:
+        ...
+
+    @abc.abstractmethod
+    async def abort(self):
+        ...
+
+
+class S3MultipartRecordingSink(RecordingSink):
+    """
+    Streams the recording into an S3 multipart upload.
+
+    Parts are uploaded as soon as they reach ``part_size``. The first part starts with the WAV header, whose
+    sizes are only known at hang-up, so it is kept in memory and uploaded last as part number 1. Peak memory
+    is therefore about two parts per call, whatever the call length. Recordings shorter than one part are
+    stored with a single put_object and never open a multipart upload.
+
+    When the upload queue is full and ``spill`` is given, the rest of the call is appended to a local tail
+    file and the unfinished upload is handed to the spill at hang-up.
+
+    If the bucket is deleted and recreated under the upload, the parts already sent are gone with it: the
+    sink starts a new upload with the audio it still holds, and the WAV header only counts what was stored.
+    """
+
+    def __init__(
+        self,
+        bucket: BucketReadiness,
+        object_key: str,
+        sample_rate: int,
+        num_channels: int,
+        part_size: int = MIN_PART_SIZE,
+        spill: Optional[UploadSpill] = None,
+    ):
+        super().__init__(object_key, sample_rate, num_channels)
+        self._s3_client = bucket.s3_client
+        self._bucket = bucket
+        self._spill = spill
+        self._tail_path: Optional[str] = None
+        self._part_size = max(part_size, MIN_PART_SIZE)
+        self._first_part = bytearray(WAV_HEADER_SIZE)
+        self._current_part: Optional[bytearray] = None
+        self._upload_id: Optional[str] = None
+        self._parts: List[dict] = []
+        # Audio in the parts numbered 2 and up, and audio lost with a recreated bucket
+        self._uploaded_bytes = 0
+        self._lost_bytes = 0
+
+    async def write(self, audio: bytes):
+        self.bytes_written += len(audio)
+        if self._tail_path is not None:
+            await self._append_to_tail(audio)
+            return
+        if self._current_part is None:
+            self._first_part += audio
+            if len(self._first_part) >= self._part_size:
+                self._current_part = bytearray()
+            return
+        self._current_part += audio
+        if len(self._current_part) >= self._part_size:
+            part, self._current_part = self._current_part, bytearray()
+            try:
+                await self._upload_part(len(self._parts) + 2, bytes(part))
+            except UploadQueueFullError:
+                if self._spill is None:
+                    raise
+                # Uploads are backed up: keep the rest of the call on disk instead of in memory
+                self._tail_path = self._spill.create_tail_file()
+                await self._append_to_tail(bytes(part))
+
+    async def _append_to_tail(self, audio: bytes):
+        def append():
+            with open(self._tail_path, "ab") as tail:
+                tail.write(audio)
+
+        await asyncio.get_running_loop().run_in_executor(None, append)
+
+    async def _start_multipart_upload(self):
+        response = await self._bucket.run(
+            lambda: self._s3_client.create_multipart_upload(Bucket=self._bucket.bucket, Key=self.object_key, ContentType="audio/wav"),
+        )
+        self._upload_id = response["UploadId"]
+
+    async def _send_part(self, part_number: int, body: bytes):
+        if self._upload_id is None:
+            await self._start_multipart_upload()
+        response = await self._bucket.run(
+            lambda: self._s3_client.upload_part(
+                Bucket=self._bucket.bucket,
+                Key=self.object_key,
+                UploadId=self._upload_id,
+                PartNumber=part_number,
+                Body=body,
+            ),
+            replayable=False,
+        )
+        self._parts.append({"PartNumber": part_number, "ETag": response["ETag"]})
+
+    async def _upload_part(self, part_number: int, body: bytes):
+        try:
+            await self._send_part(part_number, body)
+        except BucketRecreatedError:
+            self._restart_upload()
+            if part_number == 1:
+                body = bytes(self._first_part)
+            else:
+                part_number = len(self._parts) + 2
+            await self._send_part(part_number, body)
+        if part_number != 1:
+            self._uploaded_bytes += len(body)
+
+    def _restart_upload(self):
+        logger.warning(f"Multipart upload for {self.object_key} was lost with its bucket, {self._uploaded_bytes} bytes of audio are missing")
+        self._lost_bytes += self._uploaded_bytes
+        self._uploaded_bytes = 0
+        self._upload_id = None
+        self._parts = []
+        self._first_part[:WAV_HEADER_SIZE] = self._wav_header()
+
+    def _wav_header(self) -> bytes:
+        return build_wav_header(self.sample_rate, self.num_channels, self.bytes_written - self._lost_bytes)
+
+    async def close(self) -> Optional[str]:
+        if self.bytes_written == 0:
+            await self.abort()
+            return None
+        self._first_part[:WAV_HEADER_SIZE] = self._wav_header()
+        if self._tail_path is None:
+            try:
+                return await self._complete()
+            except UploadQueueFullError:
+                if self._spill is None:
+                    await self.abort()
+                    raise
+        await self._spill_remaining()
+        return self.object_key
+
+    async def _spill_remaining(self):
+        if self._current_part:
+            if self._tail_path is None:
+                self._tail_path = self._spill.create_tail_file()
+            await self._append_to_tail(bytes(self._current_part))
+        self._spill.spill_multipart(
+            self.object_key,
+            "audio/wav",
+            self._upload_id,
+            list(self._parts),
+            bytes(self._first_part),
+            self._tail_path,
+            self._part_size,
+        )
+        self._first_part = bytearray()
+        self._current_part = None
+        self._tail_path = None
+        self._upload_id = None
+
+    async def _complete_upload(self) -> List[dict]:
+        if not any(part["PartNumber"] == 1 for part in self._parts):
+            await self._upload_part(1, bytes(self._first_part))
+        parts = sorted(self._parts, key=lambda p: p["PartNumber"])
+        await self._bucket.run(
+            lambda: self._s3_client.complete_multipart_upload(
+                Bucket=self._bucket.bucket,
+                Key=self.object_key,
+                UploadId=self._upload_id,
+                MultipartUpload={"Parts": parts},
+            ),
+            replayable=False,
+        )
+        return parts
+
+    async def _complete(self) -> str:
+        first_part = bytes(self._first_part)
+
+        if self._upload_id is None and not self._current_part:
+            # Short call: a single request is cheaper than a multipart upload
+            await self._bucket.run(
+                lambda: self._s3_client.put_object(Bucket=self._bucket.bucket, Key=self.object_key, Body=first_part, ContentType="audio/wav"),
+            )
+            logger.info(f"Recording saved to s3://{self._bucket.bucket}/{self.object_key}")
+            self._first_part = bytearray()
+            return self.object_key
+
+        try:
+            if self._current_part:
+                await self._upload_part(len(self._parts) + 2, bytes(self._current_part))
+                self._current_part = None
+            try:
+                parts = await self._complete_upload()
+            except BucketRecreatedError:
+                self._restart_upload()
+                parts = await self._complete_upload()
+        except UploadQueueFullError:
+            raise
+        except Exception:
+            await self.abort()
+            raise
+        self._first_part = bytearray()
+        logger.info(f"Recording saved to s3://{self._bucket.bucket}/{self.object_key} in {len(parts)} parts")
+        return self.object_key
+
+    async def abort(self):
+        self._first_part = bytearray()
+        self._current_part = None
+        if self._tail_path is not None:
+            tail_path, self._tail_path = self._tail_path, None
+            if os.path.exists(tail_path):
+                os.remove(tail_path)
+        if self._upload_id is None:
+            return
+        upload_id, self._upload_id = self._upload_id, None
+        try:
+            await self._bucket.run(
+                lambda: self._s3_client.abort_multipart_upload(Bucket=self._bucket.bucket, Key=self.object_key, UploadId=upload_id),
+                replayable=False,
+            )
+        except Exception as e:
+            logger.error(f"Error aborting multipart upload for {self.object_key}: {e}")
+
+
+class SpoolRecordingSink(RecordingSink):
+    """
+    Spools the recording to a local WAV file and uploads it from disk at hang-up.
+
+    The wave module rewrites the header sizes when the file is closed, and upload_file streams the
+    file from disk, so the recording is never held in memory. When a compressed ``recording_format`` is
+    requested the spooled WAV is encoded by ``encoder`` before the upload; ``object_key`` is expected to
+    carry the matching extension.
+    """
+
+    def __init__(
+        self,
+        bucket: BucketReadiness,
+        object_key: str,
+        sample_rate: int,
+        num_channels: int,
+        spool_dir: Optional[str] = None,
+        recording_format: RecordingFormat = RECORDING_FORMATS["wav"],
+        encoder: Optional[AudioEncoder] = None,
+        spill: Optional[UploadSpill] = None,
+    ):
+        super().__init__(object_key, sample_rate, num_channels)
+        if recording_format.is_compressed() and encoder is None:
+            raise ValueError(f"An encoder is required for {recording_format.name} recordings")
+        self._s3_client = bucket.s3_client
+        self._bucket = bucket
+        self._recording_format = recording_format
+        self._encoder = encoder
+        self._spill = spill
+        self._encoded_path: Optional[str] = None
+        fd, self.path = tempfile.mkstemp(prefix="recording_", suffix=".wav", dir=spool_dir)
+        self._file = os.fdopen(fd, "wb")
+        self._wave = wave.open(self._file, "wb")
+        self._wave.setsampwidth(SAMPLE_WIDTH)
+        self._wave.setnchannels(num_channels)
+        self._wave.setframerate(sample_rate)
+
+    async def write(self, audio: bytes):
+        self.bytes_written += len(audio)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._wave.writeframesraw, audio)
+
+    def _close_file(self):
+        if self._wave is not None:
+            self._wave.close()
+            self._wave = None
+        if not self._file.closed:
+            self._file.close()
+
+    def _remove_file(self):
+        for path in (self.path, self._encoded_path):
+            if path is None:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    async def close(self) -> Optional[str]:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._close_file)
+        try:
+            if self.bytes_written == 0:
+                return None
+            upload_path = self.path
+            if self._recording_format.is_compressed():
+                self._encoded_path = await self._encoder.encode(self.path, self._recording_format)
+                upload_path = self._encoded_path
+            content_type = self._recording_format.content_type
+            try:
+                await self._bucket.run(
+                    lambda: self._s3_client.upload_file(upload_path, self._bucket.bucket, self.object_key, ExtraArgs={"ContentType": content_type}),
+                )
+            except UploadQueueFullError:
+                if self._spill is None:
+                    raise
+                # The spill takes the file over, the finally block only removes what is left behind
+                self._spill.spill_file(upload_path, self.object_key, content_type)
+                return self.object_key
+            logger.info(f"Recording saved to s3://{self._bucket.bucket}/{self.object_key}")
+            return self.object_key
+        finally:
+            await loop.run_in_executor(None, self._remove_file)
+
+    async def abort(self):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._close_file)
+        await loop.run_in_executor(None, self._remove_file)
+
+
+RecordingSinkFactory = Callable[[int, int], RecordingSink]
+
+
+class CallRecorder:
+    """
+    Feeds AudioBufferProcessor chunks into a RecordingSink.
+
+    The sink is created on the first chunk, since the sample rate and channel count are only known then.
+    """
+
+    def __init__(self, sink_factory: RecordingSinkFactory):
+        self._sink_factory = sink_factory
+        self._sink: Optional[RecordingSink] = None
+
+    async def on_audio_data(self, audio: bytes, sample_rate: int, num_channels: int):
+        if len(audio) == 0:
+            return
+        if self._sink is None:
+            self._sink = self._sink_factory(sample_rate, num_channels)
+        await self._sink.write(audio)
+
+    async def finish(self) -> Optional[str]:
+        """Finish the recording and return its object key, None when there was nothing to store."""
+        if self._sink is None:
+            logger.info("No audio data to save")
+            return None
+        sink, self._sink = self._sink, None
+        return await sink.close()
+
+    async def discard(self):
+        if self._sink is not None:
+            sink, self._sink = self._sink, None
+            await sink.abort()
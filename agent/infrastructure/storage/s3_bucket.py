@@ -0,0 +1,110 @@
+import asyncio
+from typing import Any, Callable, Optional
+
+from loguru import logger
+
+from infrastructure.storage.upload_executor import UploadExecutor, UploadQueueFullError
+
+
+def is_no_such_bucket_error(error: BaseException) -> bool:
+    # upload_file wraps the ClientError in an S3UploadFailedError raised while handling it
+    while error is not None:
+        response = getattr(error, "response", None)
+        if isinstance(response, dict) and response.get("Error", {}).get("Code") == "NoSuchBucket":
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+class BucketRecreatedError(Exception):
+    """
+    A non-replayable operation failed because the bucket had disappeared. The bucket exists again, but
+    whatever the operation belonged to (a multipart upload) went with the old one and has to be restarted.
+    """
+
+
+class BucketReadiness:
+    """
+    Process-wide cache of whether the recordings bucket exists.
+
+    The bucket is checked (and created if needed) once, normally at startup. After that every upload
+    goes straight to S3 and the check is only repeated when an operation fails with NoSuchBucket.
+    Blocking boto3 calls run on ``executor`` when one is given, on the loop's default executor otherwise.
+    """
+
+    def __init__(self, s3_client, bucket: str, region: str, executor: Optional[UploadExecutor] = None):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.region = region
+        self._executor = executor
+        self._ready = False
+        self._lock: Optional[asyncio.Lock] = None
+
+    def is_ready(self) -> bool:
+        return self._ready
+
+    def invalidate(self):
+        self._ready = False
+
+    async def ensure_ready(self) -> bool:
+        """Check the bucket unless it is already known to exist. Concurrent callers share a single check."""
+        if self._ready:
+            return True
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if not self._ready:
+                self._ready = await self._check_bucket()
+        return self._ready
+
+    async def _run_blocking(self, operation: Callable[[], Any]) -> Any:
+        if self._executor is not None:
+            return await self._executor.run(operation)
+        return await asyncio.get_running_loop().run_in_executor(None, operation)
+
+    async def _check_bucket(self) -> bool:
+        """Make sure the bucket exists, creating it when head_bucket fails. Returns False if it could not be created."""
+        try:
+            await self._run_blocking(lambda: self.s3_client.head_bucket(Bucket=self.bucket))
+            return True
+        except UploadQueueFullError:
+            raise
+        except Exception:
+            # Bucket doesn't exist, create it
+            try:
+                create_bucket_kwargs = {'Bucket': self.bucket}
+                # If we're not using the default region (us-east-1), we need to specify LocationConstraint
+                if self.region != 'us-east-1':
+                    create_bucket_kwargs['CreateBucketConfiguration'] = {
+                        'LocationConstraint': self.region
+                    }
+                await self._run_blocking(lambda: self.s3_client.create_bucket(**create_bucket_kwargs))
+                logger.info(f"Created bucket: {self.bucket}")
+                return True
+            except UploadQueueFullError:
+                raise
+            except Exception as e:
+                logger.error(f"Error creating bucket: {str(e)}")
+                return False
+
+    async def run(self, operation: Callable[[], Any], replayable: bool = True) -> Any:
+        """
+        Run a blocking S3 operation against the bucket, re-checking the bucket once if it has disappeared.
+
+        Only ``replayable`` operations (put_object, upload_file, create_multipart_upload) are retried on
+        the recreated bucket; others raise BucketRecreatedError instead.
+        """
+        if not await self.ensure_ready():
+            raise RuntimeError(f"Bucket {self.bucket} is not available")
+        try:
+            return await self._run_blocking(operation)
+        except Exception as e:
+            if not is_no_such_bucket_error(e):
+                raise
+            logger.warning(f"Bucket {self.bucket} is missing, checking it again")
+            self.invalidate()
+            if not await self.ensure_ready():
+                raise
+            if not replayable:
+                raise BucketRecreatedError(f"Bucket {self.bucket} was recreated during the operation") from e
+            return await self._run_blocking(operation)
@@ -0,0 +1,107 @@
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque
+
+from infrastructure.metrics.percentile import nearest_rank
+
+
+class UploadQueueFullError(Exception):
+    """Raised when an operation is offered to an UploadExecutor whose queue is already full."""
+
+    def __init__(self, max_queue_size: int):
+        self.max_queue_size = max_queue_size
+        super().__init__(f"Upload queue is full ({max_queue_size} operations waiting)")
+
+
+class UploadExecutor:
+    """
+    Dedicated thread pool for blocking boto3 calls.
+
+    Keeps S3 traffic out of the loop's default executor, which is shared with everything else. At most
+    ``max_queue_size`` operations may wait for a thread; further operations are rejected right away with
+    UploadQueueFullError so that callers can spill to disk instead of queueing without limit.
+    """
+
+    def __init__(self, max_workers: int = 4, max_queue_size: int = 32, latency_window: int = 512):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="s3-upload")
+        self._max_workers = max_workers
+        self._max_queue_size = max_queue_size
+        self._queued = 0
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._wait_times: Deque[float] = deque(maxlen=latency_window)
+        self._run_times: Deque[float] = deque(maxlen=latency_window)
+
+    def get_queue_depth(self) -> int:
+        return self._queued
+
+    def is_full(self) -> bool:
+        return self._queued >= self._max_queue_size
+
+    async def run(self, operation: Callable[[], Any]) -> Any:
+        if self.is_full():
+            self._rejected += 1
+            raise UploadQueueFullError(self._max_queue_size)
+        submitted_at = time.monotonic()
+        self._queued += 1
+        # Whichever of the start callback and the end of this coroutine comes first takes the job off the queue
+        queued = [True]
+        loop = asyncio.get_running_loop()
+
+        def timed_operation():
+            started_at = time.monotonic()
+            # Counters are only touched from the loop thread
+            loop.call_soon_threadsafe(self._on_started, queued, started_at - submitted_at)
+            try:
+                return operation()
+            finally:
+                loop.call_soon_threadsafe(self._on_finished, time.monotonic() - started_at)
+
+        try:
+            result = await loop.run_in_executor(self._executor, timed_operation)
+        except Exception:
+            self._failed += 1
+            raise
+        finally:
+            # Cancelled before a thread picked the job up: it never starts, so it leaves the queue here
+            self._dequeue(queued)
+        self._completed += 1
+        return result
+
+    def _dequeue(self, queued: list):
+        if queued[0]:
+            queued[0] = False
+            self._queued -= 1
+
+    def _on_started(self, queued: list, wait_time: float):
+        self._dequeue(queued)
+        self._running += 1
+        self._wait_times.append(wait_time)
+
+    def _on_finished(self, run_time: float):
+        self._running -= 1
+        self._run_times.append(run_time)
+
+    def get_metrics(self) -> dict:
+        return {
+            "max_workers": self._max_workers,
+            "max_queue_size": self._max_queue_size,
+            "queue_depth": self._queued,
+            "running": self._running,
+            "completed": self._completed,
+            "failed": self._failed,
+            "rejected": self._rejected,
+            "queue_wait_p50": nearest_rank(self._wait_times, 50),
+            "queue_wait_p95": nearest_rank(self._wait_times, 95),
+            "queue_wait_p99": nearest_rank(self._wait_times, 99),
+            "upload_latency_p50": nearest_rank(self._run_times, 50),
+            "upload_latency_p95": nearest_rank(self._run_times, 95),
+            "upload_latency_p99": nearest_rank(self._run_times, 99),
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,263 @@
+import asyncio
+import json
+import os
+import shutil
+import struct
+from typing import Callable, List, Optional
+from uuid import uuid4
+
+from loguru import logger
+
+from infrastructure.storage.s3_bucket import BucketReadiness, BucketRecreatedError
+from infrastructure.storage.upload_executor import UploadQueueFullError
+from infrastructure.system.processes import pid_is_alive
+
+
+JOB_SUFFIX = ".job"
+CLAIMED_SUFFIX = ".claimed"
+# Canonical PCM WAV header, as written by the recording sinks
+WAV_HEADER_SIZE = 44
+
+
+class UploadSpill:
+    """
+    Local disk spill for uploads that could not be queued on the UploadExecutor.
+
+    Every spilled upload is a directory ``<id>.job`` holding its data files and a ``meta.json`` that
+    describes what is left to do. A background drainer uploads the jobs once the executor has room again.
+    A drainer claims a job by renaming it to ``<id>.job.claimed.<pid>``, so several worker processes can
+    share one spill directory; claims left behind by dead processes are released by ``recover``.
+    """
+
+    def __init__(self, spill_dir: str, bucket: BucketReadiness, drain_interval: float = 5.0):
+        self._spill_dir = spill_dir
+        self._bucket = bucket
+        self._drain_interval = drain_interval
+        self._drainer: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def _new_job_dir(self) -> str:
+        os.makedirs(self._spill_dir, exist_ok=True)
+        # Built under a temporary name and published with a rename, so a drainer never sees half a job
+        job_dir = os.path.join(self._spill_dir, f"{uuid4()}.tmp")
+        os.makedirs(job_dir)
+        return job_dir
+
+    def _publish(self, job_dir: str, meta: dict):
+        with open(os.path.join(job_dir, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        os.rename(job_dir, job_dir[: -len(".tmp")] + JOB_SUFFIX)
+        self._ensure_drainer()
+
+    def spill_file(self, path: str, object_key: str, content_type: str):
+        """Take over a finished local file that still has to be uploaded as ``object_key``."""
+        job_dir = self._new_job_dir()
+        shutil.move(path, os.path.join(job_dir, "data"))
+        self._publish(job_dir, {"kind": "file", "object_key": object_key, "content_type": content_type})
+        logger.warning(f"Upload queue is full, {object_key} was spilled to {self._spill_dir}")
+
+    def create_tail_file(self) -> str:
+        """Create a file a multipart upload can keep appending to while uploads are backed up."""
+        os.makedirs(self._spill_dir, exist_ok=True)
+        return os.path.join(self._spill_dir, f"{uuid4()}.tail")
+
+    def spill_multipart(
+        self,
+        object_key: str,
+        content_type: str,
+        upload_id: Optional[str],
+        parts: List[dict],
+        first_part: Optional[bytes],
+        tail_path: Optional[str],
+        part_size: int,
+    ):
+        """
+        Take over an unfinished multipart upload. ``first_part`` is uploaded as part 1 after the tail
+        has been uploaded in ``part_size`` parts numbered after the ones in ``parts``. It is kept even when
+        ``parts`` already holds part 1, in case the upload has to be restarted.
+        """
+        job_dir = self._new_job_dir()
+        if first_part is not None:
+            with open(os.path.join(job_dir, "first"), "wb") as f:
+                f.write(first_part)
+        if tail_path is not None:
+            shutil.move(tail_path, os.path.join(job_dir, "tail"))
+        self._publish(job_dir, {
+            "kind": "multipart",
+            "object_key": object_key,
+            "content_type": content_type,
+            "upload_id": upload_id,
+            "parts": parts,
+            "tail_offset": 0,
+            "part_size": part_size,
+        })
+        logger.warning(f"Upload queue is full, rest of {object_key} was spilled to {self._spill_dir}")
+
+    def recover(self):
+        """Release jobs claimed by processes that are no longer running."""
+        if not os.path.isdir(self._spill_dir):
+            return
+        for name in os.listdir(self._spill_dir):
+            if CLAIMED_SUFFIX not in name:
+                continue
+            job_name, _, pid = name.rpartition(".")
+            if pid.isdigit() and not pid_is_alive(int(pid)):
+                os.rename(os.path.join(self._spill_dir, name), os.path.join(self._spill_dir, job_name[: -len(CLAIMED_SUFFIX)]))
+
+    def _ensure_drainer(self):
+        if self._drainer is None or self._drainer.done():
+            try:
+                self.start()
+            except RuntimeError:
+                # No running loop: the job waits for the next process that starts a drainer
+                pass
+        elif self._wakeup is not None:
+            self._wakeup.set()
+
+    def start(self):
+        self._wakeup = asyncio.Event()
+        self._drainer = asyncio.get_running_loop().create_task(self._drain_forever())
+
+    async def stop(self):
+        if self._drainer is not None:
+            self._drainer.cancel()
+            await asyncio.gather(self._drainer, return_exceptions=True)
+            self._drainer = None
+
+    async def _drain_forever(self):
+        while True:
+            try:
+                await self.drain()
+            except Exception as e:
+                logger.exception(f"Error draining spilled uploads: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._drain_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def drain(self) -> int:
+        """Upload spilled jobs until none are left or the executor is full again. Returns the jobs finished."""
+        if not os.path.isdir(self._spill_dir):
+            return 0
+        finished = 0
+        for name in sorted(os.listdir(self._spill_dir)):
+            if not name.endswith(JOB_SUFFIX):
+                continue
+            job_dir = os.path.join(self._spill_dir, name)
+            claimed_dir = f"{job_dir}{CLAIMED_SUFFIX}.{os.getpid()}"
+            try:
+                os.rename(job_dir, claimed_dir)
+            except FileNotFoundError:
+                # Claimed by another process
+                continue
+            try:
+                await self._run_job(claimed_dir)
+            except UploadQueueFullError:
+                os.rename(claimed_dir, job_dir)
+                return finished
+            except Exception as e:
+                logger.error(f"Spilled upload {name} failed, will retry: {e}")
+                os.rename(claimed_dir, job_dir)
+                continue
+            shutil.rmtree(claimed_dir, ignore_errors=True)
+            finished += 1
+        return finished
+
+    async def _run_job(self, job_dir: str):
+        meta_path = os.path.join(job_dir, "meta.json")
+        with open(meta_path) as f:
+            meta = json.load(f)
+        s3_client = self._bucket.s3_client
+        bucket = self._bucket.bucket
+        key = meta["object_key"]
+
+        if meta["kind"] == "file":
+            data_path = os.path.join(job_dir, "data")
+            await self._bucket.run(
+                lambda: s3_client.upload_file(data_path, bucket, key, ExtraArgs={"ContentType": meta["content_type"]}),
+            )
+            logger.info(f"Spilled recording saved to s3://{bucket}/{key}")
+            return
+
+        def save_meta():
+            with open(meta_path, "w") as f:
+                json.dump(meta, f)
+
+        try:
+            await self._run_multipart_job(job_dir, meta, save_meta)
+        except BucketRecreatedError:
+            # Parts uploaded before the bucket was recreated are gone; the next drain restarts from what is on disk
+            logger.warning(f"Multipart upload for spilled {key} was lost with its bucket, restarting it")
+            if meta["content_type"] == "audio/wav":
+                self._resize_wav(job_dir, key)
+            meta.update(upload_id=None, parts=[], tail_offset=0)
+            save_meta()
+            raise
+
+    @staticmethod
+    def _resize_wav(job_dir: str, key: str):
+        """Make the header in the first part count only the audio of the first part and the tail"""
+        first_path = os.path.join(job_dir, "first")
+        tail_path = os.path.join(job_dir, "tail")
+        if not os.path.exists(first_path):
+            logger.error(f"Spilled {key} has no WAV header left, the restarted upload will not be playable")
+            return
+        tail_size = os.path.getsize(tail_path) if os.path.exists(tail_path) else 0
+        with open(first_path, "r+b") as f:
+            header = f.read(WAV_HEADER_SIZE)
+            if len(header) < WAV_HEADER_SIZE or header[:4] != b"RIFF":
+                return
+            data_size = os.fstat(f.fileno()).st_size - WAV_HEADER_SIZE + tail_size
+            (old_data_size,) = struct.unpack_from("<I", header, 40)
+            f.seek(4)
+            f.write(struct.pack("<I", 36 + data_size))
+            f.seek(40)
+            f.write(struct.pack("<I", data_size))
+        logger.warning(f"{old_data_size - data_size} bytes of audio of spilled {key} are missing")
+
+    async def _run_multipart_job(self, job_dir: str, meta: dict, save_meta: Callable[[], None]):
+        s3_client = self._bucket.s3_client
+        bucket = self._bucket.bucket
+        key = meta["object_key"]
+
+        if meta["upload_id"] is None:
+            response = await self._bucket.run(
+                lambda: s3_client.create_multipart_upload(Bucket=bucket, Key=key, ContentType=meta["content_type"]),
+            )
+            meta["upload_id"] = response["UploadId"]
+            save_meta()
+
+        async def upload_part(part_number: int, body: bytes):
+            response = await self._bucket.run(
+                lambda: s3_client.upload_part(Bucket=bucket, Key=key, UploadId=meta["upload_id"], PartNumber=part_number, Body=body),
+                replayable=False,
+            )
+            meta["parts"].append({"PartNumber": part_number, "ETag": response["ETag"]})
+
+        # Progress is saved after every part, so a job interrupted by a full queue resumes where it stopped
+        tail_path = os.path.join(job_dir, "tail")
+        if os.path.exists(tail_path):
+            with open(tail_path, "rb") as tail:
+                tail.seek(meta["tail_offset"])
+                while True:
+                    body = tail.read(meta["part_size"])
+                    if not body:
+                        break
+                    part_number = max([p["PartNumber"] for p in meta["parts"]] + [1]) + 1
+                    await upload_part(part_number, body)
+                    meta["tail_offset"] += len(body)
+                    save_meta()
+
+        first_path = os.path.join(job_dir, "first")
+        if os.path.exists(first_path) and not any(p["PartNumber"] == 1 for p in meta["parts"]):
+            with open(first_path, "rb") as f:
+                await upload_part(1, f.read())
+            save_meta()
+
+        parts = sorted(meta["parts"], key=lambda p: p["PartNumber"])
+        await self._bucket.run(
+            lambda: s3_client.complete_multipart_upload(Bucket=bucket, Key=key, UploadId=meta["upload_id"], MultipartUpload={"Parts": parts}),
+            replayable=False,
+        )
+        logger.info(f"Spilled recording saved to s3://{bucket}/{key} in {len(parts)} parts")
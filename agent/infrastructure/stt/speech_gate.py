@@ -0,0 +1,64 @@
+from collections import deque
+from typing import Deque
+
+from pipecat.frames.frames import Frame, InputAudioRawFrame, VADUserStartedSpeakingFrame, VADUserStoppedSpeakingFrame
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+
+
+class SpeechGate(FrameProcessor):
+    """
+    Placed between the input transport and STT: only audio the transport's VAD marks as speech reaches STT.
+
+    The transport runs the VAD analyzer and pushes VADUserStarted/StoppedSpeakingFrames (plus the
+    UserStarted/StoppedSpeakingFrames used for interruptions and turn-taking) ahead of the audio. Between them
+    audio is forwarded; outside them it is dropped. The last ``pre_roll_secs`` of dropped audio is kept and
+    sent when speech starts, so the onset the VAD needed ``start_secs`` to confirm is not clipped. The tail is
+    covered by the VAD's ``stop_secs`` of silence before it reports the stop.
+    """
+
+    def __init__(self, pre_roll_secs: float = 0.5, **kwargs):
+        super().__init__(**kwargs)
+        self._pre_roll_secs = pre_roll_secs
+        self._pre_roll: Deque[InputAudioRawFrame] = deque()
+        self._pre_roll_bytes = 0
+        self._speaking = False
+        self.forwarded_bytes = 0
+        self.dropped_bytes = 0
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if isinstance(frame, InputAudioRawFrame):
+            if self._speaking:
+                self.forwarded_bytes += len(frame.audio)
+                await self.push_frame(frame, direction)
+            else:
+                self._hold(frame)
+            return
+        await self.push_frame(frame, direction)
+        if isinstance(frame, VADUserStartedSpeakingFrame):
+            self._speaking = True
+            while self._pre_roll:
+                held = self._pre_roll.popleft()
+                self.forwarded_bytes += len(held.audio)
+                await self.push_frame(held)
+            self._pre_roll_bytes = 0
+        elif isinstance(frame, VADUserStoppedSpeakingFrame):
+            self._speaking = False
+
+    def _hold(self, frame: InputAudioRawFrame):
+        self._pre_roll.append(frame)
+        self._pre_roll_bytes += len(frame.audio)
+        max_bytes = self._pre_roll_secs * frame.sample_rate * frame.num_channels * 2
+        while self._pre_roll and self._pre_roll_bytes - len(self._pre_roll[0].audio) >= max_bytes:
+            dropped = self._pre_roll.popleft()
+            self._pre_roll_bytes -= len(dropped.audio)
+            self.dropped_bytes += len(dropped.audio)
+
+    def get_metrics(self) -> dict:
+        total = self.forwarded_bytes + self.dropped_bytes
+        return {
+            "forwarded_bytes": self.forwarded_bytes,
+            "dropped_bytes": self.dropped_bytes,
+            "forwarded_ratio": round(self.forwarded_bytes / total, 3) if total else None,
+        }
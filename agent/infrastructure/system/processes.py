@@ -0,0 +1,12 @@
+import os
+
+
+def pid_is_alive(pid: int) -> bool:
+    """Whether a process with ``pid`` is still running, used to find files left behind by dead processes."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -0,0 +1,33 @@
+from pipecat.frames.frames import Frame, StartFrame, TTSAudioRawFrame, TTSSpeakFrame, TTSStartedFrame, TTSStoppedFrame
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+
+from infrastructure.tts.phrase_audio_cache import PhraseAudio
+
+
+class CachedPhrasePlayer(FrameProcessor):
+    """
+    Placed right before the TTS service: plays TTSSpeakFrames whose audio is cached instead of handing them to TTS.
+
+    A hit is pushed as TTSStartedFrame, one TTSAudioRawFrame and TTSStoppedFrame, which the TTS service passes
+    through to the transport unchanged. A miss goes to the TTS service as usual while the phrase is synthesised
+    for the next call. Text produced by the LLM never comes as a TTSSpeakFrame, so it is not affected.
+    """
+
+    def __init__(self, phrase_audio: PhraseAudio, **kwargs):
+        super().__init__(**kwargs)
+        self._phrase_audio = phrase_audio
+        self._sample_rate = 0
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if isinstance(frame, StartFrame):
+            self._sample_rate = frame.audio_out_sample_rate
+        elif isinstance(frame, TTSSpeakFrame) and direction == FrameDirection.DOWNSTREAM:
+            audio = await self._phrase_audio.get(frame.text, self._sample_rate)
+            if audio is not None:
+                await self.push_frame(TTSStartedFrame())
+                await self.push_frame(TTSAudioRawFrame(audio=audio, sample_rate=self._sample_rate, num_channels=1))
+                await self.push_frame(TTSStoppedFrame())
+                return
+        await self.push_frame(frame, direction)
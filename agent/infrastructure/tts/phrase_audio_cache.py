@@ -0,0 +1,203 @@
+import asyncio
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+from uuid import uuid4
+
+from loguru import logger
+
+
+PCM_SUFFIX = ".pcm"
+
+
+class PhraseAudioCache:
+    """
+    Synthesised audio of fixed phrases as raw 16-bit mono PCM files, one per text, voice, model and sample rate.
+
+    The least recently used files are evicted once the directory holds more than ``max_bytes``. The order is
+    kept in memory and in the files' modification times, so it survives restarts. Several worker processes
+    can share a directory: files are published with a rename and one evicted by another process is a miss.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 50 * 1024 * 1024):
+        self._cache_dir = cache_dir
+        self._max_bytes = max_bytes
+        # File name -> size, least recently used first
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        files = []
+        for name in os.listdir(cache_dir):
+            if name.endswith(PCM_SUFFIX):
+                stat = os.stat(os.path.join(cache_dir, name))
+                files.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._size += size
+
+    @staticmethod
+    def get_key(text: str, voice_id: str, model: str, sample_rate: int) -> str:
+        key = json.dumps([text, voice_id, model, sample_rate])
+        return hashlib.sha256(key.encode("utf-8")).hexdigest() + PCM_SUFFIX
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self._cache_dir, key)
+
+    def _read(self, key: str) -> bytes:
+        path = self._path(key)
+        with open(path, "rb") as f:
+            audio = f.read()
+        os.utime(path)
+        return audio
+
+    def _write(self, key: str, audio: bytes):
+        tmp_path = self._path(f"{uuid4()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(audio)
+        os.replace(tmp_path, self._path(key))
+
+    def has(self, key: str) -> bool:
+        """Whether the file is on disk; another process may have written or evicted it since this one looked"""
+        try:
+            size = os.stat(self._path(key)).st_size
+        except FileNotFoundError:
+            if key in self._entries:
+                self._size -= self._entries.pop(key)
+            return False
+        if key not in self._entries:
+            self._entries[key] = size
+            self._size += size
+        return True
+
+    async def get(self, key: str) -> Optional[bytes]:
+        if key not in self._entries:
+            self.misses += 1
+            return None
+        try:
+            audio = await asyncio.to_thread(self._read, key)
+        except FileNotFoundError:
+            self._size -= self._entries.pop(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return audio
+
+    async def put(self, key: str, audio: bytes):
+        await asyncio.to_thread(self._write, key, audio)
+        self._size -= self._entries.pop(key, 0)
+        self._entries[key] = len(audio)
+        self._size += len(audio)
+        victims = self._pick_victims()
+        if victims:
+            await asyncio.to_thread(self._remove, victims)
+
+    def _pick_victims(self) -> List[str]:
+        # Runs on the loop like get, so the entries are only ever changed from one thread
+        victims = []
+        while self._size > self._max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self._size -= size
+            victims.append(key)
+        return victims
+
+    def _remove(self, keys: List[str]):
+        for key in keys:
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+            logger.debug(f"Evicted phrase audio {key}")
+
+    def get_metrics(self) -> dict:
+        return {"phrases": len(self._entries), "bytes": self._size, "hits": self.hits, "misses": self.misses}
+
+
+class CartesiaPhraseSynthesizer:
+    """Synthesises whole phrases to raw PCM with Cartesia's HTTP API, the way CartesiaHttpTTSService does"""
+
+    def __init__(self, api_key: str, voice_id: str, model: str, language: str = "en"):
+        self.voice_id = voice_id
+        self.model = model
+        self._api_key = api_key
+        self._language = language
+
+    async def synthesize(self, text: str, sample_rate: int) -> bytes:
+        # Imported here so the cache works without the cartesia extra installed
+        from cartesia import AsyncCartesia
+
+        client = AsyncCartesia(api_key=self._api_key)
+        try:
+            output = await client.tts.sse(
+                model_id=self.model,
+                transcript=text,
+                voice_id=self.voice_id,
+                output_format={"container": "raw", "encoding": "pcm_s16le", "sample_rate": sample_rate},
+                language=self._language,
+                stream=False,
+            )
+        finally:
+            await client.close()
+        return output["audio"]
+
+
+class PhraseAudio:
+    """
+    Fixed phrases of the agent's voice, served from a PhraseAudioCache and synthesised on a miss.
+
+    ``get`` never waits for synthesis: a miss returns None, so the caller falls back to the streaming TTS,
+    and fills the cache in the background for the next call. Concurrent misses of one phrase share a single
+    synthesis.
+    """
+
+    def __init__(self, cache: PhraseAudioCache, synthesizer: CartesiaPhraseSynthesizer):
+        self._cache = cache
+        self._synthesizer = synthesizer
+        self._filling: Dict[str, asyncio.Task] = {}
+
+    def _get_key(self, text: str, sample_rate: int) -> str:
+        return self._cache.get_key(text, self._synthesizer.voice_id, self._synthesizer.model, sample_rate)
+
+    async def get(self, text: str, sample_rate: int) -> Optional[bytes]:
+        key = self._get_key(text, sample_rate)
+        audio = await self._cache.get(key)
+        if audio is None:
+            self._fill(key, text, sample_rate)
+        return audio
+
+    def _fill(self, key: str, text: str, sample_rate: int) -> asyncio.Task:
+        task = self._filling.get(key)
+        if task is None:
+            task = asyncio.create_task(self._synthesize(key, text, sample_rate))
+            self._filling[key] = task
+            task.add_done_callback(lambda _: self._filling.pop(key, None))
+        return task
+
+    async def _synthesize(self, key: str, text: str, sample_rate: int) -> bool:
+        try:
+            audio = await self._synthesizer.synthesize(text, sample_rate)
+        except Exception as e:
+            logger.error(f"Failed to synthesise phrase '{text}': {e}")
+            return False
+        await self._cache.put(key, audio)
+        logger.debug(f"Cached {len(audio)} bytes of audio for phrase '{text}'")
+        return True
+
+    async def warm(self, phrases: Iterable[str], sample_rate: int) -> Tuple[int, int]:
+        """Synthesise the phrases that are not cached yet; returns how many were cached before and are now"""
+        tasks, cached = [], 0
+        for text in phrases:
+            key = self._get_key(text, sample_rate)
+            if self._cache.has(key):
+                cached += 1
+            else:
+                tasks.append(self._fill(key, text, sample_rate))
+        results = await asyncio.gather(*tasks)
+        return cached, cached + sum(results)
+
+    def get_metrics(self) -> dict:
+        return self._cache.get_metrics()